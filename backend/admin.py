@@ -0,0 +1,604 @@
+"""Admin dashboard routes"""
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_jwt_extended import jwt_required
+from db_access import (
+    iter_users_export, iter_providers_export, iter_bookings_export,
+    USER_EXPORT_COLUMNS, PROVIDER_EXPORT_COLUMNS, BOOKING_EXPORT_COLUMNS,
+    get_booking_rollup_by_status, get_booking_rollup_daily, get_booking_rollup_breakdown,
+    get_user_role_counts, get_specialization_counts, get_top_providers_by_bookings, get_provider_stats,
+    get_users_with_filters, get_providers_with_filters, get_bookings_with_filters, BOOKING_STATUSES,
+    get_user_by_id, set_users_flag, USER_ROLES
+)
+from providers import format_provider_detail
+from bookings import format_booking_list_item
+from password_hashing import password_hasher
+from auth_context import get_auth_context, user_state_cache, PROVIDER_ROLES
+from admission import admission
+from rate_limit import login_limiter
+from token_revocation import revocation_list
+from analytics import booking_analytics
+from availability import normalize_datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import csv
+import io
+import json
+import os
+import threading
+import zlib
+
+admin_bp = Blueprint('admin', __name__)
+
+# Flush the response roughly every 64KB of serialized rows
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Rejected rows returned inline by the import endpoint
+IMPORT_REJECTED_LIMIT = 1000
+# Analytics period bounds (days back from today, UTC)
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 366
+# Utilization defaults to the trailing 30 days and is capped at a year
+UTILIZATION_DEFAULT_DAYS = 30
+# Admin list pages
+ADMIN_DEFAULT_PER_PAGE = 20
+ADMIN_MAX_PER_PAGE = 100
+# Explicit ids per bulk verify/activate request (filters are unbounded)
+MAX_BULK_USER_IDS = 10000
+# Body key and users column of each bulk user action
+USER_ACTIONS = {'verify': 'is_verified', 'activate': 'is_active'}
+USER_FILTER_KEYS = ('role', 'is_active', 'is_verified', 'search')
+# Threads (and so extra pooled DB connections) per process for concurrent dashboard queries
+ADMIN_FANOUT_THREADS = int(os.environ.get('ADMIN_FANOUT_THREADS', 8))
+
+_fanout_executor = None
+_fanout_pid = None
+_fanout_lock = threading.Lock()
+
+def _get_fanout_executor():
+    """Fan-out thread pool for this process (a pool inherited across fork has no threads)"""
+    global _fanout_executor, _fanout_pid
+    with _fanout_lock:
+        if _fanout_executor is None or _fanout_pid != os.getpid():
+            _fanout_executor = ThreadPoolExecutor(max_workers=ADMIN_FANOUT_THREADS, thread_name_prefix='admin-fanout')
+            _fanout_pid = os.getpid()
+        return _fanout_executor
+
+
+def run_concurrently(queries):
+    """Run name -> callable queries on the fan-out pool; returns name -> result (first error is raised)"""
+    executor = _get_fanout_executor()
+    futures = {name: executor.submit(query) for name, query in queries.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def admin_required(f):
+    """Decorator to require admin role"""
+    @jwt_required()
+    def decorated_function(*args, **kwargs):
+        auth = get_auth_context()
+        if not auth or not auth.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+
+def _parse_date_arg(name):
+    """Parse an optional ISO 8601 date/datetime query argument into naive UTC (no offset means UTC)"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    return normalize_datetime(value)
+
+
+def _parse_bool_arg(name):
+    """Parse an optional true/false query argument"""
+    value = request.args.get(name, '').strip().lower()
+    if not value:
+        return None
+    return value in ('1', 'true', 'yes')
+
+
+def _export_value(value):
+    """Convert a DB value to something CSV/JSON can carry"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _serialize_rows(rows, columns, fmt):
+    """Yield text chunks of at least EXPORT_CHUNK_SIZE characters"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+
+    for row in rows:
+        if writer:
+            writer.writerow([_export_value(row.get(c)) for c in columns])
+        else:
+            buffer.write(json.dumps({c: _export_value(row.get(c)) for c in columns}, default=str))
+            buffer.write('\n')
+
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _encode_chunks(chunks, gzip_output):
+    """Encode text chunks to bytes, optionally through an incremental gzip stream"""
+    if not gzip_output:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@admin_bp.route('/export/<entity>', methods=['GET'])
+@admin_required
+def export_entity(entity):
+    """Stream a full table export as CSV or NDJSON
+
+    Query parameters: format=csv|ndjson, gzip=true, from/to (ISO dates, half-open range),
+    status (bookings: booking status; users/providers: active|inactive), role (users),
+    verified (providers).
+    """
+    try:
+        fmt = request.args.get('format', 'csv').lower()
+        if fmt not in ('csv', 'ndjson'):
+            return jsonify({'error': 'format must be csv or ndjson'}), 400
+
+        try:
+            date_from = _parse_date_arg('from')
+            date_to = _parse_date_arg('to')
+        except ValueError as e:
+            return jsonify({'error': f'Invalid date range: {str(e)}. Use ISO 8601 format (YYYY-MM-DD)'}), 400
+
+        status = request.args.get('status', '').strip().lower() or None
+        if entity == 'bookings':
+            valid_statuses = ['pending', 'confirmed', 'completed', 'cancelled']
+            if status and status not in valid_statuses:
+                return jsonify({'error': 'Invalid status'}), 400
+            rows = iter_bookings_export(date_from=date_from, date_to=date_to, status=status)
+            columns = BOOKING_EXPORT_COLUMNS
+        elif entity in ('users', 'providers'):
+            if status and status not in ('active', 'inactive'):
+                return jsonify({'error': 'status must be active or inactive'}), 400
+            is_active = None if status is None else status == 'active'
+            if entity == 'users':
+                role = request.args.get('role', '').strip() or None
+                rows = iter_users_export(date_from=date_from, date_to=date_to, role=role, is_active=is_active)
+                columns = USER_EXPORT_COLUMNS
+            else:
+                rows = iter_providers_export(date_from=date_from, date_to=date_to, is_active=is_active,
+                                             verified=_parse_bool_arg('verified'))
+                columns = PROVIDER_EXPORT_COLUMNS
+        else:
+            return jsonify({'error': 'Unknown export'}), 404
+
+        gzip_output = _parse_bool_arg('gzip') or False
+        extension = 'csv' if fmt == 'csv' else 'ndjson'
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        filename = f"{entity}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{extension}"
+        if gzip_output:
+            mimetype = 'application/gzip'
+            filename += '.gz'
+
+        print(f"📤 Export started: {entity} ({fmt}{', gzip' if gzip_output else ''})")
+
+        body = _encode_chunks(_serialize_rows(rows, columns, fmt), gzip_output)
+        # No Content-Length: the WSGI server sends the body with chunked transfer encoding
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/providers/import', methods=['POST'])
+@admin_required
+def import_providers():
+    """Onboard providers from an uploaded roster CSV (multipart field 'file')"""
+    try:
+        # Pulls in the CSV/process-pool machinery; only load it when an import actually runs
+        from provider_import import import_providers_csv, DEFAULT_BATCH_SIZE
+        
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({'error': 'CSV file is required'}), 400
+
+        batch_size = request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int)
+        workers = request.args.get('workers', type=int)
+        if workers is not None:
+            # Hashing processes: at least one, never more than the machine has cores
+            workers = min(max(1, workers), os.cpu_count() or 1)
+
+        print(f"📥 Provider import started: {upload.filename}")
+
+        def report(summary):
+            print(f"⏳ Import {upload.filename}: {summary['processed']} processed, {summary['imported']} imported, {summary['rejected']} rejected")
+
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            summary = import_providers_csv(stream, batch_size=max(1, batch_size), workers=workers,
+                                           hash_method=password_hasher.method, progress=report)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        rejected_rows = summary.pop('rejected_rows')
+        print(f"✅ Provider import finished: {summary['imported']} imported, {summary['rejected']} rejected")
+
+        return jsonify({
+            'message': 'Import completed',
+            'summary': summary,
+            'rejected_rows': rejected_rows[:IMPORT_REJECTED_LIMIT],
+            'rejected_rows_truncated': len(rejected_rows) > IMPORT_REJECTED_LIMIT
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/metrics', methods=['GET'])
+@admin_required
+def get_metrics():
+    """Load-shedding and throttling counters for this worker process"""
+    try:
+        return jsonify({
+            'pid': os.getpid(),
+            'admission': admission.stats(),
+            'password_hashing': password_hasher.stats(),
+            'login_rate_limit': {'rejected': login_limiter.rejected},
+            'token_revocation': revocation_list.stats(),
+            'analytics': booking_analytics.stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _parse_analytics_days():
+    """days query argument; raises ValueError outside 1..ANALYTICS_MAX_DAYS"""
+    try:
+        days = int(request.args.get('days', ANALYTICS_DEFAULT_DAYS))
+    except ValueError:
+        raise ValueError('days must be an integer')
+    if not 1 <= days <= ANALYTICS_MAX_DAYS:
+        raise ValueError(f'days must be between 1 and {ANALYTICS_MAX_DAYS}')
+    return days
+
+
+def _analytics_queries(days):
+    """Independent analytics queries for the last `days` days, as name -> callable"""
+    today = datetime.utcnow().date()
+    since = today - timedelta(days=days - 1)
+    return {
+        'by_status': lambda: get_booking_rollup_by_status(),
+        'in_period': lambda: get_booking_rollup_by_status(since),
+        'daily': lambda: get_booking_rollup_daily(since, today),
+        'roles': get_user_role_counts,
+        'provider_stats': get_provider_stats,
+        'service_types': lambda: get_booking_rollup_breakdown('service_type', since),
+        'specializations': get_specialization_counts,
+        'top_providers': lambda: get_top_providers_by_bookings(since),
+    }
+
+
+def _format_analytics(days, results):
+    """Dashboard analytics payload from the results of _analytics_queries"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    by_status, in_period = results['by_status'], results['in_period']
+    daily = {str(row['day'])[:10]: int(row['count'] or 0) for row in results['daily']}
+    roles = results['roles']
+    provider_stats = results['provider_stats']
+    
+    def status_count(counts, status):
+        return counts.get(status, {}).get('count', 0)
+    
+    def revenue(counts):
+        return round(counts.get('completed', {}).get('revenue', 0.0), 2)
+    
+    return {
+        'period_days': days,
+        'users': {
+            'total': sum(roles.values()),
+            'clients': roles.get('client', 0),
+            'providers': sum(roles.get(role, 0) for role in PROVIDER_ROLES),
+            'verified_providers': provider_stats['verified_providers'] or 0
+        },
+        'bookings': {
+            'total': sum(counts['count'] for counts in by_status.values()),
+            'in_period': sum(counts['count'] for counts in in_period.values()),
+            **{status: status_count(by_status, status) for status in ('pending', 'confirmed', 'completed', 'cancelled')}
+        },
+        'revenue': {
+            'total': revenue(by_status),
+            'in_period': revenue(in_period)
+        },
+        'ratings': {'average': provider_stats['average_rating']},
+        'booking_trends': [
+            {'date': day, 'count': daily.get(day, 0)}
+            for day in ((since + timedelta(days=offset)).isoformat() for offset in range(days))
+        ],
+        'service_types': [
+            {'service_type': row['service_type'], 'count': int(row['count']), 'revenue': round(float(row['revenue'] or 0), 2)}
+            for row in results['service_types']
+        ],
+        'popular_specializations': [
+            {'specialization': row['specialization'], 'count': row['count']}
+            for row in results['specializations']
+        ],
+        'top_providers': [
+            {
+                'provider_id': row['provider_id'],
+                'name': row['full_name'],
+                'booking_count': row['booking_count'],
+                'rating': float(row['rating'] or 0)
+            }
+            for row in results['top_providers']
+        ]
+    }
+
+
+@admin_bp.route('/analytics', methods=['GET'])
+@admin_required
+def get_analytics():
+    """Dashboard analytics read from the booking_daily_rollup table instead of scanning bookings"""
+    try:
+        try:
+            days = _parse_analytics_days()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(_format_analytics(days, run_concurrently(_analytics_queries(days)))), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _page_args():
+    """page / per_page query arguments, clamped to 1..ADMIN_MAX_PER_PAGE"""
+    page = max(1, request.args.get('page', 1, type=int) or 1)
+    per_page = min(ADMIN_MAX_PER_PAGE, max(1, request.args.get('per_page', ADMIN_DEFAULT_PER_PAGE, type=int) or 1))
+    return page, per_page
+
+
+def _format_page(result, key, format_item):
+    """get_*_with_filters result -> {key: [...], total, total_is_estimate, page, per_page, pages}"""
+    return {
+        key: [format_item(item) for item in result['items']],
+        'total': result['total'],
+        'total_is_estimate': result['total_is_estimate'],
+        'page': result['page'],
+        'per_page': result['per_page'],
+        'pages': result['pages']
+    }
+
+
+def _format_user(user):
+    """users row (without password hash) for the admin user list"""
+    return {
+        **{column: user.get(column) for column in USER_EXPORT_COLUMNS},
+        'created_at': user['created_at'].isoformat() if user.get('created_at') else None,
+        'updated_at': user['updated_at'].isoformat() if user.get('updated_at') else None
+    }
+
+
+def _format_provider(provider):
+    """get_providers_with_filters row -> provider detail with its user nested"""
+    return format_provider_detail(provider, {**provider, 'id': provider['user_id']})
+
+
+def _listing_queries():
+    """Listing queries for the users / providers / bookings tabs from the request arguments"""
+    page, per_page = _page_args()
+    role = request.args.get('role', '').strip() or None
+    search = request.args.get('search', '').strip() or None
+    is_active = _parse_bool_arg('active')
+    verified = _parse_bool_arg('verified')
+    status = request.args.get('status', '').strip().lower() or None
+    if status and status not in BOOKING_STATUSES:
+        raise ValueError('Invalid status')
+    exact_count = bool(_parse_bool_arg('exact_count'))
+    return {
+        'users': lambda: get_users_with_filters(role=role, is_active=is_active, search=search, page=page, per_page=per_page,
+                                               is_verified=verified, exact_count=exact_count),
+        'providers': lambda: get_providers_with_filters(verified=verified, page=page, per_page=per_page, exact_count=exact_count),
+        'bookings': lambda: get_bookings_with_filters(status=status, page=page, per_page=per_page, exact_count=exact_count),
+    }
+
+
+LISTING_FORMATTERS = {
+    'users': _format_user,
+    'providers': _format_provider,
+    'bookings': format_booking_list_item,
+}
+
+
+@admin_bp.route('/<any(users, providers, bookings):entity>', methods=['GET'])
+@admin_required
+def list_entity(entity):
+    """One page of users, providers or bookings
+
+    Query parameters: page, per_page, exact_count (otherwise total may be an estimate, see
+    total_is_estimate); users: role, active, verified, search; providers: verified; bookings: status.
+    """
+    try:
+        try:
+            query = _listing_queries()[entity]
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(_format_page(query(), entity, LISTING_FORMATTERS[entity])), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/overview', methods=['GET'])
+@admin_required
+def get_overview():
+    """Analytics plus the first page of users, providers and bookings in one response
+
+    Every underlying query runs concurrently on the fan-out pool with its own
+    connection, so the response takes as long as the slowest query. Accepts the
+    analytics and listing query parameters.
+    """
+    try:
+        try:
+            days = _parse_analytics_days()
+            listings = _listing_queries()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        queries = {f'analytics.{name}': query for name, query in _analytics_queries(days).items()}
+        queries.update(listings)
+        results = run_concurrently(queries)
+        
+        response = {
+            'analytics': _format_analytics(days, {
+                name.split('.', 1)[1]: result for name, result in results.items() if name.startswith('analytics.')
+            })
+        }
+        for entity in listings:
+            response[entity] = _format_page(results[entity], entity, LISTING_FORMATTERS[entity])
+        return jsonify(response), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/reports/<report>', methods=['GET'])
+@admin_required
+def get_report(report):
+    """Finance reports computed over all bookings by the columnar analytics engine
+
+    revenue: completed bookings and revenue per provider per month (provider_id filter).
+    cancellations: cancellation rate per provider (min_bookings) and overall.
+    utilization: percentiles of booked / working-hours minutes per provider.
+    All take from/to (ISO dates, half-open range).
+    """
+    try:
+        if report not in ('revenue', 'cancellations', 'utilization'):
+            return jsonify({'error': 'Unknown report. Use revenue, cancellations or utilization'}), 404
+
+        try:
+            date_from = _parse_date_arg('from')
+            date_to = _parse_date_arg('to')
+        except ValueError as e:
+            return jsonify({'error': f'Invalid date range: {str(e)}. Use ISO 8601 format (YYYY-MM-DD)'}), 400
+
+        params = {'date_from': date_from, 'date_to': date_to}
+        try:
+            if report == 'revenue':
+                provider_id = request.args.get('provider_id')
+                params['provider_id'] = int(provider_id) if provider_id else None
+            elif report == 'cancellations':
+                params['min_bookings'] = max(1, int(request.args.get('min_bookings', 1)))
+        except ValueError:
+            return jsonify({'error': 'provider_id and min_bookings must be integers'}), 400
+
+        if report == 'utilization':
+            # Whole days, so the default range keeps the same cache key all day
+            tomorrow = datetime.combine(datetime.utcnow().date() + timedelta(days=1), datetime.min.time())
+            params['date_to'] = date_to = date_to or tomorrow
+            params['date_from'] = date_from or date_to - timedelta(days=UTILIZATION_DEFAULT_DAYS)
+            if not timedelta(0) < params['date_to'] - params['date_from'] <= timedelta(days=ANALYTICS_MAX_DAYS):
+                return jsonify({'error': f'Utilization range must be between 1 and {ANALYTICS_MAX_DAYS} days'}), 400
+
+        return jsonify({'report': report, 'result': booking_analytics.report(report, **params)}), 200
+
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _set_users_flag(action, value, user_ids=None, filters=None):
+    """Apply a verify/activate action and publish deactivations to this worker's auth state cache"""
+    auth = get_auth_context()
+    flag = USER_ACTIONS[action]
+    # An admin cannot lock themselves out
+    exclude = auth.user_id if flag == 'is_active' and not value else None
+    changed = set_users_flag(flag, value, user_ids=user_ids, filters=filters, exclude_user_id=exclude)
+    if flag == 'is_active':
+        for user_id in changed:
+            user_state_cache.set_state(user_id, is_active=value)
+    return changed
+
+
+@admin_bp.route('/users/<int:user_id>/<any(verify, activate):action>', methods=['PUT'])
+@admin_required
+def set_user_flag(user_id, action):
+    """Verify/unverify ({"verify": bool}) or activate/deactivate ({"activate": bool}) one user and their provider profile"""
+    try:
+        data = request.get_json(silent=True) or {}
+        value = data.get(action)
+        if not isinstance(value, bool):
+            return jsonify({'error': f'{action} must be true or false'}), 400
+        if action == 'activate' and not value and user_id == get_auth_context().user_id:
+            return jsonify({'error': 'You cannot deactivate your own account'}), 400
+        if not get_user_by_id(user_id):
+            return jsonify({'error': 'User not found'}), 404
+        
+        changed = _set_users_flag(action, value, user_ids=[user_id])
+        return jsonify({'user': _format_user(get_user_by_id(user_id)), 'changed': bool(changed)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/users/bulk-<any(verify, activate):action>', methods=['POST'])
+@admin_required
+def bulk_set_user_flag(action):
+    """Verify or activate many users at once
+
+    Body: {"verify"|"activate": bool, and either "ids": [...] or "filter": {role,
+    is_active, is_verified, search}}. Users and provider profiles are updated in
+    chunked set-based UPDATEs inside one transaction; the requesting admin is never
+    deactivated. Returns the ids that actually changed.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        value = data.get(action)
+        if not isinstance(value, bool):
+            return jsonify({'error': f'{action} must be true or false'}), 400
+        
+        ids, filters = data.get('ids'), data.get('filter')
+        if (ids is None) == (filters is None):
+            return jsonify({'error': 'Provide either ids or filter'}), 400
+        if ids is not None:
+            if not isinstance(ids, list) or not ids or \
+                    not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+                return jsonify({'error': 'ids must be a non-empty list of integers'}), 400
+            if len(ids) > MAX_BULK_USER_IDS:
+                return jsonify({'error': f'At most {MAX_BULK_USER_IDS} ids per request'}), 400
+        else:
+            if not isinstance(filters, dict) or not filters:
+                return jsonify({'error': 'filter must be a non-empty object'}), 400
+            unknown = set(filters) - set(USER_FILTER_KEYS)
+            if unknown:
+                return jsonify({'error': f"Unknown filter keys: {', '.join(sorted(unknown))}"}), 400
+            if filters.get('role') and filters['role'] not in USER_ROLES:
+                return jsonify({'error': 'Invalid role'}), 400
+            if any(key in filters and not isinstance(filters[key], bool) for key in ('is_active', 'is_verified')):
+                return jsonify({'error': 'is_active and is_verified filters must be true or false'}), 400
+        
+        changed = _set_users_flag(action, value, user_ids=ids, filters=filters)
+        print(f"✅ Bulk {action}={value} by admin {get_auth_context().user_id}: {len(changed)} users changed")
+        return jsonify({'action': action, 'value': value, 'changed': len(changed), 'ids': changed}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,234 @@
+"""Per-route admission control and load shedding
+
+Every request is mapped to a priority class (by Flask endpoint) and must take a
+slot from that class's budget before the view runs. A class admits at most
+`limit` concurrent requests; beyond that up to `queue` requests wait, each for at
+most `max_wait` seconds. Anything over the queue or past its deadline is shed
+immediately with 503 + Retry-After.
+
+Budgets are derived from the worker's request threads, and every class below
+`critical` also leaves RESERVED_THREADS of them free: a request that would take
+one of those threads (running or queued) is shed at once instead of waiting. Their
+limit stops one thread short of the unreserved ones so a request can still queue
+there. A search spike can therefore only exhaust the search budget, and logins /
+booking writes always find a free thread (and DB connection).
+"""
+import math
+import threading
+import time
+from flask import g, jsonify, request
+
+# Request threads per worker when the server doesn't say (gunicorn's GUNICORN_THREADS default)
+DEFAULT_WORKER_THREADS = 4
+
+# Worker threads each class leaves free for higher-priority classes
+RESERVED_THREADS = {
+    'critical': 0,
+    'default': 1,
+    'search': 2,
+    'bulk': 2,
+}
+
+
+def _reserved_budget(threads, name, max_wait):
+    """Budget that keeps one of the class's unreserved threads for requests queued behind its limit"""
+    usable = max(1, threads - RESERVED_THREADS[name])
+    limit = max(1, usable - 1)
+    return (limit, usable - limit, max_wait)
+
+
+def default_budgets(threads):
+    """name: (limit, queue, max_wait seconds) for a worker with `threads` request threads"""
+    return {
+        'critical': (threads, threads, 5.0),
+        'default': _reserved_budget(threads, 'default', 2.0),
+        'search': _reserved_budget(threads, 'search', 0.5),
+        'bulk': (1, 0, 0.0),
+    }
+
+
+DEFAULT_BUDGETS = default_budgets(DEFAULT_WORKER_THREADS)
+
+# Flask endpoint -> priority class; unlisted endpoints use 'default'
+ROUTE_CLASSES = {
+    'auth.login': 'critical',
+    'auth.register': 'critical',
+    'bookings.create_booking': 'critical',
+    'providers.get_providers': 'search',
+    'providers.get_provider': 'search',
+    'providers.get_specializations_list': 'search',
+    'providers.get_provider_stats_endpoint': 'search',
+    'providers.get_providers_availability': 'search',
+    'admin.export_entity': 'bulk',
+    'admin.import_providers': 'bulk',
+    'admin.bulk_set_user_flag': 'bulk',
+}
+
+# Never throttled: health checks and the metrics endpoint itself
+EXEMPT_ENDPOINTS = {'health_check', 'admin.get_metrics', 'static'}
+
+
+class AdmissionClass:
+    """Concurrency budget with a bounded wait queue and a queue-time deadline"""
+
+    def __init__(self, name, limit, queue, max_wait):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.rejected_reserved = 0
+        self.max_queue_seconds = 0.0
+        self._total_queue_seconds = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Take a slot; returns False when the request should be shed"""
+        with self._cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue:
+                self.rejected_queue_full += 1
+                return False
+
+            started = time.monotonic()
+            deadline = started + self.max_wait
+            self.waiting += 1
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                waited = time.monotonic() - started
+                self._total_queue_seconds += waited
+                self.max_queue_seconds = max(self.max_queue_seconds, waited)
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def retry_after(self):
+        """Seconds a shed client should wait before retrying"""
+        return max(1, math.ceil(self.max_wait))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'queue': self.queue,
+                'max_wait': self.max_wait,
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_timeout': self.rejected_timeout,
+                'rejected_reserved': self.rejected_reserved,
+                'avg_queue_ms': round(self._total_queue_seconds / self.admitted * 1000, 2) if self.admitted else 0.0,
+                'max_queue_ms': round(self.max_queue_seconds * 1000, 2),
+            }
+
+
+def parse_budgets(value, threads=DEFAULT_WORKER_THREADS):
+    """Parse 'name=limit:queue:max_wait,...' overrides on top of default_budgets(threads)"""
+    budgets = default_budgets(threads)
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        name, spec = item.split('=', 1)
+        limit, queue, max_wait = spec.split(':')
+        budgets[name.strip()] = (int(limit), int(queue), float(max_wait))
+    return budgets
+
+
+class AdmissionController:
+    """Maps requests to AdmissionClass budgets via before/teardown request hooks"""
+
+    def __init__(self, budgets=None, route_classes=None, threads=DEFAULT_WORKER_THREADS):
+        self.enabled = True
+        self.route_classes = dict(route_classes or ROUTE_CLASSES)
+        self.threads = threads
+        self.overrides = None
+        # Admitted or queued requests across all classes, each holding a worker thread
+        self.occupied = 0
+        self._lock = threading.Lock()
+        self.configure(budgets or default_budgets(threads))
+
+    def configure(self, budgets):
+        self.classes = {name: AdmissionClass(name, *budget) for name, budget in budgets.items()}
+
+    def init_app(self, app):
+        """Apply ADMISSION_* settings and register the request hooks"""
+        self.enabled = app.config.get('ADMISSION_ENABLED', True)
+        self.overrides = app.config.get('ADMISSION_BUDGETS')
+        self.set_threads(app.config.get('ADMISSION_THREADS', DEFAULT_WORKER_THREADS))
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def set_threads(self, threads):
+        """Re-derive the budgets for a server running `threads` request threads per process"""
+        self.threads = max(1, threads)
+        self.configure(parse_budgets(self.overrides, self.threads))
+
+    def class_for(self, endpoint):
+        return self.classes.get(self.route_classes.get(endpoint, 'default')) or self.classes['default']
+
+    def _take_thread(self, admission_class):
+        """Count the request's thread unless that would eat into the threads reserved for higher classes"""
+        reserved = min(RESERVED_THREADS.get(admission_class.name, 0), self.threads - 1)
+        with self._lock:
+            if reserved and self.occupied >= self.threads - reserved:
+                admission_class.rejected_reserved += 1
+                return False
+            self.occupied += 1
+            return True
+
+    def _release_thread(self):
+        with self._lock:
+            self.occupied -= 1
+
+    def _before_request(self):
+        if not self.enabled or request.endpoint is None or request.endpoint in EXEMPT_ENDPOINTS \
+                or request.method == 'OPTIONS':
+            return None
+        admission_class = self.class_for(request.endpoint)
+        if not self._take_thread(admission_class):
+            return overloaded_response(admission_class.retry_after())
+        if not admission_class.acquire():
+            self._release_thread()
+            return overloaded_response(admission_class.retry_after())
+        g.admission_class = admission_class
+        return None
+
+    def _teardown_request(self, error=None):
+        admission_class = g.pop('admission_class', None)
+        if admission_class is not None:
+            admission_class.release()
+            self._release_thread()
+
+    def stats(self):
+        return {name: admission_class.stats() for name, admission_class in self.classes.items()}
+
+
+def overloaded_response(retry_after):
+    """503 response for a request shed by admission control"""
+    response = jsonify({'error': 'Server is busy, please retry shortly'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
+
+
+# Global admission controller
+admission = AdmissionController()
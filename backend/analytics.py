@@ -0,0 +1,300 @@
+"""Columnar booking analytics for finance reports
+
+Bookings are streamed from the DB in batches of plain numeric tuples and packed
+into one NumPy array per column (BookingFrame). Reports are then whole-array
+operations instead of per-row Python:
+
+- revenue per provider per month: np.unique over a combined (provider, month)
+  key, summed with np.bincount
+- cancellation rates: sort by provider once, then segment sums with
+  np.add.reduceat over the run boundaries
+- utilization: booked minutes per provider profile (bincount) against the
+  capacity of its weekly working hours, summarized with np.percentile
+
+The loaded frame and every computed report are cached per process, keyed by
+the bookings data version (MAX(id), MAX(updated_at)), so repeated dashboard
+loads cost one indexed probe until a booking is written. Utilization is also
+keyed by the working-hours version, since its capacity comes from there.
+Bookings deleted outside the app do not change the version; `invalidate()`
+drops the cache.
+
+NumPy is imported on first use, so the rest of the API runs without it.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from db_access import (
+    BOOKING_STATUSES, BOOKING_FACT_COLUMNS, iter_booking_fact_batches,
+    get_bookings_data_version, get_working_hours_by_provider, get_working_hours_version
+)
+
+# Optional dependency, imported on first report so the API boots without it
+np = None
+
+# Statuses counted as used provider time in utilization
+UTILIZED_STATUSES = ('confirmed', 'completed')
+# Capacity assumed for providers without a working-hours template
+DEFAULT_WEEKLY_CAPACITY_MINUTES = 40 * 60
+UTILIZATION_PERCENTILES = (50, 75, 90, 95, 99)
+# Reports whose result also depends on provider working hours
+WORKING_HOURS_REPORTS = {'utilization'}
+
+
+def _load_numpy():
+    """Import numpy on first use"""
+    global np
+    if np is None:
+        try:
+            import numpy as _np
+        except ImportError:
+            raise ImportError("numpy is required for analytics reports but is not installed. Install it with: pip install numpy")
+        np = _np
+    return np
+
+
+def _status_code(status):
+    return BOOKING_STATUSES.index(status)
+
+
+def _epoch_minute(value):
+    """Naive UTC datetime -> minutes since the Unix epoch"""
+    return int((value - datetime(1970, 1, 1)).total_seconds() // 60)
+
+
+def _month_label(month_index):
+    """Months since 1970-01 -> 'YYYY-MM'"""
+    return f'{1970 + month_index // 12:04d}-{month_index % 12 + 1:02d}'
+
+
+class BookingFrame:
+    """All bookings as parallel NumPy columns (see BOOKING_FACT_COLUMNS)"""
+
+    def __init__(self, columns):
+        self.id = columns['id'].astype(np.int64)
+        self.provider_id = columns['provider_id'].astype(np.int64)
+        self.provider_profile_id = columns['provider_profile_id'].astype(np.int64)
+        self.start_minute = columns['start_minute'].astype(np.int64)
+        self.duration_minutes = columns['duration_minutes'].astype(np.int64)
+        self.fee = columns['fee'].astype(np.float64)
+        self.status_code = columns['status_code'].astype(np.int8)
+
+    def __len__(self):
+        return len(self.id)
+
+    @classmethod
+    def load(cls, batch_size=10000):
+        """Stream bookings from the DB into columns, one float array per batch"""
+        _load_numpy()
+        chunks = []
+        for rows in iter_booking_fact_batches(batch_size):
+            chunks.append(np.array(rows, dtype=np.float64).reshape(-1, len(BOOKING_FACT_COLUMNS)))
+        data = np.concatenate(chunks) if chunks else np.empty((0, len(BOOKING_FACT_COLUMNS)))
+        return cls({name: data[:, index] for index, name in enumerate(BOOKING_FACT_COLUMNS)})
+
+    def mask(self, date_from=None, date_to=None, statuses=None):
+        """Boolean row mask for bookings starting in [date_from, date_to) with one of statuses"""
+        mask = np.ones(len(self), dtype=bool)
+        if date_from is not None:
+            mask &= self.start_minute >= _epoch_minute(date_from)
+        if date_to is not None:
+            mask &= self.start_minute < _epoch_minute(date_to)
+        if statuses is not None:
+            mask &= np.isin(self.status_code, [_status_code(status) for status in statuses])
+        return mask
+
+    @property
+    def month_index(self):
+        """Months since 1970-01 of each booking's start"""
+        return self.start_minute.astype('datetime64[m]').astype('datetime64[M]').astype(np.int64)
+
+
+def revenue_by_provider_month(frame, date_from=None, date_to=None, provider_id=None):
+    """Completed bookings and fee revenue per (provider, month)"""
+    mask = frame.mask(date_from, date_to, ('completed',))
+    if provider_id is not None:
+        mask &= frame.provider_id == provider_id
+    providers = frame.provider_id[mask]
+    if not len(providers):
+        return []
+    months = frame.month_index[mask]
+    first_month = months.min()
+    span = int(months.max() - first_month) + 1
+    # One integer key per (provider, month); np.unique sorts by provider, then month
+    keys, inverse = np.unique(providers * span + (months - first_month), return_inverse=True)
+    revenue = np.bincount(inverse, weights=frame.fee[mask])
+    counts = np.bincount(inverse)
+    return [{
+        'provider_id': int(key // span),
+        'month': _month_label(int(first_month + key % span)),
+        'bookings': int(count),
+        'revenue': round(float(total), 2)
+    } for key, count, total in zip(keys, counts, revenue)]
+
+
+def cancellation_rates(frame, date_from=None, date_to=None, min_bookings=1):
+    """Cancelled share of bookings per provider plus the overall rate"""
+    mask = frame.mask(date_from, date_to)
+    providers = frame.provider_id[mask]
+    cancelled = (frame.status_code[mask] == _status_code('cancelled')).astype(np.int64)
+    total = len(providers)
+    overall = {'bookings': total, 'cancelled': int(cancelled.sum()),
+               'rate': round(float(cancelled.mean()), 4) if total else 0.0}
+    if not total:
+        return {'overall': overall, 'providers': []}
+
+    # Sort once, then reduce each provider's contiguous run
+    order = np.argsort(providers, kind='stable')
+    providers, cancelled = providers[order], cancelled[order]
+    starts = np.flatnonzero(np.r_[True, providers[1:] != providers[:-1]])
+    counts = np.diff(np.r_[starts, total])
+    cancelled_counts = np.add.reduceat(cancelled, starts)
+    rates = cancelled_counts / counts
+
+    keep = counts >= min_bookings
+    ranked = np.argsort(-rates[keep], kind='stable')
+    return {
+        'overall': overall,
+        'providers': [{
+            'provider_id': int(provider),
+            'bookings': int(count),
+            'cancelled': int(cancelled_count),
+            'rate': round(float(rate), 4)
+        } for provider, count, cancelled_count, rate in zip(
+            providers[starts][keep][ranked], counts[keep][ranked],
+            cancelled_counts[keep][ranked], rates[keep][ranked])]
+    }
+
+
+def _weekday_counts(date_from, date_to):
+    """How many times each weekday (0 = Monday) occurs among the days in [date_from, date_to)"""
+    days = (date_to.date() - date_from.date()).days
+    counts = [days // 7] * 7
+    for offset in range(days % 7):
+        counts[(date_from.weekday() + offset) % 7] += 1
+    return counts
+
+
+def _capacity_minutes(working_hours, weekday_counts, days):
+    """Bookable minutes of a weekly template over the range"""
+    if not working_hours:
+        return DEFAULT_WEEKLY_CAPACITY_MINUTES * days / 7
+    return sum((row['end_minute'] - row['start_minute']) * weekday_counts[row['weekday']] for row in working_hours)
+
+
+def utilization(frame, date_from, date_to):
+    """Percentiles of booked / available minutes across provider profiles with bookings in the range"""
+    date_from = date_from.replace(hour=0, minute=0, second=0, microsecond=0)
+    date_to = date_to.replace(hour=0, minute=0, second=0, microsecond=0)
+    days = max(1, (date_to - date_from).days)
+    mask = frame.mask(date_from, date_to, UTILIZED_STATUSES) & (frame.provider_profile_id > 0)
+    profiles, inverse = np.unique(frame.provider_profile_id[mask], return_inverse=True)
+    summary = {'from': date_from.isoformat(), 'to': date_to.isoformat(), 'providers': int(len(profiles))}
+    if not len(profiles):
+        return dict(summary, mean=0.0, percentiles={str(p): 0.0 for p in UTILIZATION_PERCENTILES})
+
+    booked = np.bincount(inverse, weights=frame.duration_minutes[mask])
+    working_hours = get_working_hours_by_provider([int(profile) for profile in profiles])
+    weekday_counts = _weekday_counts(date_from, date_to)
+    capacity = np.array([
+        _capacity_minutes(working_hours.get(int(profile)), weekday_counts, days) for profile in profiles
+    ], dtype=np.float64)
+    ratios = np.divide(booked, capacity, out=np.zeros_like(booked), where=capacity > 0)
+    return dict(
+        summary,
+        mean=round(float(ratios.mean()), 4),
+        percentiles={str(p): round(float(value), 4)
+                     for p, value in zip(UTILIZATION_PERCENTILES, np.percentile(ratios, UTILIZATION_PERCENTILES))}
+    )
+
+
+REPORTS = {
+    'revenue': revenue_by_provider_month,
+    'cancellations': cancellation_rates,
+    'utilization': utilization,
+}
+
+
+class BookingAnalytics:
+    """Per-process cache of the loaded BookingFrame and computed reports, keyed by data version"""
+
+    def __init__(self, cache_size=256, batch_size=10000, version_check_seconds=0.0):
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.version_check_seconds = version_check_seconds
+        self._frame = None
+        self._frame_version = None
+        self._version = None
+        self._version_checked = 0.0
+        # (report, args) -> (version, result)
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        """Apply ANALYTICS_* settings from the app config"""
+        self.cache_size = app.config.get('ANALYTICS_CACHE_SIZE', 256)
+        self.batch_size = app.config.get('ANALYTICS_BATCH_SIZE', 10000)
+        self.version_check_seconds = app.config.get('ANALYTICS_VERSION_CHECK_SECONDS', 0.0)
+
+    def invalidate(self):
+        with self._lock:
+            self._frame = self._frame_version = self._version = None
+            self._reports.clear()
+
+    def data_version(self):
+        """Current (bookings, working hours) data versions, probed at most every version_check_seconds"""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_checked < self.version_check_seconds:
+                return self._version
+        version = (get_bookings_data_version(), get_working_hours_version())
+        with self._lock:
+            self._version, self._version_checked = version, now
+        return version
+
+    def frame(self, version):
+        """BookingFrame for version, reloading when the data changed; one loader at a time"""
+        with self._load_lock:
+            if self._frame is None or self._frame_version != version:
+                self._frame = BookingFrame.load(self.batch_size)
+                self._frame_version = version
+                self.loads += 1
+            return self._frame
+
+    def report(self, name, **kwargs):
+        """Cached result of REPORTS[name](frame, **kwargs) for the current data version"""
+        bookings_version, hours_version = self.data_version()
+        version = (bookings_version, hours_version) if name in WORKING_HOURS_REPORTS else bookings_version
+        key = (name, tuple(sorted(kwargs.items())))
+        with self._lock:
+            entry = self._reports.get(key)
+            if entry is not None and entry[0] == version:
+                self._reports.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        result = REPORTS[name](self.frame(bookings_version), **kwargs)
+        with self._lock:
+            self._reports[key] = (version, result)
+            self._reports.move_to_end(key)
+            while len(self._reports) > self.cache_size:
+                self._reports.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rows': len(self._frame) if self._frame is not None else 0,
+                'frame_loads': self.loads,
+                'report_hits': self.hits,
+                'report_misses': self.misses,
+                'cached_reports': len(self._reports)
+            }
+
+
+# Global analytics engine
+booking_analytics = BookingAnalytics()
@@ -1,10 +1,20 @@
 """Main Flask application for Nyay Sahyog"""
+import time
+_import_started = time.perf_counter()
+
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
-from db_connection import db
-from db_access import create_user, get_user_by_username
+from db_connection import db, SCHEMA_VERSION
+from password_hashing import password_hasher
+from rate_limit import login_limiter
+from auth_context import user_state_cache
+from token_revocation import revocation_list
+from admission import admission
+from idempotency import idempotency_store
+from analytics import booking_analytics
 from dotenv import load_dotenv
 import os
 
@@ -12,13 +22,47 @@ import os
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(BASE_DIR, '.env'))
 
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+
+class StartupTimer:
+    """Collects per-phase timings for the startup report"""
+    
+    def __init__(self):
+        self.phases = [('imports', IMPORT_SECONDS)]
+        self._last = time.perf_counter()
+    
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+    
+    def report(self):
+        total = sum(seconds for _, seconds in self.phases)
+        parts = ', '.join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases)
+        return f"⏱️  Startup in {total * 1000:.0f}ms (pid {os.getpid()}): {parts}"
+
+
 def create_app():
     """Application factory pattern"""
+    timer = StartupTimer()
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Behind a reverse proxy, take the client address (per-IP login throttling) from X-Forwarded-For
+    hops = app.config.get('TRUSTED_PROXY_HOPS', 0)
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+    timer.mark('config')
     
     # Initialize extensions
     jwt = JWTManager(app)
+    password_hasher.init_app(app)
+    login_limiter.init_app(app)
+    user_state_cache.init_app(app)
+    revocation_list.init_app(app)
+    admission.init_app(app)
+    idempotency_store.init_app(app)
+    booking_analytics.init_app(app)
     
     # JWT error handlers
     @jwt.expired_token_loader
@@ -29,54 +73,112 @@ def create_app():
     def invalid_token_callback(error):
         return jsonify({'error': 'Invalid token'}), 422
     
+    @jwt.token_in_blocklist_loader
+    def token_revoked_check(jwt_header, jwt_payload):
+        return user_state_cache.is_revoked(jwt_payload) or revocation_list.is_revoked(jwt_payload.get('jti'))
+    
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token has been revoked'}), 401
+    
     @jwt.unauthorized_loader
     def missing_token_callback(error):
         return jsonify({'error': 'Authorization token is missing'}), 401
     
     CORS(app)  # Enable CORS for React frontend
+    timer.mark('extensions')
     
     # Register blueprints
     from auth import auth_bp
     from providers import providers_bp
     from bookings import bookings_bp
+    from admin import admin_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(providers_bp, url_prefix='/api/providers')
     app.register_blueprint(bookings_bp, url_prefix='/api/bookings')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    
+    timer.mark('blueprints')
     
-    # Create database tables and initialize
-    with app.app_context():
+    # Create or upgrade the schema only when the recorded version is behind
+    if app.config.get('SCHEMA_CHECK_ON_STARTUP', True):
         try:
-            db.create_tables()
-            
-            # Create admin user if it doesn't exist
-            try:
-                admin = get_user_by_username('admin')
-                if not admin:
-                    create_user({
-                        'username': 'admin',
-                        'email': 'admin@nyaysahyog.com',
-                        'password': 'admin123',
-                        'role': 'admin',
-                        'full_name': 'System Administrator',
-                        'is_verified': True,
-                        'is_active': True
-                    })
-                    print("✅ Admin user created: username='admin', password='admin123'")
-            except Exception as e:
-                print(f"⚠️  Error creating admin user: {e}")
+            if db.ensure_schema():
+                print(f"✅ Database schema created/upgraded to version {SCHEMA_VERSION}")
         except Exception as e:
             print(f"⚠️  Database initialization error: {e}")
+    timer.mark('schema')
+    
+    register_cli(app)
     
     @app.route('/api/health')
     def health_check():
         """Health check endpoint"""
         return {'status': 'ok', 'message': 'Nyay Sahyog API is running'}, 200
     
+    print(timer.report())
+    app.config['STARTUP_TIMINGS'] = dict(timer.phases)
     return app
 
+
+def register_cli(app):
+    """flask CLI commands for one-off setup tasks"""
+    import click
+    
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Run the schema DDL regardless of the recorded version"""
+        db.create_tables()
+        db.ensure_schema()
+        click.echo(f"✅ Database schema is at version {SCHEMA_VERSION}")
+    
+    @app.cli.command('seed-admin')
+    @click.option('--username', default='admin', show_default=True)
+    @click.option('--email', default='admin@nyaysahyog.com', show_default=True)
+    @click.option('--password', envvar='ADMIN_PASSWORD', default='admin123', show_default=True,
+                  help='Defaults to $ADMIN_PASSWORD when set')
+    def seed_admin_command(username, email, password):
+        """Create the admin user if it doesn't exist"""
+        from werkzeug.security import generate_password_hash
+        from db_access import create_user, get_user_by_username
+        
+        db.ensure_schema()
+        if get_user_by_username(username):
+            click.echo(f"ℹ️  Admin user '{username}' already exists")
+            return
+        create_user({
+            'username': username,
+            'email': email,
+            'password_hash': generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD']),
+            'role': 'admin',
+            'full_name': 'System Administrator',
+            'is_verified': True,
+            'is_active': True
+        })
+        click.echo(f"✅ Admin user created: username='{username}'")
+    
+    @app.cli.command('rollup-backfill')
+    def rollup_backfill_command():
+        """Rebuild the booking_daily_rollup analytics table from bookings"""
+        from db_access import rebuild_booking_rollup
+        
+        db.ensure_schema()
+        rows = rebuild_booking_rollup()
+        click.echo(f"✅ Booking rollup rebuilt: {rows} rows")
+    
+    @app.cli.command('provider-search-backfill')
+    def provider_search_backfill_command():
+        """Rebuild the provider_search listing table from providers and users"""
+        from db_access import rebuild_provider_search
+        
+        db.ensure_schema()
+        rows = rebuild_provider_search()
+        click.echo(f"✅ Provider search table rebuilt: {rows} rows")
+
 if __name__ == '__main__':
+    # Development server only; production runs wsgi.py under gunicorn or waitress
     app = create_app()
     port = int(os.environ.get('PORT', 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
+    app.run(debug=os.environ.get('FLASK_DEBUG', 'true').lower() == 'true', host='0.0.0.0', port=port)
 
@@ -0,0 +1,165 @@
+"""ASGI entry point: async provider listing routes, everything else via the Flask app
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+The public, read-heavy provider routes (GET /api/providers, /api/providers/<id>,
+/api/providers/specializations, /api/providers/stats) are served natively on the
+event loop with async_db_access, so a slow query holds a pool thread instead of a
+server thread. Every other request is passed unchanged to the Flask app through
+asgiref's WsgiToAsgi adapter, running on a pool of ASGI_WSGI_THREADS threads (the
+stock adapter runs every WSGI request on one shared thread). Responses match the
+Flask routes byte for byte (same helpers from providers.py, same JSON provider).
+
+The async routes are exempt from admission control (admission.py hooks into
+Flask only): their concurrency is already bounded by ASYNC_DB_THREADS, they
+queue on that pool instead of holding a server thread, and the connection pool
+is sized so they can never take the connections the Flask routes need.
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from werkzeug.datastructures import MultiDict
+from app import create_app
+from admin import ADMIN_FANOUT_THREADS
+from admission import admission
+from db_connection import db
+from password_hashing import password_hasher
+from providers import parse_provider_search_args, format_provider_detail, is_listed
+import async_db_access
+
+# Threads running Flask (WSGI) requests per process
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 8))
+
+_wsgi_executor = None
+_wsgi_executor_pid = None
+_wsgi_executor_lock = threading.Lock()
+
+
+def _get_wsgi_executor():
+    """Thread pool for Flask requests in this process (a pool inherited across fork has no threads)"""
+    global _wsgi_executor, _wsgi_executor_pid
+    with _wsgi_executor_lock:
+        if _wsgi_executor is None or _wsgi_executor_pid != os.getpid():
+            _wsgi_executor = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix='asgi-wsgi')
+            _wsgi_executor_pid = os.getpid()
+        return _wsgi_executor
+
+
+class PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """WsgiToAsgiInstance that runs the WSGI app on the WSGI thread pool instead of one shared thread"""
+
+    async def run_wsgi_app(self, body):
+        run = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+        return await sync_to_async(run, thread_sensitive=False, executor=_get_wsgi_executor())(self, body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi adapter whose requests run concurrently on ASGI_WSGI_THREADS threads"""
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiToAsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+flask_app = create_app()
+wsgi_app = PooledWsgiToAsgi(flask_app)
+admission.set_threads(ASGI_WSGI_THREADS)
+
+# Every Flask thread (plus its admin fan-out) and every async DB thread may hold a pooled connection at once
+db.pool_max = max(db.pool_max, ASGI_WSGI_THREADS + ADMIN_FANOUT_THREADS + async_db_access.ASYNC_DB_THREADS)
+
+
+async def list_providers(args):
+    """GET /api/providers"""
+    return 200, await async_db_access.get_providers_search(**parse_provider_search_args(args))
+
+
+async def provider_detail(args, provider_id):
+    """GET /api/providers/<id>"""
+    provider = await async_db_access.get_provider_by_id(int(provider_id))
+    if not provider:
+        return 404, {'error': 'Provider not found'}
+    user = await async_db_access.get_user_by_id(provider['user_id'])
+    if not is_listed(provider, user):
+        return 404, {'error': 'Provider not found'}
+    return 200, format_provider_detail(provider, user)
+
+
+async def specializations(args):
+    """GET /api/providers/specializations"""
+    return 200, {'specializations': await async_db_access.get_specializations()}
+
+
+async def provider_stats(args):
+    """GET /api/providers/stats"""
+    return 200, await async_db_access.get_provider_stats()
+
+
+ASYNC_ROUTES = [
+    (re.compile(r'^/api/providers$'), list_providers),
+    (re.compile(r'^/api/providers/specializations$'), specializations),
+    (re.compile(r'^/api/providers/stats$'), provider_stats),
+    (re.compile(r'^/api/providers/(\d+)$'), provider_detail),
+]
+
+
+def _match(scope):
+    if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+        return None, None
+    for pattern, handler in ASYNC_ROUTES:
+        match = pattern.match(scope['path'])
+        if match:
+            return handler, match.groups()
+    return None, None
+
+
+async def _send_json(scope, send, status, data):
+    # Flask's own JSON provider, so key order, separators and date formats match jsonify
+    body = flask_app.json.response(data).get_data()
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    # Same CORS behaviour as CORS(app) for simple GET requests
+    if any(name == b'origin' for name, _ in scope.get('headers', [])):
+        headers.append((b'access-control-allow-origin', b'*'))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+
+
+def _shutdown_wsgi_executor():
+    global _wsgi_executor
+    with _wsgi_executor_lock:
+        if _wsgi_executor is not None and _wsgi_executor_pid == os.getpid():
+            _wsgi_executor.shutdown(wait=False)
+        _wsgi_executor = None
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            async_db_access.shutdown()
+            _shutdown_wsgi_executor()
+            password_hasher.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    handler, params = _match(scope)
+    if handler is None:
+        return await wsgi_app(scope, receive, send)
+
+    args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+    try:
+        status, data = await handler(args, *params)
+    except Exception as e:
+        status, data = 500, {'error': str(e)}
+    await _send_json(scope, send, status, data)
@@ -0,0 +1,78 @@
+"""Async facade over db_access for the ASGI server (asgi.py)
+
+The db_access functions are blocking, so each call runs on a bounded thread pool
+while the event loop keeps accepting requests: thousands of requests can be in
+flight per process while at most ASYNC_DB_THREADS queries (and pooled
+connections) are active. Identical read calls that are already in flight are
+coalesced into one query, so a burst of the same provider listing hits the
+database once.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import db_access
+
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 16))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Thread pool for this process (a pool inherited across fork has no threads)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=ASYNC_DB_THREADS, thread_name_prefix='async-db')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def shutdown():
+    """Stop the thread pool (ASGI lifespan shutdown)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Run a blocking function on the DB thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def _offload(fn, coalesce=False):
+    """Async version of a db_access function; coalesce=True shares in-flight results of identical calls"""
+    if not coalesce:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await run_sync(fn, *args, **kwargs)
+        return wrapper
+
+    # One dict per event loop thread; only touched from the loop, so no lock is needed
+    inflight = {}
+
+    @functools.wraps(fn)
+    async def coalesced(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        future = inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(run_sync(fn, *args, **kwargs))
+            inflight[key] = future
+            future.add_done_callback(lambda _: inflight.pop(key, None))
+        # shield: a cancelled (disconnected) caller must not cancel the query for the others
+        return await asyncio.shield(future)
+    return coalesced
+
+
+# Read-heavy public lookups
+get_providers_search = _offload(db_access.get_providers_search, coalesce=True)
+get_provider_by_id = _offload(db_access.get_provider_by_id, coalesce=True)
+get_user_by_id = _offload(db_access.get_user_by_id, coalesce=True)
+get_specializations = _offload(db_access.get_specializations, coalesce=True)
+get_provider_stats = _offload(db_access.get_provider_stats, coalesce=True)
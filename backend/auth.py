@@ -3,8 +3,13 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from db_access import (
     create_user, get_user_by_username, get_user_by_email, get_user_by_id,
-    update_user, check_password, create_provider, get_provider_by_user_id
+    update_user, create_provider, get_provider_by_user_id, bump_token_version
 )
+from auth_context import get_auth_context, token_claims, user_state_cache
+from token_revocation import revocation_list
+from datetime import datetime
+from password_hashing import password_hasher, HashingBusyError, busy_response
+from rate_limit import login_limiter, throttled_response
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -37,11 +42,11 @@ def register():
         if get_user_by_email(data['email']):
             return jsonify({'error': 'Email already exists'}), 400
         
-        # Create new user
+        # Create new user (hash off the request thread)
         user_data = {
             'username': data['username'],
             'email': data['email'],
-            'password': data['password'],
+            'password_hash': password_hasher.hash(data['password']),
             'role': data['role'],
             'full_name': data['full_name'],
             'phone': data.get('phone'),
@@ -52,8 +57,8 @@ def register():
             'is_verified': False,
             'is_active': True
         }
-        user_id = create_user(user_data)
-        user = get_user_by_id(user_id)
+        user = create_user(user_data, returning=True)
+        user_id = user['id']
         
         # Create provider profile if role is a provider type
         provider_roles = ['advocate', 'mediator', 'arbitrator', 'notary', 'document_writer']
@@ -73,7 +78,7 @@ def register():
             create_provider(provider_data)
         
         # Create access token (identity must be string)
-        access_token = create_access_token(identity=str(user_id), additional_claims={'role': user['role']})
+        access_token = create_access_token(identity=str(user_id), additional_claims=token_claims(user))
         
         print(f"✅ User registered successfully: {user['username']} (ID: {user_id})")
         
@@ -100,6 +105,8 @@ def register():
             'access_token': access_token
         }), 201
         
+    except HashingBusyError as e:
+        return busy_response(e)
     except Exception as e:
         print(f"❌ Registration error: {str(e)}")
         import traceback
@@ -113,19 +120,33 @@ def login():
     try:
         data = request.get_json()
         
-        if not data or not data.get('username') or not data.get('password'):
+        if not isinstance(data, dict) or not data.get('username') or not data.get('password'):
             return jsonify({'error': 'Username and password are required'}), 400
+        if not isinstance(data['username'], str) or not isinstance(data['password'], str):
+            return jsonify({'error': 'Username and password must be strings'}), 400
+        
+        # Throttle before any DB lookup or hash work
+        wait = login_limiter.check(data['username'], request.remote_addr)
+        if wait:
+            return throttled_response(wait)
         
         user = get_user_by_username(data['username'])
         
-        if not user or not check_password(user, data['password']):
+        if not user or not password_hasher.verify(user['password_hash'], data['password']):
             return jsonify({'error': 'Invalid username or password'}), 401
         
         if not user.get('is_active', True):
             return jsonify({'error': 'Account is deactivated'}), 403
         
+        # Transparently upgrade hashes made with older KDF parameters
+        if password_hasher.needs_rehash(user['password_hash']):
+            try:
+                update_user(user['id'], {'password_hash': password_hasher.hash(data['password'])})
+            except HashingBusyError:
+                pass  # Retry on a later login rather than failing this one
+        
         # Create access token (identity must be string)
-        access_token = create_access_token(identity=str(user['id']), additional_claims={'role': user['role']})
+        access_token = create_access_token(identity=str(user['id']), additional_claims=token_claims(user))
         
         # Format user dict for response
         user_dict = {
@@ -150,6 +171,23 @@ def login():
             'access_token': access_token
         }), 200
         
+    except HashingBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """Revoke the current access token"""
+    try:
+        claims = get_jwt()
+        auth = get_auth_context()
+        revocation_list.revoke(claims['jti'], auth.user_id if auth else None,
+                               datetime.utcfromtimestamp(claims['exp']))
+        return jsonify({'message': 'Logged out successfully'}), 200
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -226,13 +264,10 @@ def get_profile():
 def update_profile():
     """Update current user profile"""
     try:
-        user_id_str = get_jwt_identity()
-        user_id = int(user_id_str) if user_id_str else None
-        if not user_id:
+        auth = get_auth_context()
+        if not auth:
             return jsonify({'error': 'Invalid user ID in token'}), 401
-        user = get_user_by_id(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user_id = auth.user_id
         
         data = request.get_json()
         
@@ -244,8 +279,11 @@ def update_profile():
                 update_data[field] = data[field]
         
         if update_data:
-            update_user(user_id, update_data)
+            user = update_user(user_id, update_data, returning=True)
+        else:
             user = get_user_by_id(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         
         response_data = {
             'id': user['id'],
@@ -310,13 +348,20 @@ def change_password():
         if not data.get('old_password') or not data.get('new_password'):
             return jsonify({'error': 'Old password and new password are required'}), 400
         
-        if not check_password(user, data['old_password']):
+        if not password_hasher.verify(user['password_hash'], data['old_password']):
             return jsonify({'error': 'Invalid old password'}), 401
         
-        update_user(user_id, {'password': data['new_password']})
+        update_user(user_id, {'password_hash': password_hasher.hash(data['new_password'])})
+        
+        # Invalidate every token issued before the change, then hand back a fresh one
+        user['token_version'] = bump_token_version(user_id)
+        user_state_cache.set_state(user_id, token_version=user['token_version'])
+        access_token = create_access_token(identity=str(user_id), additional_claims=token_claims(user))
         
-        return jsonify({'message': 'Password changed successfully'}), 200
+        return jsonify({'message': 'Password changed successfully', 'access_token': access_token}), 200
         
+    except HashingBusyError as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
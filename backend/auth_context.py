@@ -0,0 +1,147 @@
+"""Per-request authorization context built from JWT claims
+
+Access tokens carry the user's role, token version ('tv') and active flag, so
+handlers can authorize a request without loading the user row. Tokens are
+invalidated without a DB round trip by UserStateCache: an in-process set of
+deactivated user ids plus the current token version of every user that has
+bumped it (e.g. by changing their password). The cache is loaded once and then
+refreshed incrementally from users.updated_at every AUTH_STATE_REFRESH_SECONDS,
+so a deactivation made by another worker takes effect within that window.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import g
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from db_access import get_user_auth_states
+
+PROVIDER_ROLES = ['advocate', 'mediator', 'arbitrator', 'notary', 'document_writer']
+
+# Re-read rows changed slightly before the previous refresh to cover in-flight writes
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+class AuthContext:
+    """Identity and role of the caller, taken from the verified access token"""
+
+    __slots__ = ('user_id', 'role', 'token_version', 'jti')
+
+    def __init__(self, user_id, role, token_version=0, jti=None):
+        self.user_id = user_id
+        self.role = role
+        self.token_version = token_version
+        self.jti = jti
+
+    @property
+    def is_client(self):
+        return self.role == 'client'
+
+    @property
+    def is_provider(self):
+        return self.role in PROVIDER_ROLES
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+
+def token_claims(user):
+    """Additional JWT claims for a user row"""
+    return {
+        'role': user['role'],
+        'tv': user.get('token_version') or 0,
+        'active': bool(user.get('is_active', True)),
+    }
+
+
+def get_auth_context():
+    """AuthContext for the current request (requires a verified JWT); None if the identity is unusable"""
+    if 'auth_context' not in g:
+        claims = get_jwt()
+        identity = get_jwt_identity()
+        try:
+            user_id = int(identity) if identity else None
+        except (TypeError, ValueError):
+            user_id = None
+        g.auth_context = AuthContext(user_id, claims.get('role'), claims.get('tv', 0), claims.get('jti')) if user_id else None
+    return g.auth_context
+
+
+class UserStateCache:
+    """Deactivated users and token versions, checked in O(1) for every authenticated request"""
+
+    def __init__(self, refresh_seconds=30):
+        self.refresh_seconds = refresh_seconds
+        self._deactivated = set()
+        self._token_versions = {}
+        self._loaded_at = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Apply AUTH_STATE_* settings from the app config"""
+        self.refresh_seconds = app.config.get('AUTH_STATE_REFRESH_SECONDS', 30)
+
+    def _apply(self, row):
+        if row['is_active']:
+            self._deactivated.discard(row['id'])
+        else:
+            self._deactivated.add(row['id'])
+        if row['token_version']:
+            self._token_versions[row['id']] = row['token_version']
+        else:
+            self._token_versions.pop(row['id'], None)
+
+    def refresh(self, force=False):
+        """Reload changed users; full load the first time, then only rows updated since the last refresh"""
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        with self._lock:
+            if not force and now < self._next_refresh:
+                return
+            self._next_refresh = now + self.refresh_seconds
+            started = datetime.utcnow()
+            since = self._loaded_at - REFRESH_OVERLAP if self._loaded_at else None
+            try:
+                rows = get_user_auth_states(updated_since=since)
+            except Exception as e:
+                # Keep serving from the last known state; the next refresh retries
+                print(f"⚠️  Auth state refresh failed: {e}")
+                return
+            for row in rows:
+                self._apply(row)
+            self._loaded_at = started
+
+    def set_state(self, user_id, is_active=None, token_version=None):
+        """Record a change made by this worker immediately, without waiting for the refresh"""
+        with self._lock:
+            if is_active is not None:
+                if is_active:
+                    self._deactivated.discard(user_id)
+                else:
+                    self._deactivated.add(user_id)
+            if token_version is not None:
+                self._token_versions[user_id] = token_version
+
+    def is_revoked(self, jwt_payload):
+        """True when the token's user is deactivated or the token predates a version bump"""
+        self.refresh()
+        try:
+            user_id = int(jwt_payload.get('sub'))
+        except (TypeError, ValueError):
+            return True
+        if not jwt_payload.get('active', True) or user_id in self._deactivated:
+            return True
+        return jwt_payload.get('tv', 0) < self._token_versions.get(user_id, 0)
+
+    def clear(self):
+        with self._lock:
+            self._deactivated.clear()
+            self._token_versions.clear()
+            self._loaded_at = None
+            self._next_refresh = 0.0
+
+
+# Global user state cache
+user_state_cache = UserStateCache()
@@ -0,0 +1,178 @@
+"""Provider availability rules: booking intervals and weekly working hours
+
+All booking times are stored as naive UTC. A booking occupies
+[booking_date, end_time) and pending/confirmed bookings block that interval.
+Overlap checks run on the (provider_id, booking_date, end_time) index and are
+bounded below by `booking_date > start - MAX_BOOKING_MINUTES`, so a check only
+touches the handful of bookings near the requested slot instead of the
+provider's whole history.
+
+Working hours are a weekly template per provider profile: windows of
+(weekday, start, end) in UTC, weekday 0 = Monday. A provider without a template
+can be booked at any time.
+
+free_slots sweeps a provider's merged busy intervals against its open windows,
+so the bulk slot finder needs just one busy-interval query for all providers.
+"""
+from datetime import datetime, timedelta, timezone
+
+# Statuses that occupy the provider's time
+BLOCKING_STATUSES = ('pending', 'confirmed')
+
+# Upper bound on a single booking; also bounds the overlap range scan
+MAX_BOOKING_MINUTES = 8 * 60
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def normalize_datetime(value):
+    """Parse an ISO 8601 string or datetime into a naive UTC datetime (no offset means UTC)"""
+    if isinstance(value, str):
+        value = value.strip()
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        raise ValueError('Expected an ISO 8601 date-time')
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def booking_end(start, duration_minutes):
+    """End of a booking starting at start"""
+    return start + timedelta(minutes=duration_minutes or 0)
+
+
+def validate_duration(duration_minutes):
+    """Duration in minutes as an int; raises ValueError outside 1..MAX_BOOKING_MINUTES"""
+    if isinstance(duration_minutes, bool) or not isinstance(duration_minutes, (int, float)) \
+            or duration_minutes != int(duration_minutes):
+        raise ValueError('duration_minutes must be a whole number of minutes')
+    duration_minutes = int(duration_minutes)
+    if not 1 <= duration_minutes <= MAX_BOOKING_MINUTES:
+        raise ValueError(f'duration_minutes must be between 1 and {MAX_BOOKING_MINUTES}')
+    return duration_minutes
+
+
+def slot_position(start, end):
+    """(weekday, start_minute, end_minute) of a slot within its start day; end_minute may pass midnight"""
+    start_minute = start.hour * 60 + start.minute
+    day_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    end_minute = int((end - day_start).total_seconds() // 60) + (1 if end.second or end.microsecond else 0)
+    return start.weekday(), start_minute, end_minute
+
+
+def parse_clock(value):
+    """'HH:MM' -> minutes from midnight ('24:00' allowed as end of day)"""
+    try:
+        hours, minutes = str(value).split(':')
+        hours, minutes = int(hours), int(minutes)
+    except ValueError:
+        raise ValueError(f'Invalid time {value!r}, expected HH:MM')
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > MINUTES_PER_DAY:
+        raise ValueError(f'Invalid time {value!r}, expected HH:MM')
+    return hours * 60 + minutes
+
+
+def format_clock(minutes):
+    """Minutes from midnight -> 'HH:MM'"""
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def parse_working_hours(windows):
+    """Validate [{'weekday', 'start', 'end'}, ...] into sorted (weekday, start_minute, end_minute) tuples"""
+    if not isinstance(windows, list):
+        raise ValueError('working_hours must be a list')
+    parsed = []
+    for window in windows:
+        if not isinstance(window, dict):
+            raise ValueError('Each working hours entry must be an object')
+        weekday = window.get('weekday')
+        if isinstance(weekday, bool) or not isinstance(weekday, int) or not 0 <= weekday <= 6:
+            raise ValueError('weekday must be an integer from 0 (Monday) to 6 (Sunday)')
+        start, end = parse_clock(window.get('start')), parse_clock(window.get('end'))
+        if start >= end:
+            raise ValueError('Working hours start must be before end')
+        parsed.append((weekday, start, end))
+    parsed.sort()
+    for previous, current in zip(parsed, parsed[1:]):
+        if previous[0] == current[0] and current[1] < previous[2]:
+            raise ValueError('Working hours windows overlap')
+    return parsed
+
+
+def format_working_hours(rows):
+    """Working hours rows -> API representation"""
+    return [{
+        'weekday': row['weekday'],
+        'start': format_clock(row['start_minute']),
+        'end': format_clock(row['end_minute'])
+    } for row in rows]
+
+
+def _ceil_to_step(value, step_minutes):
+    """Round a datetime up to the next multiple of step_minutes after midnight"""
+    day_start = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    seconds = (value - day_start).total_seconds()
+    step = step_minutes * 60
+    return day_start + timedelta(seconds=-(-seconds // step) * step)
+
+
+def open_windows(working_hours, range_start, range_end):
+    """Bookable windows within [range_start, range_end) from a working-hours template (all of it without one)"""
+    if not working_hours:
+        return [(range_start, range_end)]
+    by_weekday = {}
+    for row in working_hours:
+        by_weekday.setdefault(row['weekday'], []).append((row['start_minute'], row['end_minute']))
+    windows = []
+    day = range_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < range_end:
+        for start_minute, end_minute in sorted(by_weekday.get(day.weekday(), ())):
+            start = max(range_start, day + timedelta(minutes=start_minute))
+            end = min(range_end, day + timedelta(minutes=end_minute))
+            if start < end:
+                windows.append((start, end))
+        day += timedelta(days=1)
+    return windows
+
+
+def merge_intervals(intervals):
+    """Merge (start, end) intervals sorted by start into disjoint ordered intervals"""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_slots(busy, windows, duration_minutes, limit, step_minutes=30):
+    """Earliest `limit` slots of duration_minutes inside windows that avoid the busy intervals
+
+    busy and windows are (start, end) lists sorted by start. The busy intervals are
+    merged, then a single sweep walks both lists in order; slot starts are aligned
+    to step_minutes.
+    """
+    busy = merge_intervals(busy)
+    duration = timedelta(minutes=duration_minutes)
+    step = timedelta(minutes=step_minutes)
+    slots = []
+    index = 0
+    for window_start, window_end in windows:
+        cursor = _ceil_to_step(window_start, step_minutes)
+        while cursor + duration <= window_end:
+            # Skip busy intervals that ended before the cursor; never revisited
+            while index < len(busy) and busy[index][1] <= cursor:
+                index += 1
+            if index < len(busy) and busy[index][0] < cursor + duration:
+                cursor = _ceil_to_step(busy[index][1], step_minutes)
+                continue
+            slots.append((cursor, cursor + duration))
+            if len(slots) >= limit:
+                return slots
+            cursor += step
+    return slots
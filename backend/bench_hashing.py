@@ -0,0 +1,83 @@
+"""Benchmark password verification / login throughput per core
+
+Usage:
+    python bench_hashing.py [--logins 200] [--concurrency 16] [--workers N] [--method scrypt:32768:8:1]
+
+Runs against a throwaway SQLite database:
+  1. inline check_password_hash on one thread (the old request-thread behaviour)
+  2. PasswordHasher.verify on the process pool
+  3. POST /api/auth/login through the Flask test client from concurrent threads
+and prints operations/second and operations/second/core for each.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _rate(label, count, elapsed, cores):
+    per_second = count / elapsed if elapsed else float('inf')
+    print(f"{label:<38} {count:>6} ops in {elapsed:6.2f}s  {per_second:8.1f}/s  {per_second / cores:8.1f}/s/core")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark login/KDF throughput')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Hashing processes (the server default is min(2, CPU count))')
+    parser.add_argument('--method', default=None, help='KDF method (default: PASSWORD_HASH_METHOD)')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp_dir, 'bench.db')
+    os.environ['PASSWORD_HASH_WORKERS'] = str(args.workers)
+    os.environ['PASSWORD_HASH_QUEUE_DEPTH'] = str(max(args.concurrency, args.workers) * 2)
+    if args.method:
+        os.environ['PASSWORD_HASH_METHOD'] = args.method
+
+    from werkzeug.security import check_password_hash
+    from app import create_app
+    from db_access import create_user
+    from password_hashing import password_hasher
+
+    app = create_app()
+    client = app.test_client()
+    cores = args.workers or 1
+    password = 'bench-password'
+    password_hash = password_hasher.hash(password)
+    create_user({'username': 'bench', 'email': 'bench@example.com', 'password_hash': password_hash,
+                 'role': 'client', 'full_name': 'Bench User'})
+
+    print(f"KDF method: {password_hasher.method}, hashing workers: {args.workers}, "
+          f"concurrency: {args.concurrency}, cpu_count: {os.cpu_count()}\n")
+
+    count = max(10, args.logins // 10)
+    started = time.perf_counter()
+    for _ in range(count):
+        check_password_hash(password_hash, password)
+    _rate('inline check_password_hash (1 thread)', count, time.perf_counter() - started, 1)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        password_hasher.verify(password_hash, password)  # warm the process pool
+        started = time.perf_counter()
+        list(pool.map(lambda _: password_hasher.verify(password_hash, password), range(args.logins)))
+        _rate('PasswordHasher.verify (pool)', args.logins, time.perf_counter() - started, cores)
+
+        def login(_):
+            return client.post('/api/auth/login', json={'username': 'bench', 'password': password}).status_code
+
+        started = time.perf_counter()
+        statuses = list(pool.map(login, range(args.logins)))
+        _rate('POST /api/auth/login', args.logins, time.perf_counter() - started, cores)
+
+    rejected = sum(1 for s in statuses if s == 503)
+    if rejected:
+        print(f"\n{rejected} logins were shed with 503 (queue depth {password_hasher.queue_depth})")
+    password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
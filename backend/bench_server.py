@@ -0,0 +1,148 @@
+"""Benchmark request throughput of the dev server vs. the production servers (WSGI and ASGI)
+
+Usage:
+    python bench_server.py [--servers dev,waitress,gunicorn,uvicorn] [--duration 10] [--concurrency 32]
+                           [--path /api/providers?per_page=20] [--database-url URL]
+
+Seeds a throwaway SQLite database with generate_data (unless --database-url is
+given), starts each server on a free port, drives it with --concurrency
+keep-alive HTTP clients for --duration seconds and prints requests/second and
+latency percentiles. Results are recorded in DEPLOYMENT.md.
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _server_command(server, port):
+    if server == 'dev':
+        return [sys.executable, 'app.py']
+    if server == 'waitress':
+        return [sys.executable, 'wsgi.py']
+    if server == 'uvicorn':
+        return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                '--log-level', 'warning', '--no-access-log']
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'wsgi:app']
+    raise ValueError(f'Unknown server: {server}')
+
+
+def _wait_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not become ready')
+
+
+def _drive(port, path, duration, concurrency):
+    """Run keep-alive clients until duration elapses; returns (latencies, errors)"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise RuntimeError(response.status)
+                local.append(time.perf_counter() - started)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0]
+
+
+def _percentile(values, pct):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dev server vs. gunicorn/waitress/uvicorn')
+    parser.add_argument('--servers', default='dev,waitress,gunicorn')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--path', default='/api/providers?per_page=20')
+    parser.add_argument('--database-url', default=None, help='Benchmark an existing database instead of seeding one')
+    parser.add_argument('--workers', type=int, default=None, help='gunicorn workers (default: gunicorn.conf.py)')
+    parser.add_argument('--threads', type=int, default=None, help='gunicorn/waitress threads per worker')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.database_url:
+        env['DATABASE_URL'] = args.database_url
+    else:
+        env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        os.environ['DATABASE_URL'] = env['DATABASE_URL']
+        from generate_data import generate
+        from db_connection import db
+        db.ensure_schema()
+        generate(clients=2000, providers=500, bookings=5000)
+    env['FLASK_DEBUG'] = 'false'
+    env.setdefault('GUNICORN_ACCESS_LOG', '/dev/null')
+    if args.workers:
+        env['WEB_CONCURRENCY'] = str(args.workers)
+    if args.threads:
+        env['GUNICORN_THREADS'] = env['WAITRESS_THREADS'] = str(args.threads)
+
+    print(f"\nGET {args.path}  concurrency={args.concurrency}  duration={args.duration}s  cpu_count={os.cpu_count()}\n")
+    print(f"{'server':<10} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for server in [s.strip() for s in args.servers.split(',') if s.strip()]:
+        port = _free_port()
+        env['PORT'] = str(port)
+        process = subprocess.Popen(_server_command(server, port), cwd=BASE_DIR, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_ready(port)
+            _drive(port, args.path, 1, args.concurrency)  # warm-up
+            latencies, errors = _drive(port, args.path, args.duration, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        print(f"{server:<10} {len(latencies):>9} {len(latencies) / args.duration:>9.1f} "
+              f"{_percentile(latencies, 50) * 1000:>8.1f} {_percentile(latencies, 95) * 1000:>8.1f} "
+              f"{_percentile(latencies, 99) * 1000:>8.1f} {errors:>7}")
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, BASE_DIR)
+    main()
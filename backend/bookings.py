@@ -1,33 +1,109 @@
 """Booking routes"""
+import base64
+import json
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import jwt_required
 from db_access import (
-    get_user_by_id, get_provider_by_user_id, get_provider_by_id,
-    create_booking, get_booking_by_id, get_bookings_by_client_id,
-    get_bookings_by_provider_id, get_all_bookings, update_booking
+    get_user_by_id, create_booking_validated, get_booking_by_id, get_user_bookings_page,
+    get_user_booking_status_counts, get_all_bookings, update_booking as db_update_booking,
+    update_booking_validated, get_booking_states, update_bookings_status, BOOKING_STATUSES
 )
+from auth_context import get_auth_context
+from availability import BLOCKING_STATUSES, normalize_datetime, validate_duration, booking_end
+from idempotency import idempotent
 from datetime import datetime
 
 bookings_bp = Blueprint('bookings', __name__)
 
+# Booking scheduling error code (create_booking_validated) -> (message, status)
+BOOKING_ERRORS = {
+    'client_inactive': ('Account is not active', 403),
+    'provider_not_found': ('Provider not found', 404),
+    'provider_profile_not_found': ('Provider profile not found', 404),
+    'provider_unavailable': ('Provider is not available', 400),
+    'outside_working_hours': ('Requested time is outside the provider\'s working hours', 400),
+    'slot_unavailable': ('Provider already has a booking at this time', 409),
+}
+
+# Legal bulk status transitions (POST /api/bookings/bulk-update): current status -> allowed targets
+BOOKING_TRANSITIONS = {
+    'pending': {'confirmed', 'cancelled'},
+    'confirmed': {'completed', 'cancelled'},
+    'completed': set(),
+    'cancelled': set(),
+}
+MAX_BULK_UPDATE_IDS = 500
+
+# GET /api/bookings page sizes
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _encode_cursor(booking):
+    """Opaque keyset cursor for the row after which the next page starts"""
+    booking_date = booking['booking_date']
+    if isinstance(booking_date, datetime):
+        booking_date = booking_date.isoformat()
+    payload = json.dumps([booking_date, booking['id']]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """(booking_date, id) from a cursor made by _encode_cursor"""
+    try:
+        booking_date, booking_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return normalize_datetime(booking_date), int(booking_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def format_booking_list_item(b):
+    """Booking row from get_user_bookings_page with its client and provider"""
+    return {
+        'id': b['id'],
+        'client_id': b['client_id'],
+        'client': {
+            'id': b['client_id'],
+            'username': b['client_username'],
+            'email': b['client_email'],
+            'full_name': b['client_full_name']
+        } if b.get('client_username') is not None else None,
+        'provider_id': b['provider_id'],
+        'provider': {
+            'id': b['provider_id'],
+            'username': b['provider_username'],
+            'email': b['provider_email'],
+            'full_name': b['provider_full_name']
+        } if b.get('provider_username') is not None else None,
+        'provider_profile_id': b['provider_profile_id'],
+        'service_type': b.get('service_type'),
+        'booking_date': b['booking_date'].isoformat() if isinstance(b['booking_date'], datetime) else b.get('booking_date'),
+        'duration_minutes': b.get('duration_minutes', 60),
+        'fee': float(b.get('fee', 0.0)),
+        'status': b.get('status', 'pending'),
+        'description': b.get('description'),
+        'meeting_link': b.get('meeting_link'),
+        'location': b.get('location'),
+        'created_at': b.get('created_at').isoformat() if b.get('created_at') else None,
+        'updated_at': b.get('updated_at').isoformat() if b.get('updated_at') else None
+    }
+
 
 @bookings_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_booking():
-    """Create a new booking"""
+    """Create a new booking (send an Idempotency-Key header to make retries safe)"""
     try:
-        user_id_str = get_jwt_identity()
-        user_id = int(user_id_str) if user_id_str else None
-        if not user_id:
+        auth = get_auth_context()
+        if not auth:
             return jsonify({'error': 'Invalid user ID in token'}), 401
-        user = get_user_by_id(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user_id = auth.user_id
         
-        print(f"📅 Booking request from user {user_id} ({user['username']}, role: {user['role']})")
+        print(f"📅 Booking request from user {user_id} (role: {auth.role})")
         
         # Only clients can create bookings
-        if user['role'] != 'client':
+        if not auth.is_client:
             return jsonify({'error': 'Only clients can create bookings'}), 403
         
         data = request.get_json()
@@ -42,54 +118,38 @@ def create_booking():
             if field not in data:
                 return jsonify({'error': f'{field} is required'}), 400
         
-        provider = get_user_by_id(data['provider_id'])
-        if not provider:
-            return jsonify({'error': 'Provider not found'}), 404
-        
-        provider_profile = get_provider_by_user_id(provider['id'])
-        if not provider_profile:
-            return jsonify({'error': 'Provider profile not found'}), 404
-        
-        if not provider.get('is_active', True) or not provider_profile.get('is_active', True):
-            return jsonify({'error': 'Provider is not available'}), 400
-        
-        # Parse booking date - handle multiple formats
-        booking_date_str = data['booking_date']
+        # Parse booking date; stored as naive UTC (no offset means UTC)
         try:
-            # Try ISO format first
-            if 'T' in booking_date_str:
-                # Remove 'Z' and replace with '+00:00' if needed
-                if booking_date_str.endswith('Z'):
-                    booking_date_str = booking_date_str[:-1] + '+00:00'
-                elif '+' not in booking_date_str and '-' not in booking_date_str[-6:]:
-                    # No timezone, assume UTC
-                    booking_date_str = booking_date_str + '+00:00'
-                booking_date = datetime.fromisoformat(booking_date_str)
-            else:
-                # Try parsing as regular datetime string
-                booking_date = datetime.fromisoformat(booking_date_str)
+            booking_date = normalize_datetime(data['booking_date'])
         except Exception as e:
-            print(f"❌ Date parsing error: {e}, input: {booking_date_str}")
+            print(f"❌ Date parsing error: {e}, input: {data['booking_date']}")
             return jsonify({'error': f'Invalid booking_date format: {str(e)}. Use ISO 8601 format (YYYY-MM-DDTHH:MM:SS)'}), 400
         
-        # Create booking
+        try:
+            duration_minutes = validate_duration(data.get('duration_minutes', 60))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Provider, working-hours and overlap checks and the insert in a single statement
         booking_data = {
             'client_id': user_id,
-            'provider_id': provider['id'],
-            'provider_profile_id': provider_profile['id'],
+            'provider_id': data['provider_id'],
             'service_type': data['service_type'],
             'booking_date': booking_date,
-            'duration_minutes': data.get('duration_minutes', 60),
+            'duration_minutes': duration_minutes,
             'fee': data['fee'],
             'status': 'pending',
             'description': data.get('description'),
             'meeting_link': data.get('meeting_link'),
             'location': data.get('location')
         }
-        booking_id = create_booking(booking_data)
-        booking = get_booking_by_id(booking_id)
+        booking, error_code = create_booking_validated(booking_data)
+        if error_code:
+            message, status = BOOKING_ERRORS[error_code]
+            return jsonify({'error': message, 'code': error_code}), status
+        booking_id = booking['id']
         
-        print(f"✅ Booking created successfully: ID {booking_id} for client {user_id} with provider {provider['id']}")
+        print(f"✅ Booking created successfully: ID {booking_id} for client {user_id} with provider {booking['provider_id']}")
         
         # Format booking for response
         booking_dict = {
@@ -124,70 +184,53 @@ def create_booking():
 @bookings_bp.route('', methods=['GET'])
 @jwt_required()
 def get_bookings():
-    """Get bookings for current user"""
+    """Get bookings for current user (filters: status, from, to, upcoming; cursor pagination)"""
     try:
-        user_id_str = get_jwt_identity()
-        user_id = int(user_id_str) if user_id_str else None
-        if not user_id:
+        auth = get_auth_context()
+        if not auth:
             return jsonify({'error': 'Invalid user ID in token'}), 401
-        user = get_user_by_id(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        claims = get_jwt()
-        role = claims.get('role')
-        
-        # Query based on role
-        if role == 'client':
-            bookings = get_bookings_by_client_id(user_id)
-        elif role in ['advocate', 'mediator', 'arbitrator', 'notary', 'document_writer']:
-            bookings = get_bookings_by_provider_id(user_id)
-        else:
+        user_id = auth.user_id
+        
+        if not auth.is_client and not auth.is_provider:
             return jsonify({'error': 'Invalid role'}), 403
         
-        # Format bookings with user/provider info
-        bookings_data = []
-        for b in bookings:
-            try:
-                client = get_user_by_id(b['client_id'])
-                provider = get_user_by_id(b['provider_id'])
-                provider_profile = get_provider_by_id(b['provider_profile_id'])
-                
-                booking_dict = {
-                    'id': b['id'],
-                    'client_id': b['client_id'],
-                    'client': {
-                        'id': client['id'],
-                        'username': client['username'],
-                        'email': client['email'],
-                        'full_name': client['full_name']
-                    } if client else None,
-                    'provider_id': b['provider_id'],
-                    'provider': {
-                        'id': provider['id'],
-                        'username': provider['username'],
-                        'email': provider['email'],
-                        'full_name': provider['full_name']
-                    } if provider else None,
-                    'provider_profile_id': b['provider_profile_id'],
-                    'service_type': b.get('service_type'),
-                    'booking_date': b['booking_date'].isoformat() if isinstance(b['booking_date'], datetime) else b.get('booking_date'),
-                    'duration_minutes': b.get('duration_minutes', 60),
-                    'fee': float(b.get('fee', 0.0)),
-                    'status': b.get('status', 'pending'),
-                    'description': b.get('description'),
-                    'meeting_link': b.get('meeting_link'),
-                    'location': b.get('location'),
-                    'created_at': b.get('created_at').isoformat() if b.get('created_at') else None,
-                    'updated_at': b.get('updated_at').isoformat() if b.get('updated_at') else None
-                }
-                bookings_data.append(booking_dict)
-            except Exception as e:
-                print(f"Error converting booking {b.get('id')} to dict: {e}")
-                continue
+        args = request.args
+        statuses = [s.strip() for s in args.get('status', '').split(',') if s.strip()]
+        if any(s not in BOOKING_STATUSES for s in statuses):
+            return jsonify({'error': 'Invalid status'}), 400
+        
+        try:
+            date_from = normalize_datetime(args['from']) if args.get('from') else None
+            date_to = normalize_datetime(args['to']) if args.get('to') else None
+            after = _decode_cursor(args['cursor']) if args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Upcoming bookings read soonest first; everything else newest first
+        upcoming = args.get('upcoming', 'false').lower() == 'true'
+        if upcoming:
+            date_from = max(date_from, datetime.utcnow()) if date_from else datetime.utcnow()
+        limit = min(max(args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+        
+        rows = get_user_bookings_page(user_id, as_provider=auth.is_provider, statuses=statuses,
+                                      date_from=date_from, date_to=date_to, ascending=upcoming,
+                                      after=after, limit=limit)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        counts = get_user_booking_status_counts(user_id, as_provider=auth.is_provider,
+                                                date_from=date_from, date_to=date_to)
+        
+        bookings_data = [format_booking_list_item(b) for b in rows]
         
         return jsonify({
-            'bookings': bookings_data
+            'bookings': bookings_data,
+            'pagination': {
+                'limit': limit,
+                'has_more': has_more,
+                'next_cursor': _encode_cursor(rows[-1]) if has_more else None
+            },
+            'counts': dict({status: counts.get(status, 0) for status in BOOKING_STATUSES},
+                           total=sum(counts.values()))
         }), 200
         
     except Exception as e:
@@ -199,16 +242,10 @@ def get_bookings():
 def get_booking(booking_id):
     """Get a specific booking"""
     try:
-        user_id_str = get_jwt_identity()
-        user_id = int(user_id_str) if user_id_str else None
-        if not user_id:
+        auth = get_auth_context()
+        if not auth:
             return jsonify({'error': 'Invalid user ID in token'}), 401
-        user = get_user_by_id(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        claims = get_jwt()
-        role = claims.get('role')
+        user_id = auth.user_id
         
         booking = get_booking_by_id(booking_id)
         if not booking:
@@ -262,16 +299,10 @@ def get_booking(booking_id):
 def update_booking(booking_id):
     """Update booking status"""
     try:
-        user_id_str = get_jwt_identity()
-        user_id = int(user_id_str) if user_id_str else None
-        if not user_id:
+        auth = get_auth_context()
+        if not auth:
             return jsonify({'error': 'Invalid user ID in token'}), 401
-        user = get_user_by_id(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        claims = get_jwt()
-        role = claims.get('role')
+        user_id = auth.user_id
         
         booking = get_booking_by_id(booking_id)
         if not booking:
@@ -298,13 +329,24 @@ def update_booking(booking_id):
             update_data['location'] = data['location']
         if 'booking_date' in data:
             try:
-                update_data['booking_date'] = datetime.fromisoformat(data['booking_date'].replace('Z', '+00:00'))
+                update_data['booking_date'] = normalize_datetime(data['booking_date'])
             except:
                 return jsonify({'error': 'Invalid booking_date format'}), 400
-        
-        if update_data:
-            update_booking(booking_id, update_data)
-            booking = get_booking_by_id(booking_id)
+            update_data['end_time'] = booking_end(update_data['booking_date'], booking.get('duration_minutes') or 60)
+        
+        # A rescheduled or re-opened booking must not collide with the provider's other bookings;
+        # the schedule check and the update run in one transaction
+        blocking = update_data.get('status', booking.get('status')) in BLOCKING_STATUSES
+        if update_data and blocking and ('booking_date' in update_data or booking.get('status') not in BLOCKING_STATUSES):
+            start = update_data.get('booking_date') or normalize_datetime(booking['booking_date'])
+            end = update_data.get('end_time') or booking_end(start, booking.get('duration_minutes') or 60)
+            booking, error_code = update_booking_validated(booking_id, booking['provider_id'], update_data, start, end,
+                                                           check_working_hours='booking_date' in update_data)
+            if error_code:
+                message, status = BOOKING_ERRORS[error_code]
+                return jsonify({'error': message, 'code': error_code}), status
+        elif update_data:
+            booking = db_update_booking(booking_id, update_data, returning=True)
         
         # Format booking for response
         client = get_user_by_id(booking['client_id'])
@@ -348,4 +390,69 @@ def update_booking(booking_id):
         return jsonify({'error': str(e)}), 500
 
 
-
+@bookings_bp.route('/bulk-update', methods=['POST'])
+@jwt_required()
+def bulk_update_bookings():
+    """Move many bookings to one status (providers: own bookings, admins: any); per-id outcomes"""
+    try:
+        auth = get_auth_context()
+        if not auth:
+            return jsonify({'error': 'Invalid user ID in token'}), 401
+        if not auth.is_provider and not auth.is_admin:
+            return jsonify({'error': 'Only providers and admins can update bookings'}), 403
+        
+        data = request.get_json() or {}
+        status = data.get('status')
+        if status not in BOOKING_STATUSES:
+            return jsonify({'error': 'Invalid status'}), 400
+        
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return jsonify({'error': 'ids must be a non-empty list'}), 400
+        if len(ids) > MAX_BULK_UPDATE_IDS:
+            return jsonify({'error': f'At most {MAX_BULK_UPDATE_IDS} ids per request'}), 400
+        if any(isinstance(i, bool) or not isinstance(i, int) for i in ids):
+            return jsonify({'error': 'ids must be integers'}), 400
+        ids = list(dict.fromkeys(ids))
+        
+        # Validate ownership and transitions for every id with one query
+        states = {b['id']: b for b in get_booking_states(ids)}
+        outcomes = {}
+        to_update = []
+        for booking_id in ids:
+            booking = states.get(booking_id)
+            if not booking:
+                outcomes[booking_id] = {'id': booking_id, 'result': 'not_found'}
+            elif not auth.is_admin and booking['provider_id'] != auth.user_id:
+                outcomes[booking_id] = {'id': booking_id, 'result': 'forbidden'}
+            elif booking['status'] == status:
+                outcomes[booking_id] = {'id': booking_id, 'result': 'unchanged', 'status': status}
+            elif status not in BOOKING_TRANSITIONS.get(booking['status'], ()):
+                outcomes[booking_id] = {'id': booking_id, 'result': 'invalid_transition',
+                                        'error': f"Cannot change a {booking['status']} booking to {status}",
+                                        'status': booking['status']}
+            else:
+                to_update.append(booking_id)
+        
+        from_statuses = sorted(s for s, targets in BOOKING_TRANSITIONS.items() if status in targets)
+        updated = set(update_bookings_status(to_update, status, from_statuses,
+                                             provider_id=None if auth.is_admin else auth.user_id))
+        for booking_id in to_update:
+            if booking_id in updated:
+                outcomes[booking_id] = {'id': booking_id, 'result': 'updated', 'status': status,
+                                        'previous_status': states[booking_id]['status']}
+            else:
+                # Changed by someone else between validation and the UPDATE
+                outcomes[booking_id] = {'id': booking_id, 'result': 'conflict'}
+        
+        print(f"✅ Bulk booking update by user {auth.user_id}: {len(updated)}/{len(ids)} set to {status}")
+        
+        return jsonify({
+            'status': status,
+            'updated': len(updated),
+            'failed': sum(1 for o in outcomes.values() if o['result'] not in ('updated', 'unchanged')),
+            'results': [outcomes[booking_id] for booking_id in ids]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -10,4 +10,57 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_ALGORITHM = 'HS256'
-
+    
+    # Password hashing (see password_hashing.py). Changing the method rehashes
+    # existing passwords on the user's next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    # Hashing processes per server worker process (default min(2, CPU count)); 0 hashes inline on the request thread
+    PASSWORD_HASH_WORKERS = int(os.environ['PASSWORD_HASH_WORKERS']) if os.environ.get('PASSWORD_HASH_WORKERS') else None
+    # Max hashes queued or running before logins get a fast 503
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.environ.get('PASSWORD_HASH_QUEUE_DEPTH', 0)) or None
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    
+    # Login throttling (see rate_limit.py): token buckets per username and per client IP
+    LOGIN_RATE_LIMIT_ENABLED = os.environ.get('LOGIN_RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE = float(os.environ.get('LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE', 5))
+    LOGIN_RATE_LIMIT_USERNAME_BURST = int(os.environ.get('LOGIN_RATE_LIMIT_USERNAME_BURST', 5))
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE = float(os.environ.get('LOGIN_RATE_LIMIT_IP_PER_MINUTE', 30))
+    LOGIN_RATE_LIMIT_IP_BURST = int(os.environ.get('LOGIN_RATE_LIMIT_IP_BURST', 30))
+    LOGIN_RATE_LIMIT_MAX_KEYS = int(os.environ.get('LOGIN_RATE_LIMIT_MAX_KEYS', 100000))
+    # Unset: per-process memory. sqlite:///path: shared across workers on one host
+    LOGIN_RATE_LIMIT_STORAGE = os.environ.get('LOGIN_RATE_LIMIT_STORAGE')
+    # Reverse proxies / load balancers in front of the app whose X-Forwarded-* headers are
+    # trusted (werkzeug ProxyFix); 0 uses the socket peer address as the client IP
+    TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+    
+    # How often each worker reloads deactivated users / token versions (see auth_context.py)
+    AUTH_STATE_REFRESH_SECONDS = int(os.environ.get('AUTH_STATE_REFRESH_SECONDS', 30))
+    
+    # Logout / token revocation Bloom filter (see token_revocation.py)
+    TOKEN_REVOCATION_CAPACITY = int(os.environ.get('TOKEN_REVOCATION_CAPACITY', 100000))
+    TOKEN_REVOCATION_ERROR_RATE = float(os.environ.get('TOKEN_REVOCATION_ERROR_RATE', 0.001))
+    TOKEN_REVOCATION_REFRESH_SECONDS = int(os.environ.get('TOKEN_REVOCATION_REFRESH_SECONDS', 30))
+    TOKEN_REVOCATION_REBUILD_SECONDS = int(os.environ.get('TOKEN_REVOCATION_REBUILD_SECONDS', 3600))
+    
+    # Set to false when migrations are run separately (flask init-db) to skip even the version check
+    SCHEMA_CHECK_ON_STARTUP = os.environ.get('SCHEMA_CHECK_ON_STARTUP', 'true').lower() == 'true'
+    
+    # Per-route admission control (see admission.py); budgets are derived from the
+    # request threads per process, override them as "critical=4:4:5,search=2:4:0.5"
+    # (limit:queue:max_wait seconds)
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_THREADS = int(os.environ.get('ADMISSION_THREADS', 4))
+    ADMISSION_BUDGETS = os.environ.get('ADMISSION_BUDGETS', '')
+    
+    # Idempotency-Key replay store for POST /api/bookings (see idempotency.py)
+    IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+    IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10000))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+    # How long an in-progress claim holds its key; keep it above the worker timeout (GUNICORN_TIMEOUT)
+    IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60))
+    
+    # Columnar booking analytics cache (see analytics.py); a version check > 0 trusts the
+    # last bookings version probe for that many seconds
+    ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 256))
+    ANALYTICS_BATCH_SIZE = int(os.environ.get('ANALYTICS_BATCH_SIZE', 10000))
+    ANALYTICS_VERSION_CHECK_SECONDS = float(os.environ.get('ANALYTICS_VERSION_CHECK_SECONDS', 0))
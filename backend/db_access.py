@@ -1,8 +1,14 @@
 """Data access layer using raw SQL queries (JDBC-style)"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from db_connection import db
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
+from availability import BLOCKING_STATUSES, MAX_BOOKING_MINUTES, booking_end, slot_position
 
 def row_to_dict(row, cursor_description=None):
     """Convert database row to dictionary"""
@@ -15,10 +21,25 @@ def row_to_dict(row, cursor_description=None):
     else:
         return dict(row)
 
+def supports_returning() -> bool:
+    """INSERT/UPDATE ... RETURNING is available on PostgreSQL and SQLite >= 3.35"""
+    return db.db_type == 'postgresql' or sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def _execute_returning(query: str, params: tuple) -> Optional[Dict]:
+    """Run an INSERT/UPDATE and return the written row in the same round trip"""
+    return db.execute(query.rstrip() + ' RETURNING *', params, fetch_one=True, dict_cursor=True)
+
+def _convert_bools(result: Optional[Dict]) -> Optional[Dict]:
+    """Convert SQLite 0/1 is_verified / is_active columns to booleans"""
+    if result and db.db_type == 'sqlite':
+        result['is_verified'] = bool(result['is_verified'])
+        result['is_active'] = bool(result['is_active'])
+    return result
+
 # ============ USER OPERATIONS ============
 
-def create_user(data: Dict[str, Any]) -> int:
-    """Create a new user and return user ID"""
+def create_user(data: Dict[str, Any], returning: bool = False):
+    """Create a new user and return user ID (the full row with returning=True)"""
     query = """
     INSERT INTO users (username, email, password_hash, role, full_name, phone, address, city, state, pincode, is_verified, is_active, created_at, updated_at)
     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
@@ -53,6 +74,9 @@ def create_user(data: Dict[str, Any]) -> int:
         now
     )
     
+    if returning and supports_returning():
+        return _convert_bools(_execute_returning(query, params))
+    
     if db.db_type == 'postgresql':
         # PostgreSQL - use RETURNING clause
         query = query.rstrip(')') + ' RETURNING id'
@@ -62,7 +86,7 @@ def create_user(data: Dict[str, Any]) -> int:
             result = cursor.fetchone()
             conn.commit()
             cursor.close()
-            return result[0] if result else None
+            user_id = result[0] if result else None
     else:
         # SQLite
         with db.get_connection() as conn:
@@ -71,7 +95,11 @@ def create_user(data: Dict[str, Any]) -> int:
             user_id = cursor.lastrowid
             conn.commit()
             cursor.close()
-            return user_id
+    
+    if returning:
+        # SQLite < 3.35 has no RETURNING; read the row back
+        return get_user_by_id(user_id)
+    return user_id
 
 def get_user_by_id(user_id: int) -> Optional[Dict]:
     """Get user by ID"""
@@ -111,8 +139,8 @@ def get_user_by_email(email: str) -> Optional[Dict]:
         result['is_active'] = bool(result['is_active'])
     return result
 
-def update_user(user_id: int, data: Dict[str, Any]) -> bool:
-    """Update user"""
+def update_user(user_id: int, data: Dict[str, Any], returning: bool = False):
+    """Update user; returning=True returns the updated row (None if it does not exist)"""
     fields = []
     params = []
     
@@ -122,12 +150,15 @@ def update_user(user_id: int, data: Dict[str, Any]) -> bool:
             fields.append(f"{field} = %s" if db.db_type == 'postgresql' else f"{field} = ?")
             params.append(data[field])
     
-    if 'password' in data:
+    if 'password_hash' in data:
+        fields.append("password_hash = %s" if db.db_type == 'postgresql' else "password_hash = ?")
+        params.append(data['password_hash'])
+    elif 'password' in data:
         fields.append("password_hash = %s" if db.db_type == 'postgresql' else "password_hash = ?")
         params.append(generate_password_hash(data['password']))
     
     if not fields:
-        return False
+        return get_user_by_id(user_id) if returning else False
     
     fields.append("updated_at = %s" if db.db_type == 'postgresql' else "updated_at = ?")
     params.append(datetime.utcnow())
@@ -137,17 +168,113 @@ def update_user(user_id: int, data: Dict[str, Any]) -> bool:
     if db.db_type == 'sqlite':
         query = f"UPDATE users SET {', '.join(fields)} WHERE id = ?"
     
-    db.execute(query, tuple(params))
+    use_returning = returning and supports_returning()
+    with db.get_cursor(dict_cursor=True) as cursor:
+        cursor.execute(query + (' RETURNING *' if use_returning else ''), tuple(params))
+        user = cursor.fetchone() if use_returning else None
+        _sync_provider_search("p.user_id = %s", (user_id,), cursor)
+    if use_returning:
+        return _convert_bools(dict(user)) if user else None
+    if returning:
+        return get_user_by_id(user_id)
     return True
 
+def bump_token_version(user_id: int) -> int:
+    """Invalidate all tokens issued to a user so far; returns the new token version"""
+    query = "UPDATE users SET token_version = COALESCE(token_version, 0) + 1, updated_at = %s WHERE id = %s"
+    select_query = "SELECT token_version FROM users WHERE id = %s"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+        select_query = select_query.replace('%s', '?')
+    
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (datetime.utcnow(), user_id))
+        cursor.execute(select_query, (user_id,))
+        result = cursor.fetchone()
+        cursor.close()
+        return result[0] if result else 0
+
+USER_FLAGS = ('is_verified', 'is_active')
+
+def set_users_flag(flag: str, value: bool, user_ids: Optional[List[int]] = None, filters: Optional[Dict[str, Any]] = None,
+                   exclude_user_id: Optional[int] = None, chunk_size: Optional[int] = None) -> List[int]:
+    """Set is_verified or is_active on users and their provider profiles; returns the users that changed.
+    
+    Targets user_ids, or every user matching filters (role, is_active, is_verified,
+    search as in get_users_with_filters). Filters are resolved to ids first, then
+    both tables are updated with one set-based UPDATE each per chunk of ids, all
+    in a single transaction. Rows already at value are left alone, so repeating a
+    call changes nothing.
+    """
+    if flag not in USER_FLAGS:
+        raise ValueError(f'Unknown user flag: {flag}')
+    distinct = "IS NOT" if db.db_type == 'sqlite' else "IS DISTINCT FROM"
+    
+    with db.get_cursor() as cursor:
+        if user_ids is None:
+            conditions, params = _user_filters(**(filters or {}))
+            select_query = f"SELECT id FROM users {'WHERE ' + ' AND '.join(conditions) if conditions else ''} ORDER BY id"
+            if db.db_type == 'sqlite':
+                select_query = select_query.replace('%s', '?')
+            cursor.execute(select_query, tuple(params))
+            user_ids = [row[0] for row in cursor.fetchall()]
+        user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id != exclude_user_id]
+        
+        changed = []
+        now = datetime.utcnow()
+        for chunk in _chunks(user_ids, chunk_size or LOOKUP_CHUNK_SIZE):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            user_query = f"UPDATE users SET {flag} = %s, updated_at = %s WHERE id IN ({placeholders}) AND {flag} {distinct} %s"
+            profile_query = f"UPDATE providers SET {flag} = %s, updated_at = %s WHERE user_id IN ({placeholders}) AND {flag} {distinct} %s"
+            changed_query = f"SELECT id FROM users WHERE id IN ({placeholders}) AND {flag} {distinct} %s"
+            if db.db_type == 'sqlite':
+                user_query = user_query.replace('%s', '?')
+                profile_query = profile_query.replace('%s', '?')
+                changed_query = changed_query.replace('%s', '?')
+            
+            params = (value, now) + tuple(chunk) + (value,)
+            if supports_returning():
+                cursor.execute(user_query + " RETURNING id", params)
+                changed.extend(row[0] for row in cursor.fetchall())
+            else:
+                # SQLite < 3.35: read the rows about to change inside the same transaction
+                cursor.execute(changed_query, tuple(chunk) + (value,))
+                changed.extend(row[0] for row in cursor.fetchall())
+                cursor.execute(user_query, params)
+            cursor.execute(profile_query, params)
+            _sync_provider_search(f"p.user_id IN ({placeholders})", tuple(chunk), cursor)
+        return changed
+
+def get_user_auth_states(updated_since: Optional[datetime] = None) -> List[Dict]:
+    """Get id/is_active/token_version for users whose tokens may be invalid.
+    
+    Without updated_since: every deactivated or re-versioned user (initial load).
+    With updated_since: every user changed since then (incremental refresh).
+    """
+    if updated_since is None:
+        query = "SELECT id, is_active, token_version FROM users WHERE is_active = %s OR token_version > 0"
+        params = (False,)
+    else:
+        query = "SELECT id, is_active, token_version FROM users WHERE updated_at >= %s"
+        params = (updated_since,)
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    results = db.execute(query, params, fetch_all=True, dict_cursor=True) or []
+    for r in results:
+        r['is_active'] = bool(r['is_active'])
+        r['token_version'] = r['token_version'] or 0
+    return results
+
 def check_password(user: Dict, password: str) -> bool:
     """Check if password matches"""
     return check_password_hash(user['password_hash'], password)
 
 # ============ PROVIDER OPERATIONS ============
 
-def create_provider(data: Dict[str, Any]) -> int:
-    """Create a provider profile"""
+def create_provider(data: Dict[str, Any], returning: bool = False):
+    """Create a provider profile; returning=True returns the row instead of the ID"""
     query = """
     INSERT INTO providers (user_id, specialization, experience_years, bar_council_number, qualification, bio, consultation_fee, hourly_rate, is_verified, is_active, created_at, updated_at)
     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
@@ -174,25 +301,18 @@ def create_provider(data: Dict[str, Any]) -> int:
         now
     )
     
-    if db.db_type == 'postgresql':
-        # PostgreSQL - use RETURNING clause
-        query = query.rstrip(')') + ' RETURNING id'
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            conn.commit()
-            cursor.close()
-            return result[0] if result else None
-    else:
-        # SQLite
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            provider_id = cursor.lastrowid
-            conn.commit()
-            cursor.close()
-            return provider_id
+    use_returning = supports_returning()
+    with db.get_cursor(dict_cursor=True) as cursor:
+        _lock_users(cursor, "u.id = %s", (data['user_id'],))
+        cursor.execute(query.rstrip() + (' RETURNING *' if use_returning else ''), params)
+        provider = dict(cursor.fetchone()) if use_returning else None
+        provider_id = provider['id'] if provider else cursor.lastrowid
+        _sync_provider_search("p.id = %s", (provider_id,), cursor)
+    
+    if returning:
+        # SQLite < 3.35 has no RETURNING; read the row back
+        return _convert_bools(provider) if provider else get_provider_by_id(provider_id)
+    return provider_id
 
 def get_provider_by_id(provider_id: int) -> Optional[Dict]:
     """Get provider by ID"""
@@ -218,8 +338,8 @@ def get_provider_by_user_id(user_id: int) -> Optional[Dict]:
         result['is_active'] = bool(result['is_active'])
     return result
 
-def update_provider(provider_id: int, data: Dict[str, Any]) -> bool:
-    """Update provider"""
+def update_provider(provider_id: int, data: Dict[str, Any], returning: bool = False):
+    """Update provider; returning=True returns the updated row (None if it does not exist)"""
     fields = []
     params = []
     
@@ -230,7 +350,7 @@ def update_provider(provider_id: int, data: Dict[str, Any]) -> bool:
             params.append(data[field])
     
     if not fields:
-        return False
+        return get_provider_by_id(provider_id) if returning else False
     
     fields.append("updated_at = %s" if db.db_type == 'postgresql' else "updated_at = ?")
     params.append(datetime.utcnow())
@@ -240,7 +360,16 @@ def update_provider(provider_id: int, data: Dict[str, Any]) -> bool:
     if db.db_type == 'sqlite':
         query = f"UPDATE providers SET {', '.join(fields)} WHERE id = ?"
     
-    db.execute(query, tuple(params))
+    use_returning = returning and supports_returning()
+    with db.get_cursor(dict_cursor=True) as cursor:
+        _lock_users(cursor, "u.id = (SELECT user_id FROM providers WHERE id = %s)", (provider_id,))
+        cursor.execute(query + (' RETURNING *' if use_returning else ''), tuple(params))
+        provider = cursor.fetchone() if use_returning else None
+        _sync_provider_search("p.id = %s", (provider_id,), cursor)
+    if use_returning:
+        return _convert_bools(dict(provider)) if provider else None
+    if returning:
+        return get_provider_by_id(provider_id)
     return True
 
 def update_provider_rating(provider_id: int, rating: float, total_reviews: int) -> bool:
@@ -249,21 +378,94 @@ def update_provider_rating(provider_id: int, rating: float, total_reviews: int)
     if db.db_type == 'sqlite':
         query = "UPDATE providers SET rating = ?, total_reviews = ?, updated_at = ? WHERE id = ?"
     
-    db.execute(query, (rating, total_reviews, datetime.utcnow(), provider_id))
+    with db.get_cursor() as cursor:
+        _lock_users(cursor, "u.id = (SELECT user_id FROM providers WHERE id = %s)", (provider_id,))
+        cursor.execute(query, (rating, total_reviews, datetime.utcnow(), provider_id))
+        _sync_provider_search("p.id = %s", (provider_id,), cursor)
     return True
 
+# ============ PROVIDER SEARCH OPERATIONS ============
+
+# provider_search is a denormalized copy of providers JOIN users for listings. Every
+# write to a provider profile, or to the user behind one, re-projects the affected
+# rows with PROVIDER_SEARCH_SOURCE on the same cursor, so the copy commits or rolls
+# back with the write. search_document holds the lower-cased free-text fields
+# joined by '|', so a search is one LIKE on one column.
+#
+# On PostgreSQL each write holds the users row, then the providers row (always in
+# that order) before re-projecting, so the upsert reads base rows no other
+# transaction is still changing and a stale snapshot can't overwrite a newer one.
+PROVIDER_SEARCH_COLUMNS = ['id', 'user_id', 'role', 'username', 'email', 'full_name', 'phone', 'address', 'city', 'state',
+                           'pincode', 'specialization', 'experience_years', 'bar_council_number', 'qualification', 'bio',
+                           'consultation_fee', 'hourly_rate', 'rating', 'total_reviews', 'is_verified', 'is_active',
+                           'is_listed', 'created_at', 'search_document']
+PROVIDER_SEARCH_SOURCE = """
+    SELECT p.id, p.user_id, u.role, u.username, u.email, u.full_name, u.phone, u.address, u.city, u.state, u.pincode,
+           p.specialization, p.experience_years, p.bar_council_number, p.qualification, p.bio,
+           p.consultation_fee, p.hourly_rate, p.rating, p.total_reviews, p.is_verified, p.is_active,
+           (u.is_active AND p.is_active), p.created_at,
+           LOWER(COALESCE(u.full_name, '') || '|' || COALESCE(u.username, '') || '|' || COALESCE(p.specialization, '') || '|' ||
+                 COALESCE(p.bio, '') || '|' || COALESCE(u.city, '') || '|' || COALESCE(u.state, ''))
+    FROM providers p
+    JOIN users u ON u.id = p.user_id
+"""
+
+def _lock_users(cursor, where: str, params: tuple) -> None:
+    """Lock the matching users rows (alias u) until commit (PostgreSQL), before touching their provider profiles"""
+    if db.db_type == 'postgresql':
+        cursor.execute(f"SELECT u.id FROM users u WHERE {where} ORDER BY u.id FOR UPDATE", params)
+
+def _sync_provider_search(where: str, params: tuple, cursor) -> None:
+    """Upsert the provider_search rows of the providers matching `where` (aliases p, u) from the base tables"""
+    updates = ', '.join(f"{column} = excluded.{column}" for column in PROVIDER_SEARCH_COLUMNS[1:])
+    query = f"""
+    INSERT INTO provider_search ({', '.join(PROVIDER_SEARCH_COLUMNS)})
+    {PROVIDER_SEARCH_SOURCE}
+    WHERE {where}
+    ON CONFLICT (id) DO UPDATE SET {updates}
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    if db.db_type == 'postgresql':
+        cursor.execute(f"SELECT p.id FROM providers p JOIN users u ON u.id = p.user_id WHERE {where} ORDER BY p.id FOR UPDATE OF p", params)
+    cursor.execute(query, params)
+
+def sync_provider_search(provider_ids: Optional[List[int]] = None, user_ids: Optional[List[int]] = None, conn=None) -> None:
+    """Refresh the provider_search rows of these provider profiles and/or users (in `conn`'s transaction if given)"""
+    def apply(cursor):
+        for column, ids in (('p.id', provider_ids), ('p.user_id', user_ids)):
+            for chunk in _chunks(list(ids or []), LOOKUP_CHUNK_SIZE):
+                _sync_provider_search(f"{column} IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk), cursor)
+    if conn is not None:
+        cursor = conn.cursor()
+        try:
+            apply(cursor)
+        finally:
+            cursor.close()
+        return
+    with db.get_cursor() as cursor:
+        apply(cursor)
+
+def rebuild_provider_search() -> int:
+    """Recompute provider_search from providers and users in one transaction; returns the row count"""
+    with db.get_cursor() as cursor:
+        cursor.execute("DELETE FROM provider_search")
+        cursor.execute(f"INSERT INTO provider_search ({', '.join(PROVIDER_SEARCH_COLUMNS)}) {PROVIDER_SEARCH_SOURCE}")
+        cursor.execute("SELECT COUNT(*) FROM provider_search")
+        return cursor.fetchone()[0]
+
 # ============ BOOKING OPERATIONS ============
 
-def create_booking(data: Dict[str, Any]) -> int:
-    """Create a booking"""
+def create_booking(data: Dict[str, Any], returning: bool = False):
+    """Create a booking; returning=True returns the row instead of the ID"""
     query = """
-    INSERT INTO bookings (client_id, provider_id, provider_profile_id, service_type, booking_date, duration_minutes, fee, status, description, meeting_link, location, created_at, updated_at)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    INSERT INTO bookings (client_id, provider_id, provider_profile_id, service_type, booking_date, end_time, duration_minutes, fee, status, description, meeting_link, location, created_at, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
     """
     if db.db_type == 'sqlite':
         query = """
-        INSERT INTO bookings (client_id, provider_id, provider_profile_id, service_type, booking_date, duration_minutes, fee, status, description, meeting_link, location, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO bookings (client_id, provider_id, provider_profile_id, service_type, booking_date, end_time, duration_minutes, fee, status, description, meeting_link, location, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
     
     now = datetime.utcnow()
@@ -273,6 +475,7 @@ def create_booking(data: Dict[str, Any]) -> int:
         data['provider_profile_id'],
         data.get('service_type'),
         data['booking_date'],
+        data.get('end_time') or booking_end(data['booking_date'], data.get('duration_minutes', 60)),
         data.get('duration_minutes', 60),
         data['fee'],
         data.get('status', 'pending'),
@@ -283,25 +486,128 @@ def create_booking(data: Dict[str, Any]) -> int:
         now
     )
     
-    if db.db_type == 'postgresql':
-        # PostgreSQL - use RETURNING clause
-        query = query.rstrip(')') + ' RETURNING id'
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            conn.commit()
-            cursor.close()
-            return result[0] if result else None
-    else:
-        # SQLite
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
+    # The rollup is updated on the insert's cursor, so both commit or roll back together
+    use_returning = supports_returning()
+    with db.get_cursor(dict_cursor=True) as cursor:
+        cursor.execute(query.rstrip() + (' RETURNING *' if use_returning else ''), params)
+        booking = dict(cursor.fetchone()) if use_returning else None
+        booking_id = booking['id'] if booking else cursor.lastrowid
+        _apply_booking_rollup(cursor, "b.id = %s", (booking_id,), 1)
+    
+    if returning:
+        # SQLite < 3.35 has no RETURNING; read the row back
+        return booking or get_booking_by_id(booking_id)
+    return booking_id
+
+# Blocking booking of the provider overlapping [start, end), bounded to the bookings that could reach start
+BOOKING_OVERLAP_SQL = """
+    SELECT 1 FROM bookings b
+    WHERE b.provider_id = {provider} AND b.status IN (%s, %s)
+      AND b.booking_date > %s AND b.booking_date < %s AND b.end_time > %s
+"""
+
+# The provider has no working-hours template, or one of its windows contains the slot
+WITHIN_WORKING_HOURS_SQL = """
+    (NOT EXISTS (SELECT 1 FROM provider_working_hours w WHERE w.provider_id = {profile})
+     OR EXISTS (SELECT 1 FROM provider_working_hours w
+                WHERE w.provider_id = {profile} AND w.weekday = %s AND w.start_minute <= %s AND w.end_minute >= %s))
+"""
+
+def _overlap_params(start: datetime, end: datetime) -> tuple:
+    return BLOCKING_STATUSES + (start - timedelta(minutes=MAX_BOOKING_MINUTES), end, start)
+
+def create_booking_validated(data: Dict[str, Any]) -> tuple:
+    """Check client, provider and schedule and insert a booking in one statement; returns (booking, error_code)
+
+    booking_date must be naive UTC. error_code is None on success, otherwise one of
+    'client_inactive', 'provider_not_found', 'provider_profile_not_found',
+    'provider_unavailable', 'outside_working_hours' or 'slot_unavailable'.
+    """
+    start = data['booking_date']
+    duration = data.get('duration_minutes', 60)
+    end = booking_end(start, duration)
+    weekday, start_minute, end_minute = slot_position(start, end)
+    
+    query = f"""
+    INSERT INTO bookings (client_id, provider_id, provider_profile_id, service_type, booking_date, end_time, duration_minutes, fee, status, description, meeting_link, location, created_at, updated_at)
+    SELECT c.id, u.id, p.id, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    FROM users u
+    JOIN providers p ON p.user_id = u.id
+    JOIN users c ON c.id = %s
+    WHERE u.id = %s AND u.is_active = %s AND p.is_active = %s AND c.is_active = %s
+      AND {WITHIN_WORKING_HOURS_SQL.format(profile='p.id')}
+      AND NOT EXISTS ({BOOKING_OVERLAP_SQL.format(provider='u.id')})
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    now = datetime.utcnow()
+    params = (
+        data.get('service_type'),
+        start,
+        end,
+        duration,
+        data['fee'],
+        data.get('status', 'pending'),
+        data.get('description'),
+        data.get('meeting_link'),
+        data.get('location'),
+        now,
+        now,
+        data['client_id'],
+        data['provider_id'],
+        True,
+        True,
+        True,
+        weekday, start_minute, end_minute
+    ) + _overlap_params(start, end)
+    
+    with db.get_cursor(dict_cursor=True) as cursor:
+        if db.db_type == 'postgresql':
+            # Serialize bookings per provider so two overlapping inserts can't both pass the check
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (int(data['provider_id']),))
+        if supports_returning():
+            cursor.execute(query.rstrip() + ' RETURNING *', params)
+            booking = cursor.fetchone()
+            booking = dict(booking) if booking else None
+            booking_id = None
+        else:
             cursor.execute(query, params)
-            booking_id = cursor.lastrowid
-            conn.commit()
-            cursor.close()
-            return booking_id
+            booking = None
+            booking_id = cursor.lastrowid if cursor.rowcount else None
+        if booking or booking_id:
+            _apply_booking_rollup(cursor, "b.id = %s", (booking['id'] if booking else booking_id,), 1)
+    if booking_id:
+        booking = get_booking_by_id(booking_id)
+    if booking:
+        return booking, None
+    
+    # Nothing inserted: one more query to tell the caller why
+    query = f"""
+    SELECT c.is_active AS client_active, u.id AS provider_user_id, u.is_active AS provider_active,
+           p.id AS profile_id, p.is_active AS profile_active,
+           CASE WHEN {WITHIN_WORKING_HOURS_SQL.format(profile='p.id')} THEN 1 ELSE 0 END AS within_hours
+    FROM users c
+    LEFT JOIN users u ON u.id = %s
+    LEFT JOIN providers p ON p.user_id = u.id
+    WHERE c.id = %s
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    row = db.execute(query, (weekday, start_minute, end_minute, data['provider_id'], data['client_id']),
+                     fetch_one=True, dict_cursor=True)
+    if not row or not row['client_active']:
+        return None, 'client_inactive'
+    if row['provider_user_id'] is None:
+        return None, 'provider_not_found'
+    if row['profile_id'] is None:
+        return None, 'provider_profile_not_found'
+    if not row['provider_active'] or not row['profile_active']:
+        return None, 'provider_unavailable'
+    if not row['within_hours']:
+        return None, 'outside_working_hours'
+    return None, 'slot_unavailable'
 
 def get_booking_by_id(booking_id: int) -> Optional[Dict]:
     """Get booking by ID"""
@@ -327,36 +633,466 @@ def get_bookings_by_provider_id(provider_id: int) -> List[Dict]:
     
     return db.execute(query, (provider_id,), fetch_all=True, dict_cursor=True) or []
 
+def _booking_list_filters(user_column: str, user_id: int, date_from: Optional[datetime] = None,
+                          date_to: Optional[datetime] = None) -> tuple:
+    """Conditions and params shared by the booking list and its status counts"""
+    conditions = [f"b.{user_column} = %s"]
+    params = [user_id]
+    if date_from is not None:
+        conditions.append("b.booking_date >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("b.booking_date < %s")
+        params.append(date_to)
+    return conditions, params
+
+def get_user_bookings_page(user_id: int, as_provider: bool = False, statuses: Optional[List[str]] = None,
+                           date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                           ascending: bool = False, after: Optional[tuple] = None, limit: int = 50) -> List[Dict]:
+    """One keyset page of a client's or provider's bookings with client/provider names joined in.
+    
+    Ordered by (booking_date, id), newest first unless ascending. `after` is the
+    (booking_date, id) of the previous page's last row. Fetches limit + 1 rows so
+    the caller can tell whether another page exists.
+    """
+    conditions, params = _booking_list_filters('provider_id' if as_provider else 'client_id', user_id, date_from, date_to)
+    if statuses:
+        conditions.append(f"b.status IN ({', '.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+    if after is not None:
+        op = '>' if ascending else '<'
+        conditions.append(f"(b.booking_date {op} %s OR (b.booking_date = %s AND b.id {op} %s))")
+        params.extend([after[0], after[0], after[1]])
+    direction = 'ASC' if ascending else 'DESC'
+    
+    query = f"""
+    SELECT b.*,
+           c.username AS client_username, c.email AS client_email, c.full_name AS client_full_name,
+           pu.username AS provider_username, pu.email AS provider_email, pu.full_name AS provider_full_name
+    FROM bookings b
+    LEFT JOIN users c ON c.id = b.client_id
+    LEFT JOIN users pu ON pu.id = b.provider_id
+    WHERE {' AND '.join(conditions)}
+    ORDER BY b.booking_date {direction}, b.id {direction}
+    LIMIT %s
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    params.append(limit + 1)
+    return db.execute(query, tuple(params), fetch_all=True, dict_cursor=True) or []
+
+def get_user_booking_status_counts(user_id: int, as_provider: bool = False, date_from: Optional[datetime] = None,
+                                   date_to: Optional[datetime] = None) -> Dict[str, int]:
+    """Booking counts per status for a client or provider, in one grouped query"""
+    conditions, params = _booking_list_filters('provider_id' if as_provider else 'client_id', user_id, date_from, date_to)
+    query = f"SELECT b.status, COUNT(*) AS count FROM bookings b WHERE {' AND '.join(conditions)} GROUP BY b.status"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    rows = db.execute(query, tuple(params), fetch_all=True, dict_cursor=True) or []
+    return {row['status']: row['count'] for row in rows}
+
 def get_all_bookings() -> List[Dict]:
     """Get all bookings"""
     query = "SELECT * FROM bookings ORDER BY created_at DESC"
     return db.execute(query, fetch_all=True, dict_cursor=True) or []
 
-def update_booking(booking_id: int, data: Dict[str, Any]) -> bool:
-    """Update booking"""
+def _booking_update_set(data: Dict[str, Any]) -> tuple:
+    """SET clause and params for the updatable booking fields in data (empty clause if none)"""
     fields = []
     params = []
     
-    allowed_fields = ['status', 'meeting_link', 'location', 'booking_date']
+    allowed_fields = ['status', 'meeting_link', 'location', 'booking_date', 'end_time']
     for field in allowed_fields:
         if field in data:
             fields.append(f"{field} = %s" if db.db_type == 'postgresql' else f"{field} = ?")
             params.append(data[field])
     
     if not fields:
-        return False
+        return '', []
     
     fields.append("updated_at = %s" if db.db_type == 'postgresql' else "updated_at = ?")
     params.append(datetime.utcnow())
+    return ', '.join(fields), params
+
+def update_booking(booking_id: int, data: Dict[str, Any], returning: bool = False):
+    """Update booking; returning=True returns the updated row (None if it does not exist)"""
+    set_clause, params = _booking_update_set(data)
+    if not set_clause:
+        return get_booking_by_id(booking_id) if returning else False
     params.append(booking_id)
     
-    query = f"UPDATE bookings SET {', '.join(fields)} WHERE id = %s"
+    query = f"UPDATE bookings SET {set_clause} WHERE id = %s"
     if db.db_type == 'sqlite':
-        query = f"UPDATE bookings SET {', '.join(fields)} WHERE id = ?"
+        query = f"UPDATE bookings SET {set_clause} WHERE id = ?"
+    
+    if 'status' in data or 'booking_date' in data:
+        # Move the booking between rollup buckets in the same transaction as the update
+        use_returning = returning and supports_returning()
+        with db.get_cursor(dict_cursor=True) as cursor:
+            _lock_bookings(cursor, "b.id = %s", (booking_id,))
+            _apply_booking_rollup(cursor, "b.id = %s", (booking_id,), -1)
+            cursor.execute(query + (' RETURNING *' if use_returning else ''), tuple(params))
+            row = cursor.fetchone() if use_returning else None
+            _apply_booking_rollup(cursor, "b.id = %s", (booking_id,), 1)
+        if use_returning:
+            return dict(row) if row else None
+        return get_booking_by_id(booking_id) if returning else True
+    
+    if returning and supports_returning():
+        return _execute_returning(query, tuple(params))
     
     db.execute(query, tuple(params))
+    if returning:
+        return get_booking_by_id(booking_id)
     return True
 
+def update_booking_validated(booking_id: int, provider_id: int, data: Dict[str, Any], start: datetime,
+                             end: datetime, check_working_hours: bool = False) -> tuple:
+    """Update a booking that must hold [start, end) in its provider's schedule; returns (booking, error_code)
+
+    The overlap (and optionally working-hours) check is part of the UPDATE, under
+    the same per-provider lock as create_booking_validated, so a reschedule can't
+    race another booking into the slot. error_code is None on success, otherwise
+    'outside_working_hours' or 'slot_unavailable'.
+    """
+    set_clause, params = _booking_update_set(data)
+    weekday, start_minute, end_minute = slot_position(start, end)
+    conditions = [f"NOT EXISTS ({BOOKING_OVERLAP_SQL.format(provider='bookings.provider_id')} AND b.id <> bookings.id)"]
+    params += [booking_id] + list(_overlap_params(start, end))
+    if check_working_hours:
+        conditions.append(WITHIN_WORKING_HOURS_SQL.format(profile='bookings.provider_profile_id'))
+        params += [weekday, start_minute, end_minute]
+    
+    query = f"UPDATE bookings SET {set_clause} WHERE id = %s AND {' AND '.join(conditions)}"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    use_returning = supports_returning()
+    with db.get_cursor(dict_cursor=True) as cursor:
+        if db.db_type == 'postgresql':
+            # Serialize with bookings being created or rescheduled for the same provider
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (int(provider_id),))
+        _lock_bookings(cursor, "b.id = %s", (booking_id,))
+        _apply_booking_rollup(cursor, "b.id = %s", (booking_id,), -1)
+        cursor.execute(query + (' RETURNING *' if use_returning else ''), tuple(params))
+        row = cursor.fetchone() if use_returning else None
+        updated = bool(row) if use_returning else cursor.rowcount == 1
+        _apply_booking_rollup(cursor, "b.id = %s", (booking_id,), 1)
+    
+    if updated:
+        return (dict(row) if row else get_booking_by_id(booking_id)), None
+    if check_working_hours:
+        booking = get_booking_by_id(booking_id)
+        if booking and not is_within_working_hours(booking['provider_profile_id'], start, end):
+            return None, 'outside_working_hours'
+    return None, 'slot_unavailable'
+
+def get_booking_states(booking_ids: List[int]) -> List[Dict]:
+    """id, client_id, provider_id and status of the given bookings, in one query"""
+    if not booking_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(booking_ids))
+    query = f"SELECT id, client_id, provider_id, status FROM bookings WHERE id IN ({placeholders})"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, tuple(booking_ids), fetch_all=True, dict_cursor=True) or []
+
+def update_bookings_status(booking_ids: List[int], status: str, from_statuses: List[str],
+                           provider_id: Optional[int] = None) -> List[int]:
+    """Set status on the bookings still in one of from_statuses (and owned by provider_id if given).
+    
+    One UPDATE ... WHERE id IN (...); returns the IDs actually updated, so rows
+    changed concurrently since they were validated are left alone and reported.
+    """
+    if not booking_ids or not from_statuses:
+        return []
+    id_placeholders = ', '.join(['%s'] * len(booking_ids))
+    status_placeholders = ', '.join(['%s'] * len(from_statuses))
+    conditions = f"b.id IN ({id_placeholders}) AND b.status IN ({status_placeholders})"
+    where_params = list(booking_ids) + list(from_statuses)
+    if provider_id is not None:
+        conditions += " AND b.provider_id = %s"
+        where_params.append(provider_id)
+    
+    query = f"UPDATE bookings SET status = %s, updated_at = %s WHERE {conditions.replace('b.', '')}"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    params = tuple([status, datetime.utcnow()] + where_params)
+    
+    with db.get_cursor() as cursor:
+        # Take the matching rows out of their rollup buckets, update them, then add them back
+        _lock_bookings(cursor, conditions, tuple(where_params))
+        _apply_booking_rollup(cursor, conditions, tuple(where_params), -1)
+        if supports_returning():
+            cursor.execute(query + " RETURNING id", params)
+            updated = [row[0] for row in cursor.fetchall()]
+        else:
+            # SQLite < 3.35: read back inside the same transaction
+            cursor.execute(query, params)
+            select_query = f"SELECT id FROM bookings WHERE id IN ({id_placeholders}) AND status = %s"
+            if db.db_type == 'sqlite':
+                select_query = select_query.replace('%s', '?')
+            cursor.execute(select_query, tuple(booking_ids) + (status,))
+            updated = [row[0] for row in cursor.fetchall()]
+        if updated:
+            _apply_booking_rollup(cursor, f"b.id IN ({', '.join(['%s'] * len(updated))})", tuple(updated), 1)
+        return updated
+
+# ============ BOOKING ROLLUP OPERATIONS ============
+
+def _rollup_select_sql(where: str, sign: int = 1) -> str:
+    """Bookings matching `where` grouped into booking_daily_rollup rows (day x status x service type x provider role)"""
+    day = "date(b.booking_date)" if db.db_type == 'sqlite' else "CAST(b.booking_date AS DATE)"
+    return f"""
+    INSERT INTO booking_daily_rollup (day, status, service_type, provider_role, booking_count, revenue)
+    SELECT {day}, b.status, COALESCE(b.service_type, ''), COALESCE(u.role, ''),
+           {sign} * COUNT(*), {sign} * COALESCE(SUM(b.fee), 0)
+    FROM bookings b
+    LEFT JOIN users u ON u.id = b.provider_id
+    WHERE {where}
+    GROUP BY 1, 2, 3, 4
+    """
+
+def _apply_booking_rollup(cursor, where: str, params: tuple, sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) the bookings matching `where` (alias b) in booking_daily_rollup"""
+    query = _rollup_select_sql(where, sign) + """
+    ON CONFLICT (day, status, service_type, provider_role) DO UPDATE
+    SET booking_count = booking_daily_rollup.booking_count + excluded.booking_count,
+        revenue = booking_daily_rollup.revenue + excluded.revenue
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    cursor.execute(query, params)
+
+def _lock_bookings(cursor, where: str, params: tuple) -> None:
+    """Lock the matching booking rows until commit (PostgreSQL) so rollup deltas see the rows being updated"""
+    if db.db_type == 'postgresql':
+        cursor.execute(f"SELECT b.id FROM bookings b WHERE {where} FOR UPDATE", params)
+
+def _add_bookings_to_rollup(booking_ids: List[int], conn=None) -> None:
+    """Fold newly inserted bookings into booking_daily_rollup"""
+    def apply(cursor):
+        for chunk in _chunks(list(booking_ids), LOOKUP_CHUNK_SIZE):
+            _apply_booking_rollup(cursor, f"b.id IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk), 1)
+    if conn is not None:
+        cursor = conn.cursor()
+        try:
+            apply(cursor)
+        finally:
+            cursor.close()
+        return
+    with db.get_cursor() as cursor:
+        apply(cursor)
+
+def rebuild_booking_rollup() -> int:
+    """Recompute booking_daily_rollup from the bookings table in one transaction; returns the row count"""
+    with db.get_cursor() as cursor:
+        cursor.execute("DELETE FROM booking_daily_rollup")
+        cursor.execute(_rollup_select_sql("1 = 1"))
+        cursor.execute("SELECT COUNT(*) FROM booking_daily_rollup")
+        return cursor.fetchone()[0]
+
+def get_booking_rollup_by_status(since=None) -> Dict[str, Dict]:
+    """{status: {'count', 'revenue'}} from the rollup, optionally from day `since` on"""
+    query = "SELECT status, SUM(booking_count) AS count, SUM(revenue) AS revenue FROM booking_daily_rollup"
+    params = ()
+    if since is not None:
+        query += " WHERE day >= %s"
+        params = (since,)
+    query += " GROUP BY status"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    rows = db.execute(query, params, fetch_all=True, dict_cursor=True) or []
+    return {row['status']: {'count': int(row['count'] or 0), 'revenue': float(row['revenue'] or 0)} for row in rows}
+
+def get_booking_rollup_daily(since, until) -> List[Dict]:
+    """Bookings per day between two dates (inclusive) from the rollup"""
+    query = """
+    SELECT day, SUM(booking_count) AS count, SUM(revenue) AS revenue
+    FROM booking_daily_rollup
+    WHERE day >= %s AND day <= %s
+    GROUP BY day
+    ORDER BY day
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, (since, until), fetch_all=True, dict_cursor=True) or []
+
+def get_booking_rollup_breakdown(dimension: str, since=None, limit: int = 10) -> List[Dict]:
+    """Booking count and completed revenue per service_type or provider_role from the rollup"""
+    if dimension not in ('service_type', 'provider_role'):
+        raise ValueError(f'Unknown rollup dimension: {dimension}')
+    query = f"""
+    SELECT {dimension}, SUM(booking_count) AS count,
+           SUM(CASE WHEN status = 'completed' THEN revenue ELSE 0 END) AS revenue
+    FROM booking_daily_rollup
+    {'WHERE day >= %s' if since is not None else ''}
+    GROUP BY {dimension}
+    HAVING SUM(booking_count) > 0
+    ORDER BY count DESC
+    LIMIT %s
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    params = ((since,) if since is not None else ()) + (limit,)
+    return db.execute(query, params, fetch_all=True, dict_cursor=True) or []
+
+# ============ ANALYTICS OPERATIONS ============
+
+# Numeric booking columns for columnar analytics; status is its index in BOOKING_STATUSES
+BOOKING_FACT_COLUMNS = ['id', 'provider_id', 'provider_profile_id', 'start_minute', 'duration_minutes', 'fee', 'status_code']
+
+def iter_booking_fact_batches(batch_size: int = 10000):
+    """Stream every booking as numeric tuples (BOOKING_FACT_COLUMNS), batch_size rows per list
+    
+    Times are minutes since the Unix epoch and statuses are small integer codes,
+    so each batch converts straight into a float array.
+    """
+    if db.db_type == 'sqlite':
+        start_minute = "CAST(strftime('%s', booking_date) AS INTEGER) / 60"
+    else:
+        start_minute = "CAST(EXTRACT(EPOCH FROM booking_date) AS BIGINT) / 60"
+    status_code = ' '.join(f"WHEN '{status}' THEN {code}" for code, status in enumerate(BOOKING_STATUSES))
+    query = f"""
+    SELECT id, provider_id, COALESCE(provider_profile_id, 0), {start_minute},
+           COALESCE(duration_minutes, 60), COALESCE(fee, 0), CASE status {status_code} ELSE -1 END
+    FROM bookings
+    """
+    return db.stream_batches(query, batch_size=batch_size)
+
+def get_bookings_data_version() -> tuple:
+    """(MAX(id), MAX(updated_at)) of bookings; changes whenever the app inserts or updates a booking"""
+    result = db.execute("SELECT MAX(id), MAX(updated_at) FROM bookings", fetch_one=True)
+    return (result[0], str(result[1])) if result else (None, None)
+
+def get_working_hours_version() -> tuple:
+    """(MAX(id), COUNT(*)) of provider_working_hours; set_working_hours re-inserts a profile's rows, so any edit changes it"""
+    result = db.execute("SELECT MAX(id), COUNT(*) FROM provider_working_hours", fetch_one=True)
+    return (result[0], result[1]) if result else (None, 0)
+
+def get_user_role_counts() -> Dict[str, int]:
+    """{role: count} of all users in one GROUP BY"""
+    rows = db.execute("SELECT role, COUNT(*) AS count FROM users GROUP BY role", fetch_all=True, dict_cursor=True) or []
+    return {row['role']: row['count'] for row in rows}
+
+def get_specialization_counts(limit: int = 10) -> List[Dict]:
+    """Active provider profiles per specialization, most common first"""
+    query = """
+    SELECT specialization, COUNT(*) AS count
+    FROM providers
+    WHERE is_active = 1 AND specialization IS NOT NULL AND specialization != ''
+    GROUP BY specialization
+    ORDER BY count DESC
+    LIMIT %s
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, (limit,), fetch_all=True, dict_cursor=True) or []
+
+def get_top_providers_by_bookings(since, limit: int = 5) -> List[Dict]:
+    """Providers with the most bookings dated on or after `since`"""
+    query = """
+    SELECT b.provider_id, u.full_name, p.rating, COUNT(*) AS booking_count
+    FROM bookings b
+    JOIN users u ON u.id = b.provider_id
+    LEFT JOIN providers p ON p.user_id = b.provider_id
+    WHERE b.booking_date >= %s
+    GROUP BY b.provider_id, u.full_name, p.rating
+    ORDER BY booking_count DESC, b.provider_id
+    LIMIT %s
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, (since, limit), fetch_all=True, dict_cursor=True) or []
+
+# ============ AVAILABILITY OPERATIONS ============
+
+def find_booking_conflict(provider_id: int, start: datetime, end: datetime, exclude_booking_id: Optional[int] = None) -> Optional[Dict]:
+    """Earliest pending/confirmed booking of the provider (user ID) overlapping [start, end)"""
+    query = """
+    SELECT id, booking_date, end_time, status FROM bookings b
+    WHERE b.provider_id = %s AND b.status IN (%s, %s)
+      AND b.booking_date > %s AND b.booking_date < %s AND b.end_time > %s AND b.id <> %s
+    ORDER BY b.booking_date
+    LIMIT 1
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    params = (provider_id,) + _overlap_params(start, end) + (exclude_booking_id or 0,)
+    return db.execute(query, params, fetch_one=True, dict_cursor=True)
+
+def is_within_working_hours(provider_profile_id: int, start: datetime, end: datetime) -> bool:
+    """True if the slot fits the provider's working hours (or the provider has none)"""
+    query = f"SELECT CASE WHEN {WITHIN_WORKING_HOURS_SQL.format(profile='%s')} THEN 1 ELSE 0 END"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    weekday, start_minute, end_minute = slot_position(start, end)
+    params = (provider_profile_id, provider_profile_id, weekday, start_minute, end_minute)
+    result = db.execute(query, params, fetch_one=True)
+    return bool(result[0]) if result is not None else True
+
+def get_busy_intervals(provider_ids: List[int], start: datetime, end: datetime) -> List[Dict]:
+    """Pending/confirmed bookings of the providers (user IDs) overlapping [start, end), in one query"""
+    if not provider_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(provider_ids))
+    query = f"""
+    SELECT b.provider_id, b.booking_date, b.end_time FROM bookings b
+    WHERE b.provider_id IN ({placeholders}) AND b.status IN (%s, %s)
+      AND b.booking_date > %s AND b.booking_date < %s AND b.end_time > %s
+    ORDER BY b.provider_id, b.booking_date
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    params = tuple(provider_ids) + _overlap_params(start, end)
+    return db.execute(query, params, fetch_all=True, dict_cursor=True) or []
+
+def get_working_hours_by_provider(provider_profile_ids: List[int]) -> Dict[int, List[Dict]]:
+    """Working hours windows of several provider profiles, keyed by profile ID"""
+    if not provider_profile_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(provider_profile_ids))
+    query = f"SELECT provider_id, weekday, start_minute, end_minute FROM provider_working_hours WHERE provider_id IN ({placeholders}) ORDER BY provider_id, weekday, start_minute"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    working_hours = {}
+    for row in db.execute(query, tuple(provider_profile_ids), fetch_all=True, dict_cursor=True) or []:
+        working_hours.setdefault(row['provider_id'], []).append(row)
+    return working_hours
+
+def get_working_hours(provider_profile_id: int) -> List[Dict]:
+    """Weekly working hours windows of a provider profile"""
+    query = "SELECT weekday, start_minute, end_minute FROM provider_working_hours WHERE provider_id = %s ORDER BY weekday, start_minute"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, (provider_profile_id,), fetch_all=True, dict_cursor=True) or []
+
+def set_working_hours(provider_profile_id: int, windows: List[tuple]) -> None:
+    """Replace a provider profile's working hours with (weekday, start_minute, end_minute) windows"""
+    delete_query = "DELETE FROM provider_working_hours WHERE provider_id = %s"
+    insert_query = "INSERT INTO provider_working_hours (provider_id, weekday, start_minute, end_minute) VALUES (%s, %s, %s, %s)"
+    if db.db_type == 'sqlite':
+        delete_query = delete_query.replace('%s', '?')
+        insert_query = insert_query.replace('%s', '?')
+    
+    with db.get_cursor() as cursor:
+        cursor.execute(delete_query, (provider_profile_id,))
+        if windows:
+            cursor.executemany(insert_query, [(provider_profile_id,) + tuple(window) for window in windows])
+
 # ============ REVIEW OPERATIONS ============
 
 def create_review(data: Dict[str, Any]) -> int:
@@ -586,10 +1322,203 @@ def delete_expired_otps(limit: int = 100) -> int:
     
     return db.execute(query, (datetime.utcnow(), limit))
 
+# ============ TOKEN REVOCATION OPERATIONS ============
+
+def revoke_token(jti: str, user_id: Optional[int], expires_at: datetime) -> bool:
+    """Record a revoked JWT; revoking the same token twice is a no-op"""
+    query = """
+    INSERT INTO revoked_tokens (jti, user_id, expires_at, revoked_at)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (jti) DO NOTHING
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    db.execute(query, (jti, user_id, expires_at, datetime.utcnow()))
+    return True
+
+def is_token_revoked(jti: str) -> bool:
+    """Check the revoked_tokens table for an unexpired entry"""
+    query = "SELECT 1 FROM revoked_tokens WHERE jti = %s AND expires_at > %s"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, (jti, datetime.utcnow()), fetch_one=True) is not None
+
+def get_revoked_tokens(revoked_since: Optional[datetime] = None) -> List[Dict]:
+    """Get jti/revoked_at of unexpired revoked tokens, optionally only those revoked since a time"""
+    query = "SELECT jti, revoked_at FROM revoked_tokens WHERE expires_at > %s"
+    params = [datetime.utcnow()]
+    if revoked_since is not None:
+        query += " AND revoked_at >= %s"
+        params.append(revoked_since)
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, tuple(params), fetch_all=True, dict_cursor=True) or []
+
+def delete_expired_revoked_tokens() -> int:
+    """Delete revocations for tokens that have expired"""
+    query = "DELETE FROM revoked_tokens WHERE expires_at <= %s"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, (datetime.utcnow(),))
+
+# ============ IDEMPOTENCY OPERATIONS ============
+
+def claim_idempotency_key(user_id: int, key: str, fingerprint: str, expires_at: datetime) -> bool:
+    """Reserve an idempotency key for an in-progress request until expires_at (its lease); False if it is already taken"""
+    delete_query = "DELETE FROM idempotency_keys WHERE user_id = %s AND idem_key = %s AND expires_at <= %s"
+    insert_query = """
+    INSERT INTO idempotency_keys (user_id, idem_key, fingerprint, created_at, expires_at)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (user_id, idem_key) DO NOTHING
+    """
+    if db.db_type == 'sqlite':
+        delete_query = delete_query.replace('%s', '?')
+        insert_query = insert_query.replace('%s', '?')
+    
+    now = datetime.utcnow()
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        # An expired entry for the same key (a stale response or an abandoned claim's lease) no longer blocks reuse
+        cursor.execute(delete_query, (user_id, key, now))
+        cursor.execute(insert_query, (user_id, key, fingerprint, now, expires_at))
+        claimed = cursor.rowcount == 1
+        conn.commit()
+        cursor.close()
+        return claimed
+
+def get_idempotency_key(user_id: int, key: str) -> Optional[Dict]:
+    """Get an unexpired idempotency entry"""
+    query = """
+    SELECT fingerprint, status_code, response_body, created_at, expires_at
+    FROM idempotency_keys WHERE user_id = %s AND idem_key = %s AND expires_at > %s
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, (user_id, key, datetime.utcnow()), fetch_one=True, dict_cursor=True)
+
+def complete_idempotency_key(user_id: int, key: str, status_code: int, response_body: str,
+                             expires_at: datetime) -> bool:
+    """Store the response for a claimed idempotency key and keep it until expires_at"""
+    query = """
+    UPDATE idempotency_keys SET status_code = %s, response_body = %s, expires_at = %s
+    WHERE user_id = %s AND idem_key = %s
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    db.execute(query, (status_code, response_body, expires_at, user_id, key))
+    return True
+
+def release_idempotency_key(user_id: int, key: str) -> bool:
+    """Drop a claim whose request failed, so the client can retry with the same key"""
+    query = "DELETE FROM idempotency_keys WHERE user_id = %s AND idem_key = %s"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    db.execute(query, (user_id, key))
+    return True
+
+def delete_expired_idempotency_keys() -> int:
+    """Delete idempotency entries past their TTL"""
+    query = "DELETE FROM idempotency_keys WHERE expires_at <= %s"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    return db.execute(query, (datetime.utcnow(),))
+
+# ============ COUNT OPERATIONS ============
+
+# Estimates below this are replaced by a real COUNT(*), which is cheap at that size
+EXACT_COUNT_THRESHOLD = 10000
+# How long approximate-mode listing counts are reused
+COUNT_CACHE_TTL_SECONDS = 30
+COUNT_CACHE_SIZE = 1024
+
+# (from_clause, where_clause, params) -> (expires_monotonic, total)
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+def _exact_count(from_clause: str, where_clause: str, params: List[Any]) -> int:
+    query = f"SELECT COUNT(*) FROM {from_clause} {where_clause}"
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    result = db.execute(query, tuple(params), fetch_one=True)
+    return result[0] if result else 0
+
+def _table_row_estimate(table: str) -> Optional[int]:
+    """Row count from ANALYZE statistics (pg_class.reltuples / sqlite_stat1); None before the first ANALYZE"""
+    try:
+        if db.db_type == 'postgresql':
+            result = db.execute("SELECT reltuples FROM pg_class WHERE relname = %s", (table,), fetch_one=True)
+            return int(result[0]) if result and result[0] >= 0 else None
+        # The first number of each sqlite_stat1 row is the table's row count
+        result = db.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table,), fetch_one=True)
+        return int(result[0].split()[0]) if result else None
+    except sqlite3.OperationalError:
+        return None  # no sqlite_stat1 until ANALYZE has run
+
+def _planner_row_estimate(from_clause: str, where_clause: str, params: List[Any]) -> Optional[int]:
+    """PostgreSQL planner row estimate for a filtered listing; plans the query without running it"""
+    result = db.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {from_clause} {where_clause}", tuple(params), fetch_one=True)
+    plan = result[0] if result else None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows']) if plan else None
+
+def count_listing(from_clause: str, where_clause: str, params: List[Any], exact: bool = False,
+                  table: Optional[str] = None) -> tuple:
+    """(total, total_is_estimate) for a paginated listing.
+    
+    exact=True always runs COUNT(*). Otherwise large listings use statistics:
+    reltuples / sqlite_stat1 when the listing is an unfiltered `table`, and on
+    PostgreSQL the planner estimate for filtered ones. Small or unestimated
+    listings get a real count that is reused for COUNT_CACHE_TTL_SECONDS.
+    """
+    if exact:
+        return _exact_count(from_clause, where_clause, params), False
+    
+    estimate = None
+    if table and not where_clause:
+        estimate = _table_row_estimate(table)
+    elif db.db_type == 'postgresql':
+        estimate = _planner_row_estimate(from_clause, where_clause, params)
+    if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+        return estimate, True
+    
+    key = (from_clause, where_clause, tuple(params))
+    now = time.monotonic()
+    with _count_cache_lock:
+        entry = _count_cache.get(key)
+        if entry is not None and entry[0] > now:
+            _count_cache.move_to_end(key)
+            return entry[1], True
+    total = _exact_count(from_clause, where_clause, params)
+    with _count_cache_lock:
+        _count_cache[key] = (now + COUNT_CACHE_TTL_SECONDS, total)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > COUNT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
+    return total, False
+
+def _page_total(total: int, total_is_estimate: bool, offset: int, page_rows: int, per_page: int) -> tuple:
+    """Tighten an estimated total with the page just read: a short page gives the exact total"""
+    if not total_is_estimate:
+        return total, False
+    if page_rows < per_page and (page_rows or offset == 0):
+        return offset + page_rows, False
+    return max(total, offset + page_rows), True
+
 # ============ QUERY HELPERS ============
 
-def get_users_with_filters(role: Optional[str] = None, is_active: Optional[bool] = None, search: Optional[str] = None, page: int = 1, per_page: int = 20) -> Dict:
-    """Get users with filters and pagination"""
+def _user_filters(role: Optional[str] = None, is_active: Optional[bool] = None, search: Optional[str] = None,
+                  is_verified: Optional[bool] = None) -> tuple:
+    """WHERE conditions and params for the admin user filters (on users)"""
     conditions = []
     params = []
     
@@ -599,29 +1528,38 @@ def get_users_with_filters(role: Optional[str] = None, is_active: Optional[bool]
     
     if is_active is not None:
         conditions.append("is_active = %s" if db.db_type == 'postgresql' else "is_active = ?")
-        params.append(1 if is_active else 0)
+        params.append(is_active)
+    
+    if is_verified is not None:
+        conditions.append("is_verified = %s" if db.db_type == 'postgresql' else "is_verified = ?")
+        params.append(is_verified)
     
     if search:
         conditions.append("(username LIKE %s OR email LIKE %s OR full_name LIKE %s)" if db.db_type == 'postgresql' else "(username LIKE ? OR email LIKE ? OR full_name LIKE ?)")
         search_term = f"%{search}%"
         params.extend([search_term, search_term, search_term])
     
+    return conditions, params
+
+def get_users_with_filters(role: Optional[str] = None, is_active: Optional[bool] = None, search: Optional[str] = None, page: int = 1, per_page: int = 20,
+                           is_verified: Optional[bool] = None, exact_count: bool = False) -> Dict:
+    """Get users with filters and pagination (password hashes are never selected)"""
+    conditions, params = _user_filters(role, is_active, search, is_verified)
+    
     where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
     
-    # Count total
-    count_query = f"SELECT COUNT(*) FROM users {where_clause}"
-    total = db.execute(count_query, tuple(params), fetch_one=True)
-    if isinstance(total, tuple):
-        total = total[0]
+    # Count total (approximate unless exact_count)
+    total, total_is_estimate = count_listing("users", where_clause, params, exact=exact_count, table='users')
     
     # Get paginated results
     offset = (page - 1) * per_page
-    query = f"SELECT * FROM users {where_clause} ORDER BY created_at DESC LIMIT %s OFFSET %s"
+    query = f"SELECT {', '.join(USER_EXPORT_COLUMNS)} FROM users {where_clause} ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s"
     if db.db_type == 'sqlite':
-        query = f"SELECT * FROM users {where_clause} ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        query = query.replace('%s', '?')
     
     params.extend([per_page, offset])
     results = db.execute(query, tuple(params), fetch_all=True, dict_cursor=True) or []
+    total, total_is_estimate = _page_total(total, total_is_estimate, offset, len(results), per_page)
     
     if db.db_type == 'sqlite':
         for r in results:
@@ -631,13 +1569,14 @@ def get_users_with_filters(role: Optional[str] = None, is_active: Optional[bool]
     return {
         'items': results,
         'total': total,
+        'total_is_estimate': total_is_estimate,
         'page': page,
         'per_page': per_page,
         'pages': (total + per_page - 1) // per_page
     }
 
-def get_providers_with_filters(verified: Optional[bool] = None, page: int = 1, per_page: int = 20) -> Dict:
-    """Get providers with filters and pagination"""
+def get_providers_with_filters(verified: Optional[bool] = None, page: int = 1, per_page: int = 20, exact_count: bool = False) -> Dict:
+    """Get providers with filters and pagination; user contact columns are joined in (id stays the profile's)"""
     conditions = ["p.is_active = 1", "u.is_active = 1"]
     params = []
     
@@ -647,19 +1586,17 @@ def get_providers_with_filters(verified: Optional[bool] = None, page: int = 1, p
     
     where_clause = "WHERE " + " AND ".join(conditions)
     
-    # Count total
-    count_query = f"SELECT COUNT(*) FROM providers p JOIN users u ON p.user_id = u.id {where_clause}"
-    total = db.execute(count_query, tuple(params), fetch_one=True)
-    if isinstance(total, tuple):
-        total = total[0]
+    # Count total (approximate unless exact_count)
+    total, total_is_estimate = count_listing("providers p JOIN users u ON p.user_id = u.id", where_clause, params, exact=exact_count)
     
     # Get paginated results
     offset = (page - 1) * per_page
     query = f"""
-    SELECT p.*, u.* FROM providers p 
+    SELECT p.*, u.username, u.email, u.full_name, u.phone, u.address, u.city, u.state, u.pincode
+    FROM providers p 
     JOIN users u ON p.user_id = u.id 
     {where_clause} 
-    ORDER BY p.created_at DESC 
+    ORDER BY p.created_at DESC, p.id DESC 
     LIMIT %s OFFSET %s
     """
     if db.db_type == 'sqlite':
@@ -667,6 +1604,7 @@ def get_providers_with_filters(verified: Optional[bool] = None, page: int = 1, p
     
     params.extend([per_page, offset])
     results = db.execute(query, tuple(params), fetch_all=True, dict_cursor=True) or []
+    total, total_is_estimate = _page_total(total, total_is_estimate, offset, len(results), per_page)
     
     if db.db_type == 'sqlite':
         for r in results:
@@ -676,112 +1614,161 @@ def get_providers_with_filters(verified: Optional[bool] = None, page: int = 1, p
     return {
         'items': results,
         'total': total,
+        'total_is_estimate': total_is_estimate,
         'page': page,
         'per_page': per_page,
         'pages': (total + per_page - 1) // per_page
     }
 
-def get_bookings_with_filters(status: Optional[str] = None, page: int = 1, per_page: int = 20) -> Dict:
-    """Get bookings with filters and pagination"""
+def get_bookings_with_filters(status: Optional[str] = None, page: int = 1, per_page: int = 20, exact_count: bool = False) -> Dict:
+    """Get bookings with filters and pagination, with client/provider names joined in"""
     conditions = []
     params = []
     
     if status:
-        conditions.append("status = %s" if db.db_type == 'postgresql' else "status = ?")
+        conditions.append("b.status = %s" if db.db_type == 'postgresql' else "b.status = ?")
         params.append(status)
     
     where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
     
-    # Count total
-    count_query = f"SELECT COUNT(*) FROM bookings {where_clause}"
-    total = db.execute(count_query, tuple(params), fetch_one=True)
-    if isinstance(total, tuple):
-        total = total[0]
+    # Count total (approximate unless exact_count)
+    total, total_is_estimate = count_listing("bookings b", where_clause, params, exact=exact_count, table='bookings')
     
     # Get paginated results
     offset = (page - 1) * per_page
-    query = f"SELECT * FROM bookings {where_clause} ORDER BY created_at DESC LIMIT %s OFFSET %s"
+    query = f"""
+    SELECT b.*,
+           c.username AS client_username, c.email AS client_email, c.full_name AS client_full_name,
+           pu.username AS provider_username, pu.email AS provider_email, pu.full_name AS provider_full_name
+    FROM bookings b
+    LEFT JOIN users c ON c.id = b.client_id
+    LEFT JOIN users pu ON pu.id = b.provider_id
+    {where_clause}
+    ORDER BY b.created_at DESC, b.id DESC
+    LIMIT %s OFFSET %s
+    """
     if db.db_type == 'sqlite':
-        query = f"SELECT * FROM bookings {where_clause} ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        query = query.replace('%s', '?')
     
     params.extend([per_page, offset])
     results = db.execute(query, tuple(params), fetch_all=True, dict_cursor=True) or []
+    total, total_is_estimate = _page_total(total, total_is_estimate, offset, len(results), per_page)
     
     return {
         'items': results,
         'total': total,
+        'total_is_estimate': total_is_estimate,
         'page': page,
         'per_page': per_page,
         'pages': (total + per_page - 1) // per_page
     }
 
-def get_providers_search(search: str = '', role: str = '', specialization: str = '', verified_only: bool = False,
-                        min_fee: Optional[float] = None, max_fee: Optional[float] = None,
-                        min_rating: Optional[float] = None, city: str = '', state: str = '',
-                        sort_by: str = 'rating', sort_order: str = 'desc', page: int = 1, per_page: int = 10) -> Dict:
-    """Get providers with search, filters, and pagination"""
-    conditions = ["u.is_active = 1", "p.is_active = 1"]
+def _provider_search_filters(search: str = '', role: str = '', specialization: str = '', verified_only: bool = False,
+                             min_fee: Optional[float] = None, max_fee: Optional[float] = None,
+                             min_rating: Optional[float] = None, city: str = '', state: str = '') -> tuple:
+    """WHERE clause and params for the provider search filters (on provider_search s)"""
+    conditions = ["s.is_listed = TRUE"]
     params = []
     
     if verified_only:
-        conditions.append("p.is_verified = 1")
+        conditions.append("s.is_verified = TRUE")
     
     if role:
-        conditions.append("u.role = %s" if db.db_type == 'postgresql' else "u.role = ?")
+        conditions.append("s.role = %s" if db.db_type == 'postgresql' else "s.role = ?")
         params.append(role)
     
     if specialization:
-        conditions.append("p.specialization LIKE %s" if db.db_type == 'postgresql' else "p.specialization LIKE ?")
+        conditions.append("s.specialization LIKE %s" if db.db_type == 'postgresql' else "s.specialization LIKE ?")
         params.append(f"%{specialization}%")
     
     if min_fee is not None:
-        conditions.append("p.consultation_fee >= %s" if db.db_type == 'postgresql' else "p.consultation_fee >= ?")
+        conditions.append("s.consultation_fee >= %s" if db.db_type == 'postgresql' else "s.consultation_fee >= ?")
         params.append(min_fee)
     
     if max_fee is not None:
-        conditions.append("p.consultation_fee <= %s" if db.db_type == 'postgresql' else "p.consultation_fee <= ?")
+        conditions.append("s.consultation_fee <= %s" if db.db_type == 'postgresql' else "s.consultation_fee <= ?")
         params.append(max_fee)
     
     if min_rating is not None:
-        conditions.append("p.rating >= %s" if db.db_type == 'postgresql' else "p.rating >= ?")
+        conditions.append("s.rating >= %s" if db.db_type == 'postgresql' else "s.rating >= ?")
         params.append(min_rating)
     
     if city:
-        conditions.append("u.city LIKE %s" if db.db_type == 'postgresql' else "u.city LIKE ?")
+        conditions.append("s.city LIKE %s" if db.db_type == 'postgresql' else "s.city LIKE ?")
         params.append(f"%{city}%")
     
     if state:
-        conditions.append("u.state LIKE %s" if db.db_type == 'postgresql' else "u.state LIKE ?")
+        conditions.append("s.state LIKE %s" if db.db_type == 'postgresql' else "s.state LIKE ?")
         params.append(f"%{state}%")
     
     if search:
-        conditions.append("(u.full_name LIKE %s OR u.username LIKE %s OR p.specialization LIKE %s OR p.bio LIKE %s OR u.city LIKE %s OR u.state LIKE %s)" if db.db_type == 'postgresql' else "(u.full_name LIKE ? OR u.username LIKE ? OR p.specialization LIKE ? OR p.bio LIKE ? OR u.city LIKE ? OR u.state LIKE ?)")
-        search_term = f"%{search}%"
-        params.extend([search_term, search_term, search_term, search_term, search_term, search_term])
-    
-    where_clause = "WHERE " + " AND ".join(conditions)
+        # Name, username, specialization, bio, city and state in one precomputed column
+        conditions.append("s.search_document LIKE %s" if db.db_type == 'postgresql' else "s.search_document LIKE ?")
+        params.append(f"%{search.lower()}%")
     
-    # Sorting
+    return "WHERE " + " AND ".join(conditions), params
+
+def _provider_search_order(sort_by: str = 'rating', sort_order: str = 'desc') -> str:
+    """ORDER BY clause for the provider search sort options"""
     sort_map = {
-        'rating': 'p.rating',
-        'fee': 'p.consultation_fee',
-        'experience': 'p.experience_years'
+        'rating': 's.rating',
+        'fee': 's.consultation_fee',
+        'experience': 's.experience_years'
+    }
+    sort_field = sort_map.get(sort_by, 's.rating')
+    return f"ORDER BY {sort_field} {'DESC' if sort_order == 'desc' else 'ASC'}"
+
+PROVIDER_SEARCH_SELECT = """
+    SELECT s.* FROM provider_search s
+"""
+
+def _format_provider_search_row(r: Dict) -> Dict:
+    """Provider search row -> API provider dict with nested user"""
+    return {
+        'id': r['id'],
+        'user_id': r['user_id'],
+        'specialization': r.get('specialization'),
+        'experience_years': r.get('experience_years', 0),
+        'bar_council_number': r.get('bar_council_number'),
+        'qualification': r.get('qualification'),
+        'bio': r.get('bio'),
+        'consultation_fee': float(r.get('consultation_fee', 0.0)),
+        'hourly_rate': float(r.get('hourly_rate', 0.0)),
+        'rating': float(r.get('rating', 0.0)),
+        'total_reviews': r.get('total_reviews', 0),
+        'is_verified': bool(r.get('is_verified', 0)) if db.db_type == 'sqlite' else r.get('is_verified', False),
+        'is_active': bool(r.get('is_active', 0)) if db.db_type == 'sqlite' else r.get('is_active', True),
+        'created_at': r['created_at'].isoformat() if isinstance(r.get('created_at'), datetime) else r.get('created_at'),
+        'user': {
+            'id': r['user_id'],
+            'username': r.get('username'),
+            'email': r.get('email'),
+            'full_name': r.get('full_name'),
+            'phone': r.get('phone'),
+            'address': r.get('address'),
+            'city': r.get('city'),
+            'state': r.get('state'),
+            'pincode': r.get('pincode')
+        }
     }
-    sort_field = sort_map.get(sort_by, 'p.rating')
-    order_clause = f"ORDER BY {sort_field} {'DESC' if sort_order == 'desc' else 'ASC'}"
+
+def get_providers_search(search: str = '', role: str = '', specialization: str = '', verified_only: bool = False,
+                        min_fee: Optional[float] = None, max_fee: Optional[float] = None,
+                        min_rating: Optional[float] = None, city: str = '', state: str = '',
+                        sort_by: str = 'rating', sort_order: str = 'desc', page: int = 1, per_page: int = 10,
+                        exact_count: bool = False) -> Dict:
+    """Get providers with search, filters, and pagination; the total is approximate unless exact_count"""
+    where_clause, params = _provider_search_filters(search, role, specialization, verified_only,
+                                                    min_fee, max_fee, min_rating, city, state)
+    order_clause = _provider_search_order(sort_by, sort_order)
     
     # Count total
-    count_query = f"SELECT COUNT(*) FROM providers p JOIN users u ON p.user_id = u.id {where_clause}"
-    total = db.execute(count_query, tuple(params), fetch_one=True)
-    if isinstance(total, tuple):
-        total = total[0]
+    total, total_is_estimate = count_listing("provider_search s", where_clause, params, exact=exact_count)
     
     # Get paginated results
     offset = (page - 1) * per_page
     query = f"""
-    SELECT p.*, u.id as user_table_id, u.username, u.email, u.full_name, u.phone, u.address, u.city, u.state, u.pincode
-    FROM providers p 
-    JOIN users u ON p.user_id = u.id 
+    {PROVIDER_SEARCH_SELECT}
     {where_clause} 
     {order_clause}
     LIMIT %s OFFSET %s
@@ -791,38 +1778,10 @@ def get_providers_search(search: str = '', role: str = '', specialization: str =
     
     params.extend([per_page, offset])
     results = db.execute(query, tuple(params), fetch_all=True, dict_cursor=True) or []
+    total, total_is_estimate = _page_total(total, total_is_estimate, offset, len(results), per_page)
     
     # Format results
-    formatted_results = []
-    for r in results:
-        provider_data = {
-            'id': r['id'],
-            'user_id': r['user_id'],
-            'specialization': r.get('specialization'),
-            'experience_years': r.get('experience_years', 0),
-            'bar_council_number': r.get('bar_council_number'),
-            'qualification': r.get('qualification'),
-            'bio': r.get('bio'),
-            'consultation_fee': float(r.get('consultation_fee', 0.0)),
-            'hourly_rate': float(r.get('hourly_rate', 0.0)),
-            'rating': float(r.get('rating', 0.0)),
-            'total_reviews': r.get('total_reviews', 0),
-            'is_verified': bool(r.get('is_verified', 0)) if db.db_type == 'sqlite' else r.get('is_verified', False),
-            'is_active': bool(r.get('is_active', 0)) if db.db_type == 'sqlite' else r.get('is_active', True),
-            'created_at': r.get('created_at'),
-            'user': {
-                'id': r.get('user_table_id'),
-                'username': r.get('username'),
-                'email': r.get('email'),
-                'full_name': r.get('full_name'),
-                'phone': r.get('phone'),
-                'address': r.get('address'),
-                'city': r.get('city'),
-                'state': r.get('state'),
-                'pincode': r.get('pincode')
-            }
-        }
-        formatted_results.append(provider_data)
+    formatted_results = [_format_provider_search_row(r) for r in results]
     
     return {
         'providers': formatted_results,
@@ -830,12 +1789,29 @@ def get_providers_search(search: str = '', role: str = '', specialization: str =
             'page': page,
             'per_page': per_page,
             'total': total,
+            'total_is_estimate': total_is_estimate,
             'pages': (total + per_page - 1) // per_page,
             'has_next': page * per_page < total,
             'has_prev': page > 1
         }
     }
 
+def get_provider_search_candidates(limit: int, sort_by: str = 'rating', sort_order: str = 'desc', **filters) -> List[Dict]:
+    """First `limit` providers matching the search filters, formatted like get_providers_search"""
+    where_clause, params = _provider_search_filters(**filters)
+    query = f"""
+    {PROVIDER_SEARCH_SELECT}
+    {where_clause} 
+    {_provider_search_order(sort_by, sort_order)}
+    LIMIT %s
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    params.append(limit)
+    results = db.execute(query, tuple(params), fetch_all=True, dict_cursor=True) or []
+    return [_format_provider_search_row(r) for r in results]
+
 def get_specializations() -> List[str]:
     """Get list of all specializations"""
     query = "SELECT DISTINCT specialization FROM providers WHERE specialization IS NOT NULL AND specialization != ''"
@@ -852,11 +1828,11 @@ def get_provider_stats() -> Dict:
     verified = db.execute(verified_query, fetch_one=True)
     avg_rating = db.execute(avg_rating_query, fetch_one=True)
     
-    if isinstance(total, tuple):
+    if total is not None:
         total = total[0]
-    if isinstance(verified, tuple):
+    if verified is not None:
         verified = verified[0]
-    if isinstance(avg_rating, tuple):
+    if avg_rating is not None:
         avg_rating = avg_rating[0] or 0.0
     
     return {
@@ -865,4 +1841,434 @@ def get_provider_stats() -> Dict:
         'average_rating': round(float(avg_rating), 2) if avg_rating else 0.0
     }
 
+# ============ BULK OPERATIONS ============
+
+USER_ROLES = ['client', 'advocate', 'mediator', 'arbitrator', 'notary', 'document_writer', 'admin']
+BOOKING_STATUSES = ['pending', 'confirmed', 'completed', 'cancelled']
+
+# Rows per INSERT batch / transaction
+BULK_CHUNK_SIZE = 1000
+# Values per IN (...) lookup; stays under SQLite's historical 999 parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+USER_COLUMNS = ['username', 'email', 'password_hash', 'role', 'full_name', 'phone', 'address', 'city', 'state', 'pincode',
+                'is_verified', 'is_active', 'created_at', 'updated_at']
+PROVIDER_COLUMNS = ['user_id', 'specialization', 'experience_years', 'bar_council_number', 'qualification', 'bio',
+                    'consultation_fee', 'hourly_rate', 'is_verified', 'is_active', 'created_at', 'updated_at']
+BOOKING_COLUMNS = ['client_id', 'provider_id', 'provider_profile_id', 'service_type', 'booking_date', 'end_time', 'duration_minutes',
+                   'fee', 'status', 'description', 'meeting_link', 'location', 'created_at', 'updated_at']
+
+class BulkValidationError(ValueError):
+    """Raised when a bulk batch has invalid rows; nothing is written"""
+    
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid row(s) in batch")
+
+def _chunks(items: List[Any], size: int):
+    """Yield successive slices of items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _existing_values(table: str, column: str, values: List[Any], conn=None) -> set:
+    """Return which of values already exist in table.column (seen through conn if given)"""
+    found = set()
+    unique_values = list({v for v in values if v is not None})
+    placeholder = '?' if db.db_type == 'sqlite' else '%s'
+    for chunk in _chunks(unique_values, LOOKUP_CHUNK_SIZE):
+        query = f"SELECT {column} FROM {table} WHERE {column} IN ({', '.join([placeholder] * len(chunk))})"
+        if conn is not None:
+            cursor = conn.cursor()
+            cursor.execute(query, tuple(chunk))
+            rows = cursor.fetchall()
+            cursor.close()
+        else:
+            rows = db.execute(query, tuple(chunk), fetch_all=True) or []
+        found.update(row[0] for row in rows)
+    return found
+
+def _profile_owners(profile_ids: List[Any], conn=None) -> Dict[int, int]:
+    """Map each existing provider profile id to its user_id (seen through conn if given)"""
+    owners = {}
+    unique_ids = list({v for v in profile_ids if v is not None})
+    placeholder = '?' if db.db_type == 'sqlite' else '%s'
+    for chunk in _chunks(unique_ids, LOOKUP_CHUNK_SIZE):
+        query = f"SELECT id, user_id FROM providers WHERE id IN ({', '.join([placeholder] * len(chunk))})"
+        if conn is not None:
+            cursor = conn.cursor()
+            cursor.execute(query, tuple(chunk))
+            rows = cursor.fetchall()
+            cursor.close()
+        else:
+            rows = db.execute(query, tuple(chunk), fetch_all=True) or []
+        owners.update((row[0], row[1]) for row in rows)
+    return owners
+
+def _insert_chunk(cursor, table: str, columns: List[str], chunk: List[tuple]) -> List[int]:
+    """Insert one chunk of rows and return their ids in input order"""
+    if db.db_type == 'postgresql':
+        from psycopg2.extras import execute_values
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s RETURNING id"
+        result = execute_values(cursor, query, chunk, page_size=len(chunk), fetch=True)
+        return [r[0] for r in result]
+    
+    # SQLite: the connection holds the write lock from the first INSERT until commit and a
+    # new INTEGER PRIMARY KEY is max(id) + 1, so the rowids of one executemany are consecutive.
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+    cursor.executemany(query, chunk)
+    cursor.execute("SELECT last_insert_rowid()")
+    last_id = cursor.fetchone()[0]
+    return list(range(last_id - len(chunk) + 1, last_id + 1))
+
+def _bulk_insert(table: str, columns: List[str], rows: List[tuple], chunk_size: int = BULK_CHUNK_SIZE, conn=None) -> List[int]:
+    """Insert rows in chunked transactions and return generated ids in input order.
+    
+    When conn is given the caller owns the transaction and nothing is committed here.
+    """
+    ids = []
+    if conn is not None:
+        cursor = conn.cursor()
+        try:
+            for chunk in _chunks(rows, chunk_size):
+                ids.extend(_insert_chunk(cursor, table, columns, chunk))
+        finally:
+            cursor.close()
+        return ids
+    
+    with db.get_connection() as own_conn:
+        cursor = own_conn.cursor()
+        try:
+            for chunk in _chunks(rows, chunk_size):
+                ids.extend(_insert_chunk(cursor, table, columns, chunk))
+                own_conn.commit()
+        finally:
+            cursor.close()
+    return ids
 
+def create_users_bulk(users: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE, conn=None) -> List[int]:
+    """Create many users and return their IDs in input order.
+    
+    Each row takes the same fields as create_user; pass 'password_hash' instead of
+    'password' to skip hashing here. The whole batch is validated (required fields,
+    role, duplicate username/email inside the batch and in the table) before any write.
+    """
+    errors = []
+    seen_usernames = set()
+    seen_emails = set()
+    for index, data in enumerate(users):
+        for field in ('username', 'email', 'full_name'):
+            if not data.get(field):
+                errors.append({'index': index, 'error': f'{field} is required'})
+        if not data.get('password') and not data.get('password_hash'):
+            errors.append({'index': index, 'error': 'password is required'})
+        if data.get('role', 'client') not in USER_ROLES:
+            errors.append({'index': index, 'error': 'Invalid role'})
+        if data.get('username') in seen_usernames:
+            errors.append({'index': index, 'error': 'Duplicate username in batch'})
+        if data.get('email') in seen_emails:
+            errors.append({'index': index, 'error': 'Duplicate email in batch'})
+        seen_usernames.add(data.get('username'))
+        seen_emails.add(data.get('email'))
+    
+    existing_usernames = _existing_values('users', 'username', [d.get('username') for d in users], conn=conn)
+    existing_emails = _existing_values('users', 'email', [d.get('email') for d in users], conn=conn)
+    for index, data in enumerate(users):
+        if data.get('username') in existing_usernames:
+            errors.append({'index': index, 'error': 'Username already exists'})
+        if data.get('email') in existing_emails:
+            errors.append({'index': index, 'error': 'Email already exists'})
+    
+    if errors:
+        raise BulkValidationError(sorted(errors, key=lambda e: e['index']))
+    
+    now = datetime.utcnow()
+    rows = [(
+        data['username'],
+        data['email'],
+        data.get('password_hash') or generate_password_hash(data['password']),
+        data.get('role', 'client'),
+        data['full_name'],
+        data.get('phone'),
+        data.get('address'),
+        data.get('city'),
+        data.get('state'),
+        data.get('pincode'),
+        data.get('is_verified', False),
+        data.get('is_active', True),
+        now,
+        now
+    ) for data in users]
+    return _bulk_insert('users', USER_COLUMNS, rows, chunk_size=chunk_size, conn=conn)
+
+def create_providers_bulk(providers: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE, conn=None) -> List[int]:
+    """Create many provider profiles and return their IDs in input order.
+    
+    Rows take the same fields as create_provider. Fails before writing if a user_id
+    is missing, repeated, unknown, or already has a profile. With conn, validation
+    also sees users inserted earlier in the same (uncommitted) transaction.
+    """
+    errors = []
+    seen_user_ids = set()
+    for index, data in enumerate(providers):
+        if not data.get('user_id'):
+            errors.append({'index': index, 'error': 'user_id is required'})
+        elif data['user_id'] in seen_user_ids:
+            errors.append({'index': index, 'error': 'Duplicate user_id in batch'})
+        seen_user_ids.add(data.get('user_id'))
+        for field in ('consultation_fee', 'hourly_rate', 'experience_years'):
+            if data.get(field) is not None and not isinstance(data[field], (int, float)):
+                errors.append({'index': index, 'error': f'{field} must be a number'})
+    
+    user_ids = [d.get('user_id') for d in providers]
+    known_users = _existing_values('users', 'id', user_ids, conn=conn)
+    existing_profiles = _existing_values('providers', 'user_id', user_ids, conn=conn)
+    for index, data in enumerate(providers):
+        if data.get('user_id') and data['user_id'] not in known_users:
+            errors.append({'index': index, 'error': 'User not found'})
+        if data.get('user_id') in existing_profiles:
+            errors.append({'index': index, 'error': 'Provider profile already exists'})
+    
+    if errors:
+        raise BulkValidationError(sorted(errors, key=lambda e: e['index']))
+    
+    now = datetime.utcnow()
+    rows = [(
+        data['user_id'],
+        data.get('specialization'),
+        data.get('experience_years', 0),
+        data.get('bar_council_number'),
+        data.get('qualification'),
+        data.get('bio'),
+        data.get('consultation_fee', 0.0),
+        data.get('hourly_rate', 0.0),
+        data.get('is_verified', False),
+        data.get('is_active', True),
+        now,
+        now
+    ) for data in providers]
+    ids = _bulk_insert('providers', PROVIDER_COLUMNS, rows, chunk_size=chunk_size, conn=conn)
+    sync_provider_search(provider_ids=ids, conn=conn)
+    return ids
+
+def create_bookings_bulk(bookings: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE, conn=None) -> List[int]:
+    """Create many bookings and return their IDs in input order.
+    
+    Rows take the same fields as create_booking. Fails before writing on missing
+    fields, unknown status, non-numeric fee, unknown client/provider/profile ids or a
+    profile that belongs to a different provider.
+    """
+    errors = []
+    for index, data in enumerate(bookings):
+        for field in ('client_id', 'provider_id', 'provider_profile_id', 'booking_date'):
+            if not data.get(field):
+                errors.append({'index': index, 'error': f'{field} is required'})
+        if not isinstance(data.get('fee'), (int, float)):
+            errors.append({'index': index, 'error': 'fee must be a number'})
+        if data.get('status', 'pending') not in BOOKING_STATUSES:
+            errors.append({'index': index, 'error': 'Invalid status'})
+    
+    known_users = _existing_values('users', 'id', [d.get('client_id') for d in bookings] + [d.get('provider_id') for d in bookings], conn=conn)
+    profile_owners = _profile_owners([d.get('provider_profile_id') for d in bookings], conn=conn)
+    for index, data in enumerate(bookings):
+        if data.get('client_id') and data['client_id'] not in known_users:
+            errors.append({'index': index, 'error': 'Client not found'})
+        if data.get('provider_id') and data['provider_id'] not in known_users:
+            errors.append({'index': index, 'error': 'Provider not found'})
+        if data.get('provider_profile_id') and data['provider_profile_id'] not in profile_owners:
+            errors.append({'index': index, 'error': 'Provider profile not found'})
+        elif data.get('provider_profile_id') and profile_owners[data['provider_profile_id']] != data.get('provider_id'):
+            errors.append({'index': index, 'error': 'Provider profile does not belong to provider'})
+    
+    if errors:
+        raise BulkValidationError(sorted(errors, key=lambda e: e['index']))
+    
+    now = datetime.utcnow()
+    rows = [(
+        data['client_id'],
+        data['provider_id'],
+        data['provider_profile_id'],
+        data.get('service_type'),
+        data['booking_date'],
+        data.get('end_time') or booking_end(data['booking_date'], data.get('duration_minutes', 60)),
+        data.get('duration_minutes', 60),
+        data['fee'],
+        data.get('status', 'pending'),
+        data.get('description'),
+        data.get('meeting_link'),
+        data.get('location'),
+        now,
+        now
+    ) for data in bookings]
+    def insert(conn):
+        ids = _bulk_insert('bookings', BOOKING_COLUMNS, rows, chunk_size=chunk_size, conn=conn)
+        _add_bookings_to_rollup(ids, conn=conn)
+        return ids
+    if conn is not None:
+        return insert(conn)
+    # The insert and its rollup deltas commit together
+    with db.get_connection() as conn:
+        return insert(conn)
+
+REVIEW_COLUMNS = ['booking_id', 'provider_id', 'client_id', 'rating', 'comment', 'created_at']
+MESSAGE_COLUMNS = ['booking_id', 'sender_id', 'receiver_id', 'subject', 'content', 'is_read', 'created_at']
+
+def create_reviews_bulk(reviews: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE, conn=None) -> List[int]:
+    """Create many reviews and return their IDs in input order (one review per booking)"""
+    errors = []
+    seen_bookings = set()
+    for index, data in enumerate(reviews):
+        for field in ('booking_id', 'provider_id', 'client_id'):
+            if not data.get(field):
+                errors.append({'index': index, 'error': f'{field} is required'})
+        if data.get('rating') not in (1, 2, 3, 4, 5):
+            errors.append({'index': index, 'error': 'rating must be between 1 and 5'})
+        if data.get('booking_id') in seen_bookings:
+            errors.append({'index': index, 'error': 'Duplicate booking_id in batch'})
+        seen_bookings.add(data.get('booking_id'))
+    
+    reviewed = _existing_values('reviews', 'booking_id', [d.get('booking_id') for d in reviews], conn=conn)
+    for index, data in enumerate(reviews):
+        if data.get('booking_id') in reviewed:
+            errors.append({'index': index, 'error': 'Booking already reviewed'})
+    
+    if errors:
+        raise BulkValidationError(sorted(errors, key=lambda e: e['index']))
+    
+    now = datetime.utcnow()
+    rows = [(
+        data['booking_id'],
+        data['provider_id'],
+        data['client_id'],
+        data['rating'],
+        data.get('comment'),
+        data.get('created_at') or now
+    ) for data in reviews]
+    return _bulk_insert('reviews', REVIEW_COLUMNS, rows, chunk_size=chunk_size, conn=conn)
+
+def create_messages_bulk(messages: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE, conn=None) -> List[int]:
+    """Create many messages and return their IDs in input order"""
+    errors = []
+    for index, data in enumerate(messages):
+        for field in ('sender_id', 'receiver_id', 'content'):
+            if not data.get(field):
+                errors.append({'index': index, 'error': f'{field} is required'})
+    
+    if errors:
+        raise BulkValidationError(errors)
+    
+    now = datetime.utcnow()
+    rows = [(
+        data.get('booking_id'),
+        data['sender_id'],
+        data['receiver_id'],
+        data.get('subject'),
+        data['content'],
+        data.get('is_read', False),
+        data.get('created_at') or now
+    ) for data in messages]
+    return _bulk_insert('messages', MESSAGE_COLUMNS, rows, chunk_size=chunk_size, conn=conn)
+
+def refresh_provider_ratings() -> int:
+    """Recompute rating and total_reviews for every reviewed provider from the reviews table"""
+    query = """
+    UPDATE providers SET
+        rating = (SELECT ROUND(AVG(r.rating) * 100) / 100.0 FROM reviews r WHERE r.provider_id = providers.id),
+        total_reviews = (SELECT COUNT(*) FROM reviews r WHERE r.provider_id = providers.id),
+        updated_at = %s
+    WHERE id IN (SELECT DISTINCT provider_id FROM reviews)
+    """
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    
+    with db.get_cursor() as cursor:
+        cursor.execute(query, (datetime.utcnow(),))
+        updated = cursor.rowcount
+        _sync_provider_search("p.id IN (SELECT DISTINCT provider_id FROM reviews)", (), cursor)
+        return updated
+
+# ============ EXPORT OPERATIONS ============
+
+USER_EXPORT_COLUMNS = ['id', 'username', 'email', 'role', 'full_name', 'phone', 'address', 'city', 'state', 'pincode',
+                       'is_verified', 'is_active', 'created_at', 'updated_at']
+PROVIDER_EXPORT_COLUMNS = ['id', 'user_id', 'username', 'email', 'full_name', 'role', 'city', 'state', 'specialization',
+                           'experience_years', 'bar_council_number', 'qualification', 'consultation_fee', 'hourly_rate',
+                           'rating', 'total_reviews', 'is_verified', 'is_active', 'created_at', 'updated_at']
+BOOKING_EXPORT_COLUMNS = ['id', 'client_id', 'provider_id', 'provider_profile_id', 'service_type', 'booking_date',
+                          'duration_minutes', 'fee', 'status', 'description', 'meeting_link', 'location',
+                          'created_at', 'updated_at']
+
+def _range_conditions(column: str, date_from: Optional[datetime], date_to: Optional[datetime], conditions: List[str], params: List[Any]):
+    """Append a half-open [date_from, date_to) range on column"""
+    if date_from is not None:
+        conditions.append(f"{column} >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append(f"{column} < %s")
+        params.append(date_to)
+
+def _stream_export(query: str, params: List[Any], bool_fields=('is_verified', 'is_active')):
+    """Stream export rows, normalizing SQLite booleans"""
+    if db.db_type == 'sqlite':
+        query = query.replace('%s', '?')
+    for row in db.stream(query, tuple(params)):
+        if db.db_type == 'sqlite':
+            for field in bool_fields:
+                if field in row and row[field] is not None:
+                    row[field] = bool(row[field])
+        yield row
+
+def iter_users_export(date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                      role: Optional[str] = None, is_active: Optional[bool] = None):
+    """Stream users created in [date_from, date_to), without password hashes"""
+    conditions = []
+    params = []
+    _range_conditions('created_at', date_from, date_to, conditions, params)
+    if role:
+        conditions.append("role = %s")
+        params.append(role)
+    if is_active is not None:
+        conditions.append("is_active = %s")
+        params.append(is_active)
+    
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT {', '.join(USER_EXPORT_COLUMNS)} FROM users {where_clause} ORDER BY created_at, id"
+    return _stream_export(query, params)
+
+def iter_providers_export(date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                          is_active: Optional[bool] = None, verified: Optional[bool] = None):
+    """Stream provider profiles created in [date_from, date_to) with their user columns"""
+    conditions = []
+    params = []
+    _range_conditions('p.created_at', date_from, date_to, conditions, params)
+    if is_active is not None:
+        conditions.append("p.is_active = %s")
+        params.append(is_active)
+    if verified is not None:
+        conditions.append("p.is_verified = %s")
+        params.append(verified)
+    
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+    SELECT p.id, p.user_id, u.username, u.email, u.full_name, u.role, u.city, u.state, p.specialization,
+           p.experience_years, p.bar_council_number, p.qualification, p.consultation_fee, p.hourly_rate,
+           p.rating, p.total_reviews, p.is_verified, p.is_active, p.created_at, p.updated_at
+    FROM providers p
+    JOIN users u ON p.user_id = u.id
+    {where_clause}
+    ORDER BY p.created_at, p.id
+    """
+    return _stream_export(query, params)
+
+def iter_bookings_export(date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                         status: Optional[str] = None):
+    """Stream bookings scheduled in [date_from, date_to), optionally for one status"""
+    conditions = []
+    params = []
+    if status:
+        conditions.append("status = %s")
+        params.append(status)
+    _range_conditions('booking_date', date_from, date_to, conditions, params)
+    
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT {', '.join(BOOKING_EXPORT_COLUMNS)} FROM bookings {where_clause} ORDER BY booking_date, id"
+    return _stream_export(query, params, bool_fields=())
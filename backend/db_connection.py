@@ -3,17 +3,40 @@ import os
 import sqlite3
 from contextlib import contextmanager
 from urllib.parse import urlparse
+from datetime import datetime
 import threading
 
-# Optional PostgreSQL support
-try:
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-    PSYCOPG2_AVAILABLE = True
-except ImportError:
-    PSYCOPG2_AVAILABLE = False
-    psycopg2 = None
-    RealDictCursor = None
+# Optional PostgreSQL support, imported on first use so SQLite deployments never load it
+psycopg2 = None
+RealDictCursor = None
+
+# Bump whenever create_tables gains DDL; boots with a current schema skip create_tables
+SCHEMA_VERSION = 12
+
+def _load_psycopg2():
+    """Import psycopg2 on first PostgreSQL connection"""
+    global psycopg2, RealDictCursor
+    if psycopg2 is None:
+        try:
+            import psycopg2 as _psycopg2
+            import psycopg2.pool
+            from psycopg2.extras import RealDictCursor as _RealDictCursor
+        except ImportError:
+            raise ImportError("psycopg2 is required for PostgreSQL but is not installed. Install it with: pip install psycopg2-binary")
+        psycopg2, RealDictCursor = _psycopg2, _RealDictCursor
+    return psycopg2
+
+def _parse_timestamp(value):
+    """SQLite TIMESTAMP text -> datetime like psycopg2 returns; a value that isn't ISO 8601 stays text"""
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+# SQLite hands TIMESTAMP columns back as text. This replaces the stdlib's own 'timestamp'
+# converter, and only applies to connections opened with PARSE_DECLTYPES (get_connection)
+sqlite3.register_converter('TIMESTAMP', _parse_timestamp)
 
 class DatabaseConnection:
     """Database connection manager using raw SQL"""
@@ -23,6 +46,15 @@ class DatabaseConnection:
     def __init__(self, database_url=None):
         """Initialize database connection"""
         self.database_url = database_url or os.environ.get('DATABASE_URL') or 'sqlite:///nyay_sahyog.db'
+        # PostgreSQL connections per process; size maxconn to at least the worker's thread count
+        self.pool_min = int(os.environ.get('DB_POOL_MIN', 1))
+        self.pool_max = int(os.environ.get('DB_POOL_MAX', 10))
+        # Seconds a caller waits for a free pooled connection before giving up
+        self.pool_timeout = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+        self._pool = None
+        self._pool_slots = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
         self._parse_database_url()
     
     def _parse_database_url(self):
@@ -46,25 +78,65 @@ class DatabaseConnection:
             else:
                 self.db_path = self.database_url
     
+    def _get_pool(self):
+        """(pool, slots) for this process, created lazily (never shared across fork)
+
+        ThreadedConnectionPool raises PoolError as soon as it is exhausted; the
+        slots semaphore (one per connection) makes callers wait for a free one instead.
+        """
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # A pool inherited from the parent shares its sockets; drop it without closing them
+                self._pool = _load_psycopg2().pool.ThreadedConnectionPool(
+                    self.pool_min, self.pool_max, **self.db_config
+                )
+                self._pool_slots = threading.BoundedSemaphore(self.pool_max)
+                self._pool_pid = os.getpid()
+            return self._pool, self._pool_slots
+    
+    def close_pool(self):
+        """Close this process's pooled connections (e.g. in the server master before forking)"""
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.closeall()
+            self._pool = None
+            self._pool_slots = None
+            self._pool_pid = None
+    
+    def discard_pool(self):
+        """Forget an inherited pool after fork; the child opens its own on first use"""
+        with self._pool_lock:
+            self._pool = None
+            self._pool_slots = None
+            self._pool_pid = None
+    
     @contextmanager
     def get_connection(self):
         """Get database connection (context manager)"""
         if self.db_type == 'postgresql':
-            if not PSYCOPG2_AVAILABLE:
-                raise ImportError("psycopg2 is required for PostgreSQL but is not installed. Install it with: pip install psycopg2-binary")
-            conn = psycopg2.connect(**self.db_config)
+            pool, slots = self._get_pool()
+            if not slots.acquire(timeout=self.pool_timeout):
+                raise psycopg2.pool.PoolError(f'No database connection available within {self.pool_timeout:g}s')
+            try:
+                conn = pool.getconn()
+            except Exception:
+                slots.release()
+                raise
             conn.autocommit = False
             try:
                 yield conn
                 conn.commit()
             except Exception:
-                conn.rollback()
+                if not conn.closed:
+                    conn.rollback()
                 raise
             finally:
-                conn.close()
+                # Broken connections are closed instead of going back into the pool
+                pool.putconn(conn, close=bool(conn.closed))
+                slots.release()
         else:
             # SQLite
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
             conn.row_factory = sqlite3.Row
             try:
                 yield conn
@@ -117,9 +189,51 @@ class DatabaseConnection:
         """Execute query multiple times with different parameters"""
         with self.get_cursor() as cursor:
             cursor.executemany(query, params_list)
+
+    def stream(self, query, params=None, batch_size=1000):
+        """Yield result rows as dicts, fetching batch_size rows at a time.
+
+        PostgreSQL uses a named (server-side) cursor so the result set is never
+        fully materialized in the worker; SQLite steps through the statement lazily.
+        """
+        with self.get_connection() as conn:
+            if self.db_type == 'postgresql':
+                cursor = conn.cursor(name=f'stream_{threading.get_ident()}_{id(conn)}', cursor_factory=RealDictCursor)
+                cursor.itersize = batch_size
+            else:
+                cursor = conn.cursor()
+            try:
+                cursor.execute(query, params or ())
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(row)
+            finally:
+                cursor.close()
     
-    def create_tables(self):
-        """Create database tables if they don't exist"""
+    def stream_batches(self, query, params=None, batch_size=10000):
+        """Yield result rows as lists of plain tuples, batch_size rows at a time (for columnar loading)"""
+        with self.get_connection() as conn:
+            if self.db_type == 'postgresql':
+                cursor = conn.cursor(name=f'batches_{threading.get_ident()}_{id(conn)}')
+                cursor.itersize = batch_size
+            else:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+            try:
+                cursor.execute(query, params or ())
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+
+    def create_tables(self, version=None):
+        """Create database tables if they don't exist; records version in the same transaction when given"""
         create_tables_sql = """
         -- Users table
         CREATE TABLE IF NOT EXISTS users (
@@ -179,6 +293,164 @@ class DatabaseConnection:
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+
+        -- Reviews table
+        CREATE TABLE IF NOT EXISTS reviews (
+            id SERIAL PRIMARY KEY,
+            booking_id INTEGER UNIQUE NOT NULL REFERENCES bookings(id),
+            provider_id INTEGER NOT NULL REFERENCES providers(id),
+            client_id INTEGER NOT NULL REFERENCES users(id),
+            rating INTEGER NOT NULL,
+            comment TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_reviews_provider_id ON reviews(provider_id);
+        
+        -- Messages table
+        CREATE TABLE IF NOT EXISTS messages (
+            id SERIAL PRIMARY KEY,
+            booking_id INTEGER REFERENCES bookings(id),
+            sender_id INTEGER NOT NULL REFERENCES users(id),
+            receiver_id INTEGER NOT NULL REFERENCES users(id),
+            subject VARCHAR(200),
+            content TEXT NOT NULL,
+            is_read BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_messages_sender_id ON messages(sender_id);
+        CREATE INDEX IF NOT EXISTS idx_messages_receiver_id ON messages(receiver_id);
+        
+        -- Revoked JWTs (logout), pruned once the token would have expired anyway
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            jti VARCHAR(64) PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            expires_at TIMESTAMP NOT NULL,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
+        CREATE INDEX IF NOT EXISTS idx_revoked_tokens_revoked_at ON revoked_tokens(revoked_at);
+        
+        -- Idempotency-Key replay store (POST /api/bookings), response_body is NULL while in progress
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id INTEGER NOT NULL,
+            idem_key VARCHAR(255) NOT NULL,
+            fingerprint VARCHAR(64) NOT NULL,
+            status_code INTEGER,
+            response_body TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (user_id, idem_key)
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+        
+        -- Columns added after the initial schema
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER DEFAULT 0;
+        CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users(updated_at);
+        
+        -- Export / reporting range scans
+        CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
+        CREATE INDEX IF NOT EXISTS idx_providers_created_at ON providers(created_at);
+        CREATE INDEX IF NOT EXISTS idx_bookings_booking_date ON bookings(booking_date);
+        CREATE INDEX IF NOT EXISTS idx_bookings_status_booking_date ON bookings(status, booking_date);
+        
+        -- Booking end times for overlap checks, backfilled from booking_date + duration_minutes
+        ALTER TABLE bookings ADD COLUMN IF NOT EXISTS end_time TIMESTAMP;
+        UPDATE bookings SET end_time = booking_date + COALESCE(duration_minutes, 60) * INTERVAL '1 minute' WHERE end_time IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_bookings_provider_schedule ON bookings(provider_id, booking_date, end_time);
+        
+        -- Weekly working hours per provider profile, minutes from midnight UTC, weekday 0 is Monday
+        CREATE TABLE IF NOT EXISTS provider_working_hours (
+            id SERIAL PRIMARY KEY,
+            provider_id INTEGER NOT NULL REFERENCES providers(id) ON DELETE CASCADE,
+            weekday INTEGER NOT NULL,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_provider_working_hours_provider_id ON provider_working_hours(provider_id, weekday);
+        
+        -- Per-user booking lists filtered by status and ordered by date
+        CREATE INDEX IF NOT EXISTS idx_bookings_provider_status_date ON bookings(provider_id, status, booking_date);
+        CREATE INDEX IF NOT EXISTS idx_bookings_client_status_date ON bookings(client_id, status, booking_date);
+        
+        -- Admin analytics rollup, bookings and fee totals per booking day, status, service type and provider role
+        CREATE TABLE IF NOT EXISTS booking_daily_rollup (
+            day DATE NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            service_type VARCHAR(100) NOT NULL DEFAULT '',
+            provider_role VARCHAR(20) NOT NULL DEFAULT '',
+            booking_count INTEGER NOT NULL DEFAULT 0,
+            revenue DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status, service_type, provider_role)
+        );
+        
+        -- Rollup totals were created as float4, which drops whole rupees on busy days
+        ALTER TABLE booking_daily_rollup ALTER COLUMN revenue TYPE DOUBLE PRECISION;
+        
+        INSERT INTO booking_daily_rollup (day, status, service_type, provider_role, booking_count, revenue)
+        SELECT CAST(b.booking_date AS DATE), b.status, COALESCE(b.service_type, ''), COALESCE(u.role, ''),
+               COUNT(*), COALESCE(SUM(b.fee), 0)
+        FROM bookings b
+        LEFT JOIN users u ON u.id = b.provider_id
+        WHERE NOT EXISTS (SELECT 1 FROM booking_daily_rollup)
+        GROUP BY 1, 2, 3, 4;
+        
+        -- Data version probe for cached analytics, MAX(updated_at)
+        CREATE INDEX IF NOT EXISTS idx_bookings_updated_at ON bookings(updated_at);
+        
+        -- Denormalized provider listing, one row per provider profile with its user columns, kept in sync by db_access
+        CREATE TABLE IF NOT EXISTS provider_search (
+            id INTEGER PRIMARY KEY REFERENCES providers(id) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL,
+            role VARCHAR(20),
+            username VARCHAR(80),
+            email VARCHAR(120),
+            full_name VARCHAR(200),
+            phone VARCHAR(20),
+            address TEXT,
+            city VARCHAR(100),
+            state VARCHAR(100),
+            pincode VARCHAR(10),
+            specialization VARCHAR(200),
+            experience_years INTEGER,
+            bar_council_number VARCHAR(100),
+            qualification TEXT,
+            bio TEXT,
+            consultation_fee REAL,
+            hourly_rate REAL,
+            rating REAL,
+            total_reviews INTEGER,
+            is_verified BOOLEAN,
+            is_active BOOLEAN,
+            is_listed BOOLEAN,
+            created_at TIMESTAMP,
+            search_document TEXT
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_provider_search_user_id ON provider_search(user_id);
+        CREATE INDEX IF NOT EXISTS idx_provider_search_listed_rating ON provider_search(is_listed, rating);
+        CREATE INDEX IF NOT EXISTS idx_provider_search_listed_fee ON provider_search(is_listed, consultation_fee);
+        CREATE INDEX IF NOT EXISTS idx_provider_search_listed_experience ON provider_search(is_listed, experience_years);
+        
+        INSERT INTO provider_search
+        SELECT p.id, p.user_id, u.role, u.username, u.email, u.full_name, u.phone, u.address, u.city, u.state, u.pincode,
+               p.specialization, p.experience_years, p.bar_council_number, p.qualification, p.bio,
+               p.consultation_fee, p.hourly_rate, p.rating, p.total_reviews, p.is_verified, p.is_active,
+               (u.is_active AND p.is_active), p.created_at,
+               LOWER(COALESCE(u.full_name, '') || '|' || COALESCE(u.username, '') || '|' || COALESCE(p.specialization, '') || '|' ||
+                     COALESCE(p.bio, '') || '|' || COALESCE(u.city, '') || '|' || COALESCE(u.state, ''))
+        FROM providers p
+        JOIN users u ON u.id = p.user_id
+        WHERE NOT EXISTS (SELECT 1 FROM provider_search);
+        
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
         """
         
         # SQLite uses different syntax
@@ -187,7 +459,7 @@ class DatabaseConnection:
             create_tables_sql = create_tables_sql.replace('REAL', 'REAL')
             create_tables_sql = create_tables_sql.replace('BOOLEAN', 'INTEGER')
             create_tables_sql = create_tables_sql.replace('TIMESTAMP', 'TIMESTAMP')
-            create_tables_sql = create_tables_sql.replace('CURRENT_TIMESTAMP', "datetime('now')")
+            create_tables_sql = create_tables_sql.replace('CURRENT_TIMESTAMP', "(datetime('now'))")
             create_tables_sql = create_tables_sql.replace('VARCHAR', 'VARCHAR')
             create_tables_sql = create_tables_sql.replace('TEXT', 'TEXT')
             # SQLite doesn't support SERIAL, use INTEGER PRIMARY KEY AUTOINCREMENT
@@ -197,21 +469,73 @@ class DatabaseConnection:
             create_tables_sql = create_tables_sql.replace('DEFAULT TRUE', 'DEFAULT 1')
             create_tables_sql = create_tables_sql.replace('FALSE', '0')
             create_tables_sql = create_tables_sql.replace('TRUE', '1')
+            # SQLite has no ADD COLUMN IF NOT EXISTS; the duplicate column error is ignored below
+            create_tables_sql = create_tables_sql.replace('ADD COLUMN IF NOT EXISTS', 'ADD COLUMN')
+            # Date arithmetic, normalizing offset-suffixed booking dates to naive UTC on the way
+            create_tables_sql = create_tables_sql.replace(
+                "SET end_time = booking_date + COALESCE(duration_minutes, 60) * INTERVAL '1 minute'",
+                "SET booking_date = datetime(booking_date), end_time = datetime(booking_date, '+' || COALESCE(duration_minutes, 60) || ' minutes')"
+            )
+            create_tables_sql = create_tables_sql.replace('CAST(b.booking_date AS DATE)', 'date(b.booking_date)')
+            # SQLite REAL is already 8 bytes and has no ALTER COLUMN
+            create_tables_sql = create_tables_sql.replace(
+                'ALTER TABLE booking_daily_rollup ALTER COLUMN revenue TYPE DOUBLE PRECISION;', ''
+            )
         
-        # Split by semicolon and execute each statement
+        # Split by semicolon and execute each statement; any real failure rolls the whole
+        # upgrade back so the version is never recorded for a half-applied schema
         statements = [s.strip() for s in create_tables_sql.split(';') if s.strip()]
+        version_query = "INSERT INTO schema_version (version, applied_at) VALUES (%s, %s)"
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            for statement in statements:
-                if statement:
-                    try:
-                        cursor.execute(statement)
-                    except Exception as e:
-                        # Table might already exist, ignore
-                        if 'already exists' not in str(e).lower() and 'duplicate' not in str(e).lower():
-                            print(f"Warning: {e}")
-            conn.commit()
-            cursor.close()
+            try:
+                if self.db_type == 'sqlite':
+                    # sqlite3 autocommits DDL unless a transaction is already open
+                    cursor.execute("BEGIN")
+                    version_query = version_query.replace('%s', '?')
+                for statement in statements:
+                    self._execute_ddl(cursor, statement)
+                if version is not None:
+                    cursor.execute(version_query, (version, datetime.utcnow()))
+            finally:
+                cursor.close()
+    
+    def _execute_ddl(self, cursor, statement):
+        """Run one schema statement, ignoring already-exists / duplicate-column errors"""
+        if self.db_type == 'postgresql':
+            # Any error aborts a PostgreSQL transaction; the savepoint lets ignored ones be undone alone
+            cursor.execute("SAVEPOINT schema_statement")
+        try:
+            cursor.execute(statement)
+        except Exception as e:
+            message = str(e).lower()
+            if 'already exists' not in message and 'duplicate' not in message:
+                raise
+            if self.db_type == 'postgresql':
+                cursor.execute("ROLLBACK TO SAVEPOINT schema_statement")
+        if self.db_type == 'postgresql':
+            cursor.execute("RELEASE SAVEPOINT schema_statement")
+    
+    def integrity_errors(self):
+        """Exception types the driver raises for constraint violations (unique, foreign key, ...)"""
+        if self.db_type == 'postgresql':
+            return (_load_psycopg2().IntegrityError,)
+        return (sqlite3.IntegrityError,)
+    
+    def get_schema_version(self):
+        """Schema version recorded by ensure_schema, or None for a fresh / pre-versioning database"""
+        try:
+            result = self.execute("SELECT MAX(version) FROM schema_version", fetch_one=True)
+            return result[0] if result else None
+        except Exception:
+            return None
+    
+    def ensure_schema(self):
+        """Run create_tables only when the recorded schema version is behind; returns True if DDL ran"""
+        if (self.get_schema_version() or 0) >= SCHEMA_VERSION:
+            return False
+        self.create_tables(version=SCHEMA_VERSION)
+        return True
 
 # Global database instance
 db = DatabaseConnection()
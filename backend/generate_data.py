@@ -0,0 +1,320 @@
+"""Synthetic data generator for benchmarking, built on the raw-SQL bulk inserts
+
+Usage:
+    python generate_data.py --clients 100000 --providers 10000 --bookings 500000 [--seed 42] [--workers 4]
+
+Rows are generated in fixed-size shards on a process pool (each shard has its own
+seed, so output depends only on --seed and the counts, not on --workers) and written
+by the parent through the db_access bulk APIs. Every user gets the same password
+('password123'), hashed once up front.
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+from werkzeug.security import generate_password_hash
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+from db_connection import db
+from db_access import (
+    create_users_bulk, create_providers_bulk, create_bookings_bulk,
+    create_reviews_bulk, create_messages_bulk, refresh_provider_ratings
+)
+
+DEFAULT_PASSWORD = 'password123'
+SHARD_SIZE = 10000
+
+# (city, state, relative weight) - metro-heavy, long tail of tier-2 cities
+CITIES = [
+    ('Mumbai', 'Maharashtra', 18), ('Delhi', 'Delhi', 17), ('Bangalore', 'Karnataka', 12),
+    ('Hyderabad', 'Telangana', 8), ('Chennai', 'Tamil Nadu', 8), ('Kolkata', 'West Bengal', 7),
+    ('Pune', 'Maharashtra', 6), ('Ahmedabad', 'Gujarat', 5), ('Jaipur', 'Rajasthan', 4),
+    ('Lucknow', 'Uttar Pradesh', 3), ('Chandigarh', 'Punjab', 2), ('Kochi', 'Kerala', 2),
+    ('Indore', 'Madhya Pradesh', 2), ('Bhopal', 'Madhya Pradesh', 1), ('Patna', 'Bihar', 1),
+    ('Nagpur', 'Maharashtra', 1), ('Guwahati', 'Assam', 1), ('Bhubaneswar', 'Odisha', 1),
+]
+SPECIALIZATIONS = [
+    ('Criminal Law', 16), ('Family Law', 15), ('Property Law', 12), ('Civil Law', 11), ('Corporate Law', 8),
+    ('Tax Law', 6), ('Labour Law', 5), ('Consumer Protection', 5), ('Banking Law', 4), ('Constitutional Law', 3),
+    ('Intellectual Property', 3), ('Cyber Law', 3), ('Real Estate Law', 3), ('Immigration Law', 2),
+    ('Environmental Law', 2), ('Insurance Law', 2),
+]
+PROVIDER_ROLES = [('advocate', 70), ('notary', 10), ('mediator', 8), ('document_writer', 7), ('arbitrator', 5)]
+SERVICE_TYPES = [('consultation', 60), ('document_review', 15), ('court_representation', 10),
+                 ('mediation', 8), ('notarization', 7)]
+FIRST_NAMES = ['Aarav', 'Priya', 'Rohan', 'Sneha', 'Vishal', 'Ananya', 'Karan', 'Neha', 'Arjun', 'Meera',
+               'Kabir', 'Divya', 'Harsh', 'Pooja', 'Manish', 'Sara', 'Sameer', 'Isha', 'Rahul', 'Tara',
+               'Lakshya', 'Kiara', 'Dev', 'Sonal', 'Vipul', 'Natasha', 'Krishna', 'Reema', 'Siddharth', 'Aditi']
+LAST_NAMES = ['Sharma', 'Mehta', 'Verma', 'Kulkarni', 'Singh', 'Gupta', 'Malhotra', 'Patil', 'Reddy', 'Joshi',
+              'Khanna', 'Chauhan', 'Nair', 'Yadav', 'Khan', 'Sheikh', 'Bansal', 'Chawla', 'Bhat', 'Goyal',
+              'Kapoor', 'Negi', 'Arora', 'Sinha', 'Pillai', 'Rao', 'Jain', 'Mishra', 'Iyer', 'Desai']
+REVIEW_COMMENTS = ['Very helpful consultation.', 'Explained everything clearly.', 'Good advice, fair fee.',
+                   'Responsive and professional.', 'Could have been more detailed.', 'Not satisfied with the outcome.']
+MESSAGE_SNIPPETS = ['Please find the documents attached.', 'Can we reschedule to next week?',
+                    'Thank you for the update.', 'What should I bring to the meeting?',
+                    'The hearing date has been fixed.', 'I have reviewed the draft.']
+
+
+def _weighted(options):
+    """Split [(value..., weight)] into (values, cumulative weights) for rng.choices"""
+    values = [o[:-1] if len(o) > 2 else o[0] for o in options]
+    cum_weights = []
+    total = 0
+    for o in options:
+        total += o[-1]
+        cum_weights.append(total)
+    return values, cum_weights
+
+
+CITY_CHOICES = _weighted(CITIES)
+SPECIALIZATION_CHOICES = _weighted(SPECIALIZATIONS)
+ROLE_CHOICES = _weighted(PROVIDER_ROLES)
+SERVICE_CHOICES = _weighted(SERVICE_TYPES)
+
+# Per-worker context set by the pool initializer so large id lists are pickled once per process
+_context: Dict[str, Any] = {}
+
+
+def _init_worker(context):
+    _context.clear()
+    _context.update(context)
+
+
+def _rng(seed: int, phase: int, shard: int) -> random.Random:
+    return random.Random(seed * 1_000_003 + phase * 10_007 + shard)
+
+
+def _person(rng: random.Random, prefix: str, kind: str, index: int) -> Dict[str, Any]:
+    city, state = rng.choices(CITY_CHOICES[0], cum_weights=CITY_CHOICES[1])[0]
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        'username': f'{prefix}_{kind}{index}',
+        'email': f'{prefix}_{kind}{index}@example.com',
+        'password_hash': _context['password_hash'],
+        'full_name': f'{first} {last}',
+        'phone': f'9{rng.randrange(10**8, 10**9)}',
+        'city': city,
+        'state': state,
+        'pincode': str(rng.randrange(110001, 855999)),
+        'is_verified': rng.random() < 0.8,
+        'is_active': rng.random() < 0.98,
+    }
+
+
+def _client_shard(shard: int, start: int, count: int) -> List[Dict[str, Any]]:
+    rng = _rng(_context['seed'], 1, shard)
+    return [dict(_person(rng, _context['prefix'], 'client', i), role='client') for i in range(start, start + count)]
+
+
+def _provider_shard(shard: int, start: int, count: int) -> List[Dict[str, Any]]:
+    """Provider users with their profile fields under 'profile'"""
+    rng = _rng(_context['seed'], 2, shard)
+    rows = []
+    for i in range(start, start + count):
+        user = _person(rng, _context['prefix'], 'provider', i)
+        user['role'] = rng.choices(ROLE_CHOICES[0], cum_weights=ROLE_CHOICES[1])[0]
+        experience = min(45, int(rng.expovariate(1 / 9)))
+        # Fees are log-normal and grow with experience
+        fee = round(rng.lognormvariate(6.5, 0.6) * (1 + experience / 15), -1)
+        user['profile'] = {
+            'specialization': rng.choices(SPECIALIZATION_CHOICES[0], cum_weights=SPECIALIZATION_CHOICES[1])[0],
+            'experience_years': experience,
+            'bar_council_number': f'{user["state"][:2].upper()}/{rng.randrange(1000, 99999)}/{2024 - experience}'
+            if user['role'] == 'advocate' else None,
+            'qualification': 'LLB' if rng.random() < 0.7 else 'LLM',
+            'bio': f'{experience} years of practice in {user["city"]}.',
+            'consultation_fee': fee,
+            'hourly_rate': round(fee * rng.uniform(1.5, 3.0), -1),
+            'is_verified': rng.random() < 0.75,
+            'is_active': True,
+        }
+        rows.append(user)
+    return rows
+
+
+def _booking_shard(shard: int, start: int, count: int) -> List[Dict[str, Any]]:
+    rng = _rng(_context['seed'], 3, shard)
+    clients = _context['client_ids']
+    providers = _context['providers']
+    # Pareto-weighted provider popularity: a few busy practices, a long tail of quiet ones
+    provider_weights = _context['provider_cum_weights']
+    now = _context['now']
+    rows = []
+    for _ in range(count):
+        provider_id, profile_id, fee = rng.choices(providers, cum_weights=provider_weights)[0]
+        # 85% in the past year, 15% in the next 60 days; weekdays and office hours dominate
+        if rng.random() < 0.85:
+            day = now - timedelta(days=int(rng.triangular(0, 365, 0)) + 1)
+        else:
+            day = now + timedelta(days=rng.randrange(0, 60))
+        if day.weekday() == 6 and rng.random() < 0.8:
+            day += timedelta(days=1)
+        booking_date = day.replace(hour=rng.choices(range(9, 19), weights=[3, 8, 9, 8, 4, 6, 8, 8, 6, 3])[0],
+                                   minute=rng.choice((0, 30)), second=0, microsecond=0)
+        if booking_date < now:
+            status = rng.choices(('completed', 'cancelled', 'confirmed'), weights=(78, 17, 5))[0]
+        else:
+            status = rng.choices(('pending', 'confirmed', 'cancelled'), weights=(45, 45, 10))[0]
+        rows.append({
+            'client_id': rng.choice(clients),
+            'provider_id': provider_id,
+            'provider_profile_id': profile_id,
+            'service_type': rng.choices(SERVICE_CHOICES[0], cum_weights=SERVICE_CHOICES[1])[0],
+            'booking_date': booking_date,
+            'duration_minutes': rng.choices((30, 60, 90, 120), weights=(25, 55, 12, 8))[0],
+            'fee': fee,
+            'status': status,
+            'description': 'Generated booking',
+        })
+    return rows
+
+
+def _review_and_message_shard(shard: int, bookings: List[tuple]) -> Dict[str, List[Dict[str, Any]]]:
+    """bookings: (booking_id, client_id, provider_id, profile_id, status, booking_date)"""
+    rng = _rng(_context['seed'], 4, shard)
+    reviews = []
+    messages = []
+    for booking_id, client_id, provider_id, profile_id, status, booking_date in bookings:
+        if status == 'completed' and rng.random() < _context['review_rate']:
+            reviews.append({
+                'booking_id': booking_id,
+                'provider_id': profile_id,
+                'client_id': client_id,
+                'rating': rng.choices((1, 2, 3, 4, 5), weights=(4, 5, 12, 34, 45))[0],
+                'comment': rng.choice(REVIEW_COMMENTS),
+                'created_at': booking_date + timedelta(days=rng.randrange(1, 10)),
+            })
+        for n in range(int(rng.expovariate(1 / _context['messages_per_booking']))):
+            from_client = n % 2 == 0
+            messages.append({
+                'booking_id': booking_id,
+                'sender_id': client_id if from_client else provider_id,
+                'receiver_id': provider_id if from_client else client_id,
+                'subject': 'Booking #%d' % booking_id,
+                'content': rng.choice(MESSAGE_SNIPPETS),
+                'is_read': rng.random() < 0.7,
+                'created_at': booking_date - timedelta(hours=rng.randrange(1, 72)),
+            })
+    return {'reviews': reviews, 'messages': messages}
+
+
+def _shards(total: int):
+    for shard, start in enumerate(range(0, total, SHARD_SIZE)):
+        yield shard, start, min(SHARD_SIZE, total - start)
+
+
+def _run_phase(label: str, context: Dict[str, Any], workers: int, fn, shards, insert):
+    """Generate shards on a process pool and insert them in order as they complete"""
+    if not shards:
+        return
+    started = time.time()
+    inserted = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(context,)) as executor:
+        for rows in executor.map(fn, *zip(*shards)):
+            inserted += insert(rows)
+            print(f"⏳ {label}: {inserted} rows")
+    print(f"✅ {label}: {inserted} rows in {time.time() - started:.1f}s")
+
+
+def generate(clients: int, providers: int, bookings: int, seed: int = 42, workers: int = None,
+             prefix: str = 'gen', review_rate: float = 0.6, messages_per_booking: float = 1.0):
+    """Generate and insert a synthetic dataset"""
+    workers = workers or os.cpu_count() or 1
+    db.create_tables()
+
+    context = {
+        'seed': seed,
+        'prefix': prefix,
+        'password_hash': generate_password_hash(DEFAULT_PASSWORD),
+        'now': datetime.utcnow().replace(microsecond=0),
+        'review_rate': review_rate,
+        'messages_per_booking': messages_per_booking,
+    }
+
+    client_ids = []
+
+    def insert_clients(rows):
+        client_ids.extend(create_users_bulk(rows))
+        return len(rows)
+
+    _run_phase('Clients', context, workers, _client_shard, list(_shards(clients)), insert_clients)
+
+    provider_rows = []
+
+    def insert_providers(rows):
+        profiles = [row.pop('profile') for row in rows]
+        with db.get_connection() as conn:
+            user_ids = create_users_bulk(rows, conn=conn)
+            profile_ids = create_providers_bulk([dict(p, user_id=u) for p, u in zip(profiles, user_ids)], conn=conn)
+        provider_rows.extend(zip(user_ids, profile_ids, [p['consultation_fee'] for p in profiles]))
+        return len(rows)
+
+    _run_phase('Providers', context, workers, _provider_shard, list(_shards(providers)), insert_providers)
+
+    if not client_ids or not provider_rows or not bookings:
+        return
+
+    popularity = random.Random(seed).paretovariate
+    cum_weights = []
+    total = 0.0
+    for _ in provider_rows:
+        total += popularity(1.2)
+        cum_weights.append(total)
+    context.update(client_ids=client_ids, providers=provider_rows, provider_cum_weights=cum_weights)
+
+    booking_rows = []
+
+    def insert_bookings(rows):
+        ids = create_bookings_bulk(rows)
+        booking_rows.extend((i, r['client_id'], r['provider_id'], r['provider_profile_id'], r['status'], r['booking_date'])
+                            for i, r in zip(ids, rows))
+        return len(rows)
+
+    _run_phase('Bookings', context, workers, _booking_shard, list(_shards(bookings)), insert_bookings)
+
+    # Reviews/messages only need the booking tuples, not the full client/provider lists
+    context = {k: v for k, v in context.items() if k not in ('client_ids', 'providers', 'provider_cum_weights')}
+    booking_shards = [(shard, booking_rows[start:start + count]) for shard, start, count in _shards(len(booking_rows))]
+
+    def insert_reviews_and_messages(result):
+        create_reviews_bulk(result['reviews'])
+        create_messages_bulk(result['messages'])
+        return len(result['reviews']) + len(result['messages'])
+
+    _run_phase('Reviews + messages', context, workers, _review_and_message_shard, booking_shards, insert_reviews_and_messages)
+
+    refresh_provider_ratings()
+    print("✅ Provider ratings refreshed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Nyay Sahyog dataset')
+    parser.add_argument('--clients', type=int, default=100000)
+    parser.add_argument('--providers', type=int, default=10000)
+    parser.add_argument('--bookings', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None, help='Generator processes (default: CPU count)')
+    parser.add_argument('--prefix', default='gen', help='Username/email prefix, change it to generate a second dataset')
+    parser.add_argument('--review-rate', type=float, default=0.6, help='Share of completed bookings with a review')
+    parser.add_argument('--messages-per-booking', type=float, default=1.0, help='Rough mean of messages per booking')
+    args = parser.parse_args()
+
+    started = time.time()
+    generate(args.clients, args.providers, args.bookings, seed=args.seed, workers=args.workers, prefix=args.prefix,
+             review_rate=args.review_rate, messages_per_booking=args.messages_per_booking)
+
+    print(f"\n{'='*50}")
+    print(f"✅ Generated {args.clients} clients, {args.providers} providers, {args.bookings} bookings "
+          f"in {time.time() - started:.1f}s")
+    print(f"{'='*50}")
+    print(f"\nAll users have password: {DEFAULT_PASSWORD}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""gunicorn settings for `gunicorn -c gunicorn.conf.py wsgi:app`
+
+Every value can be overridden from the environment (GUNICORN_* / WEB_CONCURRENCY).
+Requests mostly wait on the database and the password KDF runs on its own process
+pool, so each worker runs several threads (gthread) rather than one request at a time.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Load the app once in the master so workers fork with it already imported
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers after N requests (jittered so they don't all restart together)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Admission budgets are derived from the threads each worker runs
+os.environ.setdefault('ADMISSION_THREADS', str(threads))
+
+# One pooled DB connection per worker thread, plus the admin dashboard fan-out threads
+os.environ.setdefault('DB_POOL_MAX', str(threads + int(os.environ.get('ADMIN_FANOUT_THREADS', 8))))
+
+
+def pre_fork(server, worker):
+    """Close connections the master opened during preload so no socket is shared with a worker"""
+    from db_connection import db
+    db.close_pool()
+
+
+def post_fork(server, worker):
+    """Start the worker with its own DB pool and hashing pool"""
+    from db_connection import db
+    from password_hashing import password_hasher
+    db.discard_pool()
+    password_hasher.shutdown()
+    server.log.info(f"Worker {worker.pid} ready (threads={threads}, max_requests={max_requests})")
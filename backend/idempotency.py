@@ -0,0 +1,192 @@
+"""Idempotency-Key support for retried POST requests
+
+A client sends `Idempotency-Key: <unique string>` with a POST. The first request
+with a given key (per user) runs normally and its response is stored; any retry
+with the same key and the same payload gets the stored response back
+(`Idempotent-Replayed: true`) without running the view again. Reusing a key with
+a different payload is rejected with 422.
+
+Responses live in the idempotency_keys table for IDEMPOTENCY_TTL_SECONDS, with
+an in-process LRU cache in front so replays on the same worker skip the DB.
+An in-progress claim only holds the key for IDEMPOTENCY_LEASE_SECONDS (a bit
+longer than the worker timeout), so a claim left behind by a killed worker
+expires quickly and the next retry takes the key over.
+A concurrent duplicate waits for the first request to finish: on the same
+worker via a per-key Event, across workers by polling the claimed row.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import request, jsonify, make_response, Response
+from auth_context import get_auth_context
+from db_access import (
+    claim_idempotency_key, get_idempotency_key, complete_idempotency_key,
+    release_idempotency_key, delete_expired_idempotency_keys
+)
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyStore:
+    """Stored responses keyed by (user_id, key): LRU front cache over the idempotency_keys table"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, ttl_seconds=86400, cache_size=10000, wait_seconds=10.0, lease_seconds=60):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.cache_size = cache_size
+        self.wait_seconds = wait_seconds
+        # (user_id, key) -> (fingerprint, status_code, body, expires_monotonic)
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stores = 0
+        self.replayed = 0
+
+    def init_app(self, app):
+        """Apply IDEMPOTENCY_* settings from the app config"""
+        self.ttl_seconds = app.config.get('IDEMPOTENCY_TTL_SECONDS', 86400)
+        self.cache_size = app.config.get('IDEMPOTENCY_CACHE_SIZE', 10000)
+        self.wait_seconds = app.config.get('IDEMPOTENCY_WAIT_SECONDS', 10.0)
+        self.lease_seconds = app.config.get('IDEMPOTENCY_LEASE_SECONDS', 60)
+
+    def _cached(self, cache_key):
+        with self._lock:
+            entry = self._cache.get(cache_key)
+            if entry is None:
+                return None
+            if entry[3] <= time.monotonic():
+                del self._cache[cache_key]
+                return None
+            self._cache.move_to_end(cache_key)
+            return entry
+
+    def _remember(self, cache_key, fingerprint, status_code, body):
+        with self._lock:
+            self._cache[cache_key] = (fingerprint, status_code, body, time.monotonic() + self.ttl_seconds)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _lookup(self, cache_key):
+        """Completed entry from the cache or DB; ('pending', fingerprint) for an in-progress claim"""
+        entry = self._cached(cache_key)
+        if entry:
+            return entry
+        row = get_idempotency_key(*cache_key)
+        if not row:
+            return None
+        if row['response_body'] is None:
+            return ('pending', row['fingerprint'])
+        self._remember(cache_key, row['fingerprint'], row['status_code'], row['response_body'])
+        return self._cached(cache_key)
+
+    def _wait_for(self, cache_key):
+        """Wait for a concurrent request holding the key; returns its entry or None on timeout"""
+        deadline = time.monotonic() + self.wait_seconds
+        with self._lock:
+            event = self._inflight.get(cache_key)
+        if event is not None:
+            event.wait(self.wait_seconds)
+        while True:
+            entry = self._lookup(cache_key)
+            if entry is None or entry[0] != 'pending':
+                return entry
+            if time.monotonic() >= deadline:
+                return entry
+            time.sleep(0.05)
+
+    def execute(self, user_id, key, fingerprint, view, *args, **kwargs):
+        """Run view once per (user, key); replay the stored response otherwise"""
+        cache_key = (user_id, key)
+        for _ in range(2):
+            entry = self._lookup(cache_key)
+            if entry is None:
+                with self._lock:
+                    if cache_key in self._inflight:
+                        event = None
+                    else:
+                        event = self._inflight[cache_key] = threading.Event()
+                if event is not None:
+                    try:
+                        if claim_idempotency_key(user_id, key, fingerprint,
+                                                 datetime.utcnow() + timedelta(seconds=self.lease_seconds)):
+                            return self._run(cache_key, fingerprint, view, *args, **kwargs)
+                    finally:
+                        with self._lock:
+                            self._inflight.pop(cache_key, None)
+                        event.set()
+                entry = self._wait_for(cache_key)
+
+            if entry is not None and entry[0] == 'pending':
+                if entry[1] != fingerprint:
+                    return _error('Idempotency-Key was already used with a different request', 422)
+                entry = self._wait_for(cache_key)
+            if entry is None:
+                continue  # the first request failed and released the key; try to claim it
+            if entry[0] == 'pending':
+                return _error('A request with this Idempotency-Key is still in progress', 409)
+            if entry[0] != fingerprint:
+                return _error('Idempotency-Key was already used with a different request', 422)
+            self.replayed += 1
+            response = Response(entry[2], status=entry[1], mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        return _error('A request with this Idempotency-Key is still in progress', 409)
+
+    def _run(self, cache_key, fingerprint, view, *args, **kwargs):
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            release_idempotency_key(*cache_key)
+            raise
+        if response.status_code >= 500:
+            # Server errors are not final; let the client retry with the same key
+            release_idempotency_key(*cache_key)
+            return response
+        body = response.get_data(as_text=True)
+        complete_idempotency_key(cache_key[0], cache_key[1], response.status_code, body,
+                                 datetime.utcnow() + timedelta(seconds=self.ttl_seconds))
+        self._remember(cache_key, fingerprint, response.status_code, body)
+        self._stores += 1
+        if self._stores % self.PRUNE_EVERY == 0:
+            delete_expired_idempotency_keys()
+        return response
+
+
+def _error(message, status_code):
+    return jsonify({'error': message}), status_code
+
+
+def request_fingerprint():
+    """Hash of the method, path and body, so a reused key with a different payload is detected"""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b'\0')
+    digest.update(request.path.encode())
+    digest.update(b'\0')
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def idempotent(f):
+    """Decorator honouring the Idempotency-Key header (apply inside @jwt_required)"""
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key', '').strip()
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters', 400)
+        auth = get_auth_context()
+        if not auth:
+            return _error('Invalid user ID in token', 401)
+        return idempotency_store.execute(auth.user_id, key, request_fingerprint(), f, *args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+
+# Global idempotency store
+idempotency_store = IdempotencyStore()
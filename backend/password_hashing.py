@@ -0,0 +1,156 @@
+"""Password hashing service backed by a bounded process pool
+
+werkzeug's password KDF is deliberately slow and holds the GIL, so running it on
+the request thread stalls every other request on the worker during a login burst.
+PasswordHasher runs it on a small ProcessPoolExecutor instead, caps how many
+hashes may be queued, and fails fast with HashingBusyError when the queue is full.
+"""
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+# Hashing processes per server worker process; gunicorn already runs a worker per
+# core or more, so a per-core pool in each of them would oversubscribe the CPU
+DEFAULT_WORKERS = min(2, os.cpu_count() or 1)
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing queue is saturated or a hash timed out"""
+
+    def __init__(self, retry_after=1):
+        self.retry_after = retry_after
+        super().__init__('Authentication service is busy, please retry shortly')
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+def _method_prefix(method):
+    """'method:params' part werkzeug writes for method, with its default parameters filled in"""
+    return _hash('', method).split('$', 1)[0]
+
+
+class PasswordHasher:
+    """Hash/verify passwords on a bounded process pool with rehash-on-login support"""
+
+    def __init__(self, method=DEFAULT_METHOD, workers=None, queue_depth=None, timeout=10.0):
+        self.method = method
+        self.workers = DEFAULT_WORKERS if workers is None else workers
+        self.queue_depth = queue_depth or max(1, self.workers) * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.queue_depth)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._method_prefix = None
+        self.rejected = 0
+
+    def init_app(self, app):
+        """Apply PASSWORD_HASH_* settings from the app config"""
+        self.configure(
+            method=app.config.get('PASSWORD_HASH_METHOD'),
+            workers=app.config.get('PASSWORD_HASH_WORKERS'),
+            queue_depth=app.config.get('PASSWORD_HASH_QUEUE_DEPTH'),
+            timeout=app.config.get('PASSWORD_HASH_TIMEOUT'),
+        )
+
+    def configure(self, method=None, workers=None, queue_depth=None, timeout=None):
+        """Change settings; the running pool is shut down and restarted on next use"""
+        with self._lock:
+            if method:
+                self.method = method
+                # One throwaway hash at startup rather than on a login request thread
+                self._method_prefix = _method_prefix(method)
+            if workers is not None:
+                self.workers = workers
+            if queue_depth or workers is not None:
+                self.queue_depth = queue_depth or max(1, self.workers) * 4
+                self._slots = threading.BoundedSemaphore(self.queue_depth)
+            if timeout:
+                self.timeout = timeout
+            self._shutdown_locked()
+
+    def _get_executor(self):
+        # A pool inherited across fork() is unusable; start a fresh one per process
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                from concurrent.futures import ProcessPoolExecutor  # loads multiprocessing; defer to first hash
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _shutdown_locked(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown_locked()
+
+    def _run(self, fn, *args):
+        if self.workers == 0:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingBusyError()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.rejected += 1
+            raise HashingBusyError()
+
+    def hash(self, password):
+        """Hash a password with the configured KDF parameters"""
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash (any method werkzeug understands)"""
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when password_hash was produced with different KDF parameters"""
+        prefix = self._method_prefix
+        if prefix is None:
+            # Not configured through init_app; werkzeug fills in default parameters
+            # (e.g. 'pbkdf2' -> 'pbkdf2:sha256:600000'), so derive the prefix from a real hash once
+            with self._lock:
+                if self._method_prefix is None:
+                    self._method_prefix = _method_prefix(self.method)
+                prefix = self._method_prefix
+        return password_hash.split('$', 1)[0] != prefix
+
+    def stats(self):
+        return {
+            'method': self.method,
+            'workers': self.workers,
+            'queue_depth': self.queue_depth,
+            'rejected': self.rejected,
+        }
+
+
+def busy_response(error):
+    """503 response for a saturated hashing queue"""
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+
+# Global hashing service
+password_hasher = PasswordHasher()
@@ -0,0 +1,253 @@
+"""Bulk provider onboarding from CSV rosters
+
+Usage:
+    python provider_import.py roster.csv [--batch-size 500] [--workers 4] [--rejected rejected.csv]
+
+Expected columns (header row required): username, email, password, full_name, role,
+phone, address, city, state, pincode, specialization, experience_years,
+bar_council_number, qualification, bio, consultation_fee, hourly_rate.
+Only username, email, password and full_name are mandatory; role defaults to advocate.
+"""
+import argparse
+import csv
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from werkzeug.security import generate_password_hash
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+from db_connection import db
+from db_access import create_users_bulk, create_providers_bulk, BulkValidationError
+
+PROVIDER_ROLES = ['advocate', 'mediator', 'arbitrator', 'notary', 'document_writer']
+REQUIRED_COLUMNS = ['username', 'email', 'password', 'full_name']
+DEFAULT_BATCH_SIZE = 500
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+USERNAME_RE = re.compile(r'^[a-z0-9_.-]{3,80}$')
+
+
+def _number(value: str, cast, field: str):
+    """Parse an optional numeric column"""
+    value = (value or '').strip().replace(',', '')
+    if not value:
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f'{field} must be a number')
+
+
+def normalize_row(raw: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """Validate and normalize one roster row; raises ValueError with the rejection reason"""
+    # DictReader collects the fields beyond the header under the None key
+    if None in raw:
+        raise ValueError('Too many fields')
+    row = {(k or '').strip().lower(): v.strip() if isinstance(v, str) else '' for k, v in raw.items()}
+
+    for field in REQUIRED_COLUMNS:
+        if not row.get(field):
+            raise ValueError(f'{field} is required')
+
+    username = row['username'].lower()
+    if not USERNAME_RE.match(username):
+        raise ValueError('username must be 3-80 characters of letters, digits, . _ -')
+
+    email = row['email'].lower()
+    if not EMAIL_RE.match(email):
+        raise ValueError('Invalid email')
+
+    role = (row.get('role') or 'advocate').lower().replace(' ', '_')
+    if role not in PROVIDER_ROLES:
+        raise ValueError('Invalid role')
+
+    phone = re.sub(r'[^0-9+]', '', row.get('phone', '')) or None
+    pincode = row.get('pincode') or None
+    if pincode and not pincode.isdigit():
+        raise ValueError('pincode must be numeric')
+
+    experience_years = _number(row.get('experience_years'), int, 'experience_years')
+    consultation_fee = _number(row.get('consultation_fee'), float, 'consultation_fee')
+    hourly_rate = _number(row.get('hourly_rate'), float, 'hourly_rate')
+    if any(v is not None and v < 0 for v in (experience_years, consultation_fee, hourly_rate)):
+        raise ValueError('Numeric fields must not be negative')
+
+    return {
+        'user': {
+            'username': username,
+            'email': email,
+            'password': row['password'],
+            'role': role,
+            'full_name': ' '.join(row['full_name'].split()),
+            'phone': phone,
+            'address': row.get('address') or None,
+            'city': row.get('city', '').title() or None,
+            'state': row.get('state', '').title() or None,
+            'pincode': pincode,
+            'is_verified': False,
+            'is_active': True
+        },
+        'provider': {
+            'specialization': row.get('specialization') or None,
+            'experience_years': experience_years or 0,
+            'bar_council_number': row.get('bar_council_number', '').upper() or None,
+            'qualification': row.get('qualification') or None,
+            'bio': row.get('bio') or None,
+            'consultation_fee': consultation_fee or 0.0,
+            'hourly_rate': hourly_rate or 0.0,
+            'is_verified': False,
+            'is_active': True
+        }
+    }
+
+
+def _insert_batch(batch: List[Tuple[int, Dict[str, Any]]], password_hashes: List[str]) -> List[Tuple[int, Dict[str, Any], str]]:
+    """Insert users + provider profiles for one batch in a single transaction.
+
+    Rows the database rejects (e.g. username taken by an existing account) are
+    dropped and the rest of the batch is retried. A constraint violation that
+    validation didn't catch (e.g. an account registered meanwhile) retries the
+    batch row by row. Returns the rejected rows.
+    """
+    rejected = []
+    pending = [(line, item, password_hash) for (line, item), password_hash in zip(batch, password_hashes)]
+
+    while pending:
+        users = []
+        for _, item, password_hash in pending:
+            user = dict(item['user'])
+            user.pop('password')
+            user['password_hash'] = password_hash
+            users.append(user)
+        try:
+            with db.get_connection() as conn:
+                user_ids = create_users_bulk(users, chunk_size=len(users), conn=conn)
+                providers = [dict(item['provider'], user_id=user_id) for (_, item, _), user_id in zip(pending, user_ids)]
+                create_providers_bulk(providers, chunk_size=len(providers), conn=conn)
+            return rejected
+        except BulkValidationError as e:
+            bad = {}
+            for error in e.errors:
+                bad.setdefault(error['index'], error['error'])
+            rejected.extend((pending[i][0], pending[i][1], reason) for i, reason in bad.items())
+            pending = [p for i, p in enumerate(pending) if i not in bad]
+        except db.integrity_errors() as e:
+            if len(pending) == 1:
+                rejected.append((pending[0][0], pending[0][1], f'Database rejected row: {e}'))
+                return rejected
+            # Each row is re-validated against what is committed now, so only the conflicting ones are rejected
+            for line, item, password_hash in pending:
+                rejected.extend(_insert_batch([(line, item)], [password_hash]))
+            return rejected
+    return rejected
+
+
+def import_providers_csv(stream: IO[str], batch_size: int = DEFAULT_BATCH_SIZE, workers: Optional[int] = None,
+                         hash_method: Optional[str] = None,
+                         progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, Any]:
+    """Stream a provider roster CSV into the database.
+
+    Rows are validated and normalized one at a time, passwords for each batch are
+    hashed on a process pool (the KDF is the CPU bottleneck), and each batch of
+    users + provider profiles is written in one transaction. Returns a summary with
+    the rejected rows (CSV line number, username, email, reason).
+    """
+    reader = csv.DictReader(stream)
+    missing = [c for c in REQUIRED_COLUMNS if c not in [(f or '').strip().lower() for f in (reader.fieldnames or [])]]
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+
+    hasher = partial(generate_password_hash, method=hash_method) if hash_method else generate_password_hash
+    summary = {'processed': 0, 'imported': 0, 'rejected': 0}
+    rejected_rows = []
+    seen_usernames = set()
+    seen_emails = set()
+    batch = []
+
+    def reject(line, item_or_raw, reason):
+        user = item_or_raw.get('user', item_or_raw)
+        rejected_rows.append({'line': line, 'username': user.get('username'), 'email': user.get('email'), 'reason': reason})
+        summary['rejected'] += 1
+
+    def flush(executor):
+        chunksize = max(1, len(batch) // ((workers or os.cpu_count() or 1) * 4))
+        password_hashes = list(executor.map(hasher, [item['user']['password'] for _, item in batch], chunksize=chunksize))
+        failed = _insert_batch(batch, password_hashes)
+        for line, item, reason in failed:
+            reject(line, item, reason)
+        summary['imported'] += len(batch) - len(failed)
+        batch.clear()
+        if progress:
+            progress(dict(summary))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for raw in reader:
+            line = reader.line_num
+            summary['processed'] += 1
+            try:
+                item = normalize_row(raw)
+            except ValueError as e:
+                reject(line, raw, str(e))
+                continue
+
+            username = item['user']['username']
+            email = item['user']['email']
+            if username in seen_usernames or email in seen_emails:
+                reject(line, item, 'Duplicate username or email in file')
+                continue
+            seen_usernames.add(username)
+            seen_emails.add(email)
+
+            batch.append((line, item))
+            if len(batch) >= batch_size:
+                flush(executor)
+
+        if batch:
+            flush(executor)
+
+    summary['rejected_rows'] = rejected_rows
+    return summary
+
+
+def write_rejected_report(rejected_rows: List[Dict[str, Any]], output: IO[str]):
+    """Write rejected rows as CSV"""
+    writer = csv.DictWriter(output, fieldnames=['line', 'username', 'email', 'reason'])
+    writer.writeheader()
+    writer.writerows(rejected_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import a provider roster CSV')
+    parser.add_argument('csv_path', help='Path to the roster CSV file')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per insert transaction')
+    parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (default: CPU count)')
+    parser.add_argument('--rejected', default=None, help='Write rejected rows to this CSV file')
+    args = parser.parse_args()
+
+    db.create_tables()
+
+    def report(summary):
+        print(f"⏳ Processed {summary['processed']} rows: {summary['imported']} imported, {summary['rejected']} rejected")
+
+    with io.open(args.csv_path, newline='', encoding='utf-8-sig') as f:
+        summary = import_providers_csv(f, batch_size=args.batch_size, workers=args.workers, progress=report)
+
+    print(f"\n{'='*50}")
+    print(f"✅ Imported {summary['imported']} providers")
+    print(f"⏭️  Rejected {summary['rejected']} rows")
+    print(f"{'='*50}")
+
+    if args.rejected and summary['rejected_rows']:
+        with io.open(args.rejected, 'w', newline='', encoding='utf-8') as f:
+            write_rejected_report(summary['rejected_rows'], f)
+        print(f"📝 Rejected rows written to {args.rejected}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,62 +1,98 @@
 """Provider and service listing routes"""
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import jwt_required
 from db_access import (
     get_provider_by_id, get_provider_by_user_id, update_provider,
     get_providers_search, get_specializations, get_provider_stats,
-    get_user_by_id
+    get_user_by_id, get_working_hours, set_working_hours,
+    get_provider_search_candidates, get_busy_intervals, get_working_hours_by_provider
 )
-from datetime import datetime
+from auth_context import get_auth_context
+from availability import (
+    parse_working_hours, format_working_hours, normalize_datetime, validate_duration,
+    open_windows, free_slots
+)
+from datetime import datetime, timedelta
 
 providers_bp = Blueprint('providers', __name__)
 
+# Free-slot search bounds (GET /api/providers/availability)
+AVAILABILITY_MAX_RANGE_DAYS = 14
+AVAILABILITY_MAX_CANDIDATES = 500
+
 def provider_required(f):
     """Decorator to require provider role"""
     @jwt_required()
     def decorated_function(*args, **kwargs):
-        claims = get_jwt()
-        provider_roles = ['advocate', 'mediator', 'arbitrator', 'notary', 'document_writer']
-        if claims.get('role') not in provider_roles:
+        auth = get_auth_context()
+        if not auth or not auth.is_provider:
             return jsonify({'error': 'Provider access required'}), 403
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
 
 
+def parse_provider_search_args(args):
+    """Turn /api/providers query parameters into get_providers_search keyword arguments"""
+    return {
+        'search': args.get('search', '').strip(),
+        'role': args.get('role', '').strip(),
+        'specialization': args.get('specialization', '').strip(),
+        'verified_only': args.get('verified_only', 'false').lower() == 'true',
+        'min_fee': args.get('min_fee', type=float),
+        'max_fee': args.get('max_fee', type=float),
+        'min_rating': args.get('min_rating', type=float),
+        'city': args.get('city', '').strip(),
+        'state': args.get('state', '').strip(),
+        'sort_by': args.get('sort_by', 'rating'),  # rating, fee, experience
+        'sort_order': args.get('sort_order', 'desc'),  # asc, desc
+        'page': args.get('page', 1, type=int),
+        'per_page': args.get('per_page', 10, type=int),
+        'exact_count': args.get('exact_count', 'false').lower() == 'true'
+    }
+
+
+def format_provider_detail(provider, user):
+    """Provider profile with its user's contact details"""
+    return {
+        'id': provider['id'],
+        'user_id': provider['user_id'],
+        'user': {
+            'id': user['id'],
+            'username': user['username'],
+            'email': user['email'],
+            'full_name': user['full_name'],
+            'phone': user.get('phone'),
+            'address': user.get('address'),
+            'city': user.get('city'),
+            'state': user.get('state'),
+            'pincode': user.get('pincode')
+        } if user else None,
+        'specialization': provider.get('specialization'),
+        'experience_years': provider.get('experience_years', 0),
+        'bar_council_number': provider.get('bar_council_number'),
+        'qualification': provider.get('qualification'),
+        'bio': provider.get('bio'),
+        'consultation_fee': float(provider.get('consultation_fee', 0.0)),
+        'hourly_rate': float(provider.get('hourly_rate', 0.0)),
+        'rating': float(provider.get('rating', 0.0)),
+        'total_reviews': provider.get('total_reviews', 0),
+        'is_verified': provider.get('is_verified', False),
+        'is_active': provider.get('is_active', True),
+        'created_at': provider['created_at'].isoformat() if isinstance(provider.get('created_at'), datetime) else provider.get('created_at')
+    }
+
+
+def is_listed(provider, user):
+    """Whether a provider is publicly visible"""
+    return bool(user) and user.get('is_active', True) and provider.get('is_active', True)
+
+
 @providers_bp.route('', methods=['GET'])
 def get_providers():
     """Get all providers with search, filter, and pagination"""
     try:
-        # Query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        search = request.args.get('search', '').strip()
-        role = request.args.get('role', '').strip()
-        specialization = request.args.get('specialization', '').strip()
-        verified_only = request.args.get('verified_only', 'false').lower() == 'true'
-        min_fee = request.args.get('min_fee', type=float)
-        max_fee = request.args.get('max_fee', type=float)
-        min_rating = request.args.get('min_rating', type=float)
-        city = request.args.get('city', '').strip()
-        state = request.args.get('state', '').strip()
-        sort_by = request.args.get('sort_by', 'rating')  # rating, fee, experience
-        sort_order = request.args.get('sort_order', 'desc')  # asc, desc
-        
-        result = get_providers_search(
-            search=search,
-            role=role,
-            specialization=specialization,
-            verified_only=verified_only,
-            min_fee=min_fee,
-            max_fee=max_fee,
-            min_rating=min_rating,
-            city=city,
-            state=state,
-            sort_by=sort_by,
-            sort_order=sort_order,
-            page=page,
-            per_page=per_page
-        )
+        result = get_providers_search(**parse_provider_search_args(request.args))
         
         return jsonify(result), 200
         
@@ -64,6 +100,67 @@ def get_providers():
         return jsonify({'error': str(e)}), 500
 
 
+@providers_bp.route('/availability', methods=['GET'])
+def get_providers_availability():
+    """Earliest free slots of every provider matching the search filters between from and to (UTC)"""
+    try:
+        args = request.args
+        now = datetime.utcnow()
+        try:
+            range_start = normalize_datetime(args['from']) if args.get('from') else now
+            range_end = normalize_datetime(args['to']) if args.get('to') else range_start + timedelta(days=1)
+            duration = validate_duration(args.get('duration', 60, type=int))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        range_start = max(range_start, now)
+        if range_end <= range_start:
+            return jsonify({'error': 'to must be after from (and in the future)'}), 400
+        if range_end - range_start > timedelta(days=AVAILABILITY_MAX_RANGE_DAYS):
+            return jsonify({'error': f'Range can span at most {AVAILABILITY_MAX_RANGE_DAYS} days'}), 400
+        
+        slots_per_provider = min(max(args.get('slots', 3, type=int), 1), 20)
+        limit = min(max(args.get('limit', 20, type=int), 1), 100)
+        step = min(max(args.get('step', 30, type=int), 5), 240)
+        
+        search_args = parse_provider_search_args(args)
+        search_args.pop('page')
+        search_args.pop('per_page')
+        search_args.pop('exact_count')
+        
+        # Three queries regardless of provider count: candidates, their busy intervals, their working hours
+        candidates = get_provider_search_candidates(AVAILABILITY_MAX_CANDIDATES, **search_args)
+        busy = {}
+        for row in get_busy_intervals([p['user_id'] for p in candidates], range_start, range_end):
+            busy.setdefault(row['provider_id'], []).append((row['booking_date'], row['end_time']))
+        working_hours = get_working_hours_by_provider([p['id'] for p in candidates])
+        
+        results = []
+        for provider in candidates:
+            windows = open_windows(working_hours.get(provider['id']), range_start, range_end)
+            slots = free_slots(busy.get(provider['user_id'], []), windows, duration, slots_per_provider, step)
+            if slots:
+                provider['slots'] = [{'start': start.isoformat(), 'end': end.isoformat()} for start, end in slots]
+                results.append(provider)
+        
+        # Earliest availability first; ties keep the search order
+        results.sort(key=lambda p: p['slots'][0]['start'])
+        
+        return jsonify({
+            'from': range_start.isoformat(),
+            'to': range_end.isoformat(),
+            'duration_minutes': duration,
+            'timezone': 'UTC',
+            'providers': results[:limit],
+            'total': len(results),
+            'scanned': len(candidates),
+            'truncated': len(candidates) >= AVAILABILITY_MAX_CANDIDATES
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @providers_bp.route('/<int:provider_id>', methods=['GET'])
 def get_provider(provider_id):
     """Get a specific provider by ID"""
@@ -73,38 +170,10 @@ def get_provider(provider_id):
             return jsonify({'error': 'Provider not found'}), 404
         
         user = get_user_by_id(provider['user_id'])
-        if not user or not user.get('is_active', True) or not provider.get('is_active', True):
+        if not is_listed(provider, user):
             return jsonify({'error': 'Provider not found'}), 404
         
-        provider_data = {
-            'id': provider['id'],
-            'user_id': provider['user_id'],
-            'user': {
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'full_name': user['full_name'],
-                'phone': user.get('phone'),
-                'address': user.get('address'),
-                'city': user.get('city'),
-                'state': user.get('state'),
-                'pincode': user.get('pincode')
-            },
-            'specialization': provider.get('specialization'),
-            'experience_years': provider.get('experience_years', 0),
-            'bar_council_number': provider.get('bar_council_number'),
-            'qualification': provider.get('qualification'),
-            'bio': provider.get('bio'),
-            'consultation_fee': float(provider.get('consultation_fee', 0.0)),
-            'hourly_rate': float(provider.get('hourly_rate', 0.0)),
-            'rating': float(provider.get('rating', 0.0)),
-            'total_reviews': provider.get('total_reviews', 0),
-            'is_verified': provider.get('is_verified', False),
-            'is_active': provider.get('is_active', True),
-            'created_at': provider.get('created_at').isoformat() if provider.get('created_at') else None
-        }
-        
-        return jsonify(provider_data), 200
+        return jsonify(format_provider_detail(provider, user)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -115,42 +184,13 @@ def get_provider(provider_id):
 def get_my_provider_profile():
     """Get current provider's profile"""
     try:
-        user_id_str = get_jwt_identity()
-        user_id = int(user_id_str) if user_id_str else None
-        if not user_id:
-            return jsonify({'error': 'Invalid user ID in token'}), 401
+        user_id = get_auth_context().user_id
         provider = get_provider_by_user_id(user_id)
         if not provider:
             return jsonify({'error': 'Provider profile not found'}), 404
         
         user = get_user_by_id(user_id)
-        provider_dict = {
-            'id': provider['id'],
-            'user_id': provider['user_id'],
-            'user': {
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'full_name': user['full_name'],
-                'phone': user.get('phone'),
-                'address': user.get('address'),
-                'city': user.get('city'),
-                'state': user.get('state'),
-                'pincode': user.get('pincode')
-            } if user else None,
-            'specialization': provider.get('specialization'),
-            'experience_years': provider.get('experience_years', 0),
-            'bar_council_number': provider.get('bar_council_number'),
-            'qualification': provider.get('qualification'),
-            'bio': provider.get('bio'),
-            'consultation_fee': float(provider.get('consultation_fee', 0.0)),
-            'hourly_rate': float(provider.get('hourly_rate', 0.0)),
-            'rating': float(provider.get('rating', 0.0)),
-            'total_reviews': provider.get('total_reviews', 0),
-            'is_verified': provider.get('is_verified', False),
-            'is_active': provider.get('is_active', True),
-            'created_at': provider.get('created_at').isoformat() if provider.get('created_at') else None
-        }
+        provider_dict = format_provider_detail(provider, user)
         
         return jsonify(provider_dict), 200
         
@@ -163,10 +203,7 @@ def get_my_provider_profile():
 def update_my_provider_profile():
     """Update current provider's profile"""
     try:
-        user_id_str = get_jwt_identity()
-        user_id = int(user_id_str) if user_id_str else None
-        if not user_id:
-            return jsonify({'error': 'Invalid user ID in token'}), 401
+        user_id = get_auth_context().user_id
         provider = get_provider_by_user_id(user_id)
         if not provider:
             return jsonify({'error': 'Provider profile not found'}), 404
@@ -184,37 +221,10 @@ def update_my_provider_profile():
                 update_data[field] = data[field]
         
         if update_data:
-            update_provider(provider['id'], update_data)
-            provider = get_provider_by_user_id(user_id)
+            provider = update_provider(provider['id'], update_data, returning=True)
         
         user = get_user_by_id(user_id)
-        provider_dict = {
-            'id': provider['id'],
-            'user_id': provider['user_id'],
-            'user': {
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'full_name': user['full_name'],
-                'phone': user.get('phone'),
-                'address': user.get('address'),
-                'city': user.get('city'),
-                'state': user.get('state'),
-                'pincode': user.get('pincode')
-            } if user else None,
-            'specialization': provider.get('specialization'),
-            'experience_years': provider.get('experience_years', 0),
-            'bar_council_number': provider.get('bar_council_number'),
-            'qualification': provider.get('qualification'),
-            'bio': provider.get('bio'),
-            'consultation_fee': float(provider.get('consultation_fee', 0.0)),
-            'hourly_rate': float(provider.get('hourly_rate', 0.0)),
-            'rating': float(provider.get('rating', 0.0)),
-            'total_reviews': provider.get('total_reviews', 0),
-            'is_verified': provider.get('is_verified', False),
-            'is_active': provider.get('is_active', True),
-            'created_at': provider.get('created_at').isoformat() if provider.get('created_at') else None
-        }
+        provider_dict = format_provider_detail(provider, user)
         
         return jsonify({
             'message': 'Profile updated successfully',
@@ -225,6 +235,57 @@ def update_my_provider_profile():
         return jsonify({'error': str(e)}), 500
 
 
+@providers_bp.route('/<int:provider_id>/working-hours', methods=['GET'])
+def get_provider_working_hours(provider_id):
+    """Get a provider's weekly working hours (UTC, weekday 0 = Monday)"""
+    try:
+        provider = get_provider_by_id(provider_id)
+        if not provider:
+            return jsonify({'error': 'Provider not found'}), 404
+        
+        user = get_user_by_id(provider['user_id'])
+        if not is_listed(provider, user):
+            return jsonify({'error': 'Provider not found'}), 404
+        
+        return jsonify({
+            'provider_id': provider['id'],
+            'timezone': 'UTC',
+            'working_hours': format_working_hours(get_working_hours(provider['id']))
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@providers_bp.route('/my-profile/working-hours', methods=['PUT'])
+@provider_required
+def update_my_working_hours():
+    """Replace current provider's working hours; an empty list means always bookable"""
+    try:
+        user_id = get_auth_context().user_id
+        provider = get_provider_by_user_id(user_id)
+        if not provider:
+            return jsonify({'error': 'Provider profile not found'}), 404
+        
+        data = request.get_json() or {}
+        try:
+            windows = parse_working_hours(data.get('working_hours'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        set_working_hours(provider['id'], windows)
+        
+        return jsonify({
+            'message': 'Working hours updated successfully',
+            'provider_id': provider['id'],
+            'timezone': 'UTC',
+            'working_hours': format_working_hours(get_working_hours(provider['id']))
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @providers_bp.route('/specializations', methods=['GET'])
 def get_specializations_list():
     """Get list of all specializations"""
@@ -0,0 +1,160 @@
+"""Login throttling with token buckets
+
+Each login attempt takes one token from a bucket for the username and one for the
+client IP. Buckets refill continuously at `rate` tokens/second up to `burst`.
+Checks happen before any DB lookup or password hashing, so a credential-stuffing
+burst is rejected for the cost of a dict lookup.
+
+The in-process store is a fixed-size table with LRU eviction. SQLiteBucketStore
+keeps the buckets in a shared SQLite file instead, so every WSGI worker on the
+host sees the same limits.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import jsonify
+
+
+class MemoryBucketStore:
+    """Fixed-size in-process bucket table; least recently used keys are evicted first"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        # key -> [tokens, last_refill]
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        """Take one token; returns seconds until a token is available (0 when allowed)"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [float(burst), now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """Bucket table in a SQLite file shared by all workers on the host"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path, max_keys=100000):
+        self.path = path
+        self.max_keys = max_keys
+        self._takes = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limit_updated_at ON rate_limit_buckets(updated_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, rate, burst, now):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = float(burst) if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if tokens >= 1:
+                tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                # Keep the table bounded: drop the least recently used keys beyond max_keys
+                conn.execute("""
+                    DELETE FROM rate_limit_buckets WHERE key IN (
+                        SELECT key FROM rate_limit_buckets ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_keys,))
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        self._connect().execute("DELETE FROM rate_limit_buckets")
+
+
+class LoginRateLimiter:
+    """Per-username and per-IP token buckets for login attempts"""
+
+    def __init__(self, store=None, username_rate=5 / 60, username_burst=5, ip_rate=30 / 60, ip_burst=30):
+        self.store = store or MemoryBucketStore()
+        self.username_rate = username_rate
+        self.username_burst = username_burst
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self.enabled = True
+        self.rejected = 0
+
+    def init_app(self, app):
+        """Apply LOGIN_RATE_LIMIT_* settings from the app config"""
+        self.enabled = app.config.get('LOGIN_RATE_LIMIT_ENABLED', True)
+        self.username_rate = app.config.get('LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE', 5) / 60
+        self.username_burst = app.config.get('LOGIN_RATE_LIMIT_USERNAME_BURST', 5)
+        self.ip_rate = app.config.get('LOGIN_RATE_LIMIT_IP_PER_MINUTE', 30) / 60
+        self.ip_burst = app.config.get('LOGIN_RATE_LIMIT_IP_BURST', 30)
+        max_keys = app.config.get('LOGIN_RATE_LIMIT_MAX_KEYS', 100000)
+        storage = app.config.get('LOGIN_RATE_LIMIT_STORAGE')
+        if storage and storage.startswith('sqlite:///'):
+            self.store = SQLiteBucketStore(storage.replace('sqlite:///', ''), max_keys=max_keys)
+        else:
+            self.store = MemoryBucketStore(max_keys=max_keys)
+
+    def check(self, username, ip):
+        """Take a token for both keys; returns seconds to wait (0 when the attempt may proceed)"""
+        if not self.enabled:
+            return 0
+        now = time.time()
+        wait = self.store.take(f'ip:{ip}', self.ip_rate, self.ip_burst, now)
+        if username:
+            wait = max(wait, self.store.take(f'user:{username.lower()}', self.username_rate, self.username_burst, now))
+        if wait:
+            self.rejected += 1
+        return wait
+
+
+def throttled_response(wait):
+    """429 response telling the client when to retry"""
+    response = jsonify({'error': 'Too many login attempts, please try again later'})
+    response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response, 429
+
+
+# Global login limiter
+login_limiter = LoginRateLimiter()
@@ -0,0 +1,58 @@
+"""Admission control: a request over its class limit queues and is admitted when a slot frees"""
+import threading
+import time
+from flask import Flask
+from admission import AdmissionController
+
+
+def _search_app(gate, started):
+    app = Flask(__name__)
+    controller = AdmissionController(route_classes={'search_route': 'search'}, threads=4)
+    app.before_request(controller._before_request)
+    app.teardown_request(controller._teardown_request)
+
+    @app.route('/search', endpoint='search_route')
+    def search_route():
+        started.release()
+        gate.wait(5)
+        return {'ok': True}
+
+    return app, controller
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_search_request_queues_then_is_admitted():
+    gate = threading.Event()
+    started = threading.Semaphore(0)
+    app, controller = _search_app(gate, started)
+    search = controller.classes['search']
+    assert (search.limit, search.queue) == (1, 1)
+
+    statuses = []
+    get = lambda: statuses.append(app.test_client().get('/search').status_code)
+    first = threading.Thread(target=get)
+    first.start()
+    assert started.acquire(timeout=2)
+
+    second = threading.Thread(target=get)
+    second.start()
+    _wait_for(lambda: search.waiting == 1)
+
+    # Queue full and the class's remaining threads are reserved: shed immediately
+    assert app.test_client().get('/search').status_code == 503
+
+    gate.set()
+    first.join(5)
+    second.join(5)
+    assert statuses == [200, 200]
+    stats = search.stats()
+    assert stats['admitted'] == 2
+    assert stats['waiting'] == 0
+    assert stats['max_queue_ms'] > 0
+    assert controller.occupied == 0
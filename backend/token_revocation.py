@@ -0,0 +1,140 @@
+"""JWT revocation (logout) backed by a Bloom filter
+
+Revoked token ids (jti) are stored in the revoked_tokens table. Each worker keeps
+a Bloom filter of the unexpired ones, so checking a token that was never revoked
+(the common case) is k bit probes and no DB query; only a filter hit is confirmed
+against the table. The filter is topped up from rows revoked since the last
+refresh every TOKEN_REVOCATION_REFRESH_SECONDS and rebuilt from scratch every
+TOKEN_REVOCATION_REBUILD_SECONDS, dropping tokens that have expired in the meantime.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from db_access import revoke_token, is_token_revoked, get_revoked_tokens, delete_expired_revoked_tokens
+
+# Re-read rows revoked slightly before the previous refresh to cover in-flight writes
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, key):
+        h = hash(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = ((h >> 32) & 0xFFFFFFFF) | 1
+        bits = self._bits
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        h = hash(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = ((h >> 32) & 0xFFFFFFFF) | 1
+        bits = self._bits
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class TokenRevocationList:
+    """Revoked JWT ids: Bloom filter in front of the revoked_tokens table"""
+
+    def __init__(self, capacity=100000, error_rate=0.001, refresh_seconds=30, rebuild_seconds=3600):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._filter = BloomFilter(capacity, error_rate)
+        self._loaded_at = None
+        self._next_refresh = 0.0
+        self._next_rebuild = 0.0
+        self._lock = threading.Lock()
+        self.filter_hits = 0
+        self.false_positives = 0
+
+    def init_app(self, app):
+        """Apply TOKEN_REVOCATION_* settings from the app config"""
+        self.capacity = app.config.get('TOKEN_REVOCATION_CAPACITY', 100000)
+        self.error_rate = app.config.get('TOKEN_REVOCATION_ERROR_RATE', 0.001)
+        self.refresh_seconds = app.config.get('TOKEN_REVOCATION_REFRESH_SECONDS', 30)
+        self.rebuild_seconds = app.config.get('TOKEN_REVOCATION_REBUILD_SECONDS', 3600)
+        with self._lock:
+            self._filter = BloomFilter(self.capacity, self.error_rate)
+            self._loaded_at = None
+            self._next_refresh = self._next_rebuild = 0.0
+
+    def _rebuild_locked(self, started):
+        delete_expired_revoked_tokens()
+        rows = get_revoked_tokens()
+        # Leave headroom so delta refreshes don't push the filter past its error rate
+        bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+        for row in rows:
+            bloom.add(row['jti'])
+        self._filter = bloom
+        self._loaded_at = started
+
+    def refresh(self, force=False):
+        """Pick up revocations made by other workers; periodically rebuild to drop expired tokens"""
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        with self._lock:
+            if not force and now < self._next_refresh:
+                return
+            self._next_refresh = now + self.refresh_seconds
+            started = datetime.utcnow()
+            try:
+                if self._loaded_at is None or now >= self._next_rebuild or self._filter.count >= self._filter.capacity:
+                    self._rebuild_locked(started)
+                    self._next_rebuild = now + self.rebuild_seconds
+                else:
+                    for row in get_revoked_tokens(revoked_since=self._loaded_at - REFRESH_OVERLAP):
+                        self._filter.add(row['jti'])
+                    self._loaded_at = started
+            except Exception as e:
+                # Keep the last filter; the next refresh retries
+                print(f"⚠️  Token revocation refresh failed: {e}")
+
+    def revoke(self, jti, user_id, expires_at):
+        """Revoke a token until expires_at (naive UTC)"""
+        revoke_token(jti, user_id, expires_at)
+        with self._lock:
+            self._filter.add(jti)
+
+    def is_revoked(self, jti):
+        """True when jti was revoked; hits the DB only when the filter reports a match"""
+        self.refresh()
+        if not jti or jti not in self._filter:
+            return False
+        self.filter_hits += 1
+        if is_token_revoked(jti):
+            return True
+        self.false_positives += 1
+        return False
+
+    def stats(self):
+        return {
+            'size_bits': self._filter.size,
+            'hashes': self._filter.hashes,
+            'entries': self._filter.count,
+            'filter_hits': self.filter_hits,
+            'false_positives': self.false_positives,
+        }
+
+
+# Global revocation list
+revocation_list = TokenRevocationList()
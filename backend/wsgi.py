@@ -0,0 +1,40 @@
+"""Production WSGI entry point
+
+gunicorn (Linux/macOS):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+waitress (any platform, including Windows):
+    python wsgi.py                      # uses PORT / WAITRESS_THREADS from the environment
+
+app.py's __main__ block is the single-threaded Werkzeug development server and
+should not be used to serve real traffic.
+"""
+import os
+from app import create_app
+
+app = create_app()
+
+
+def serve_waitress():
+    """Serve with waitress: one process, WAITRESS_THREADS worker threads"""
+    from waitress import serve
+    from db_connection import db
+    from admission import admission
+    from admin import ADMIN_FANOUT_THREADS
+    
+    threads = int(os.environ.get('WAITRESS_THREADS', 8))
+    admission.set_threads(threads)
+    # Every waitress thread (plus its admin fan-out) may hold a pooled connection at once
+    db.pool_max = max(db.pool_max, threads + ADMIN_FANOUT_THREADS)
+    serve(
+        app,
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', 5000)),
+        threads=threads,
+        connection_limit=int(os.environ.get('WAITRESS_CONNECTION_LIMIT', 1000)),
+        channel_timeout=int(os.environ.get('WAITRESS_CHANNEL_TIMEOUT', 120)),
+    )
+
+
+if __name__ == '__main__':
+    serve_waitress()
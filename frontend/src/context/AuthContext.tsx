@@ -157,6 +157,11 @@ export function AuthProvider({ children }: AuthProviderProps) {
   }
 
   const logout = (): void => {
+    const token = localStorage.getItem('token')
+    if (token) {
+      // Revoke the token server-side; the local session ends either way
+      api.post('/auth/logout', null, { headers: { Authorization: `Bearer ${token}` } }).catch(() => {})
+    }
     localStorage.removeItem('token')
     delete api.defaults.headers.common['Authorization']
     setUser(null)
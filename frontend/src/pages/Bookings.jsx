@@ -6,6 +6,8 @@ import './Bookings.css'
 function Bookings() {
   const { user } = useAuth()
   const [bookings, setBookings] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState('')
   const [selectedBooking, setSelectedBooking] = useState(null)
@@ -20,6 +22,7 @@ function Bookings() {
     try {
       const response = await api.get('/bookings')
       setBookings(response.data.bookings)
+      setNextCursor(response.data.pagination?.next_cursor || null)
       setError('')
     } catch (err) {
       setError('Failed to load bookings')
@@ -29,6 +32,23 @@ function Bookings() {
     }
   }
 
+  const loadMoreBookings = async () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      const response = await api.get('/bookings', {
+        params: { cursor: nextCursor }
+      })
+      setBookings(prev => [...prev, ...response.data.bookings])
+      setNextCursor(response.data.pagination?.next_cursor || null)
+    } catch (err) {
+      setError('Failed to load more bookings')
+      console.error(err)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const fetchMessages = async (bookingId) => {
     try {
       const response = await api.get('/bookings/messages', {
@@ -122,6 +142,11 @@ function Bookings() {
               </div>
             ))
           )}
+          {nextCursor && (
+            <button className="btn btn-secondary" onClick={loadMoreBookings} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          )}
         </div>
 
         {selectedBooking && (
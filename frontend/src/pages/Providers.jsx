@@ -310,7 +310,7 @@ function Providers() {
                   Previous
                 </button>
                 <span>
-                  Page {pagination.page} of {pagination.pages} ({pagination.total} total)
+                  Page {pagination.page} of {pagination.pages} ({pagination.total_is_estimate ? '~' : ''}{pagination.total} total)
                 </span>
                 <button
                   onClick={() => setPagination({ ...pagination, page: pagination.page + 1 })}